@@ -0,0 +1,118 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# asyncio variant of the LogManager for simulators that run many virtual devices in one event loop.
+# The session state handling is shared with the threaded LogManager through LogManagerBase. Events
+# are consumed from an asyncio.Queue by a task, flush deadlines are awaited and the Ion encoding and
+# file write of each batch run in an executor so they never block the event loop.
+
+from log_manager import LogManagerBase
+from manager_stats import FLUSH_MANUAL, FLUSH_STOP
+from batch_writer import BatchWriter
+from bundle_compression import BundleCompressor
+from ring_spool import RingSpool
+from reporting_events import *
+from concurrent.futures import Executor
+from typing import Iterable
+import asyncio
+
+
+class AsyncLogManager(LogManagerBase):
+
+	def __init__(self, sequence_counter: int, send_period: int = 3600, max_events: int = 20, path: str = './',
+					encoder: str = LogManagerBase.ENCODER_SIMPLEION, queue_capacity: int = 20,
+					executor: Executor = None, writer: BatchWriter = None, compression: str = None,
+					compression_dictionary: bytes = None, spool: RingSpool = None):
+		compressor = BundleCompressor(compression, dictionary=compression_dictionary) if compression else None
+		super().__init__(sequence_counter, send_period, max_events, path, encoder, writer=writer,
+							compressor=compressor, spool=spool)
+		# None uses the default executor of the event loop
+		self._executor = executor
+		self._queue_capacity = queue_capacity
+		self._event_queue: Union[asyncio.Queue, None] = None
+		self._task: Union[asyncio.Task, None] = None
+
+	# Start the consumer task, must be called from within the running event loop before events are pushed.
+	# The queue is created here as before Python 3.10 it binds to the loop it was created in.
+	def start(self) -> asyncio.Task:
+		self._event_queue = asyncio.Queue(maxsize=self._queue_capacity)
+		self._task = asyncio.get_running_loop().create_task(self.run())
+		return self._task
+
+	# Application method to push an event into the log queue
+	async def push_event(self, event: EventHeader):
+		await self._event_queue.put(event)
+
+	async def push_events(self, events: Iterable[EventHeader]):
+		for event in events:
+			await self._event_queue.put(event)
+
+	async def stop(self):
+		await self._event_queue.put(self._stop_event())
+
+	# Wait for the consumer task to finish and return the list of generated filenames
+	async def get_batch_filenames(self) -> List[str]:
+		await self._task
+		if self._writer is not None:
+			await asyncio.get_running_loop().run_in_executor(self._executor, self._writer.drain)
+		return self._batches
+
+	async def flush(self):
+		await self._flush_async(FLUSH_MANUAL)
+
+	async def _flush_async(self, trigger: str):
+		self._take_failed_writes()
+		events = self._events
+		batch = self._build_batch(trigger)
+		if batch is None:
+			return
+		if self._writer is not None and self._retry_failed_writes:
+			self._unconfirmed[batch[0]] = events
+		try:
+			await asyncio.get_running_loop().run_in_executor(self._executor, self._write_batch, *batch)
+		except OSError as error:
+			self._unconfirmed.pop(batch[0], None)
+			if not self._retry_failed_writes:
+				raise
+			self._write_failed(events, error)
+			return
+		self._written(events)
+
+	async def _next_event(self) -> Union[EventHeader, None]:
+		# Avoid creating a timeout task when events are already queued
+		try:
+			return self._event_queue.get_nowait()
+		except asyncio.QueueEmpty:
+			pass
+
+		# Persist the spooled events of the last burst before waiting
+		self._sync_spool()
+		timeout = self._flush_timeout()
+		if timeout is None:
+			return await self._event_queue.get()
+		try:
+			return await asyncio.wait_for(self._event_queue.get(), timeout)
+		except asyncio.TimeoutError:
+			return None
+
+	async def run(self):
+		self._recover_spool()
+		while True:
+			event = await self._next_event()
+			if event is None:
+				# The flush deadline has passed or the batch is full
+				await self._flush_async(self._flush_trigger())
+				continue
+
+			data: OrderedDict = event.pack_event()
+			if data[EVENT_ID] == EventHeader.STOP_EVENT:
+				await self._flush_async(FLUSH_STOP)
+				self._sync_spool()
+				return
+
+			self._apply_session_state(data)
+
+			# The Device Context is retained until a flush and always the first event in the batch.
+			if data[EVENT_ID] != EventHeader.DEVICE_CONTEXT_EVENT:
+				if self._flush_due():
+					await self._flush_async(self._flush_trigger())
+				self._store_event(data)
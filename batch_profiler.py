@@ -0,0 +1,229 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Opt-in profiling of single batches for the flush, write and decode paths. A BatchProfiler captures a
+# cProfile or tracemalloc snapshot of every Nth batch, of a sampled fraction of the batches, or of the
+# batches that take longer than a threshold, and writes it next to the bundle as
+# <bundle>.<stage>.prof or <bundle>.<stage>.tracemalloc. A threshold can only be judged once the
+# batch is done, so with a threshold every batch is profiled and only the slow ones are kept.
+# With a BatchWriter the flush profile only covers the encoding, so a selected batch is profiled again
+# on the writer thread as <bundle>.write.*, from its file write to its rename. A profiler can be
+# swapped in or out of a running manager with set_profiler(), or paused with its enabled flag.
+#
+#     manager.set_profiler(BatchProfiler(threshold=0.5, limit=10))
+#     python -m pstats bundles/<bundle>.10n.flush.prof
+#
+# The profiles are read back with pstats, or tracemalloc.Snapshot.load for the memory snapshots.
+
+from threading import Lock, RLock
+from typing import Callable, List, Union
+import cProfile
+import os
+import random
+import time
+import tracemalloc
+
+PROFILE_CPROFILE = 'cprofile'
+PROFILE_TRACEMALLOC = 'tracemalloc'
+
+# The profiled stages, used in the profile filenames
+STAGE_FLUSH = 'flush'
+STAGE_WRITE = 'write'
+STAGE_DECODE = 'decode'
+
+# Stack depth kept by tracemalloc for each allocation
+TRACEMALLOC_FRAMES = 16
+
+
+class BatchProfiler:
+	"""Decides which batches to profile and writes their profiles.
+
+	every profiles batches N, 2N, ... counted from when the profiler was created, sample is the
+	fraction of batches profiled at random and threshold keeps the profile of any batch that took at
+	least that many seconds. At most limit profiles are written when it is given.
+	"""
+
+	def __init__(self, mode: str = PROFILE_CPROFILE, every: int = None, threshold: float = None,
+					sample: float = None, limit: int = None, path: str = None, seed: int = None):
+		if mode not in [PROFILE_CPROFILE, PROFILE_TRACEMALLOC]:
+			raise ValueError('Unknown profile mode: ' + mode)
+		if every is None and threshold is None and sample is None:
+			raise ValueError('A profiler needs every, threshold or sample')
+		if every is not None and every < 1:
+			raise ValueError('every must be at least one')
+		self.mode = mode
+		self.every = every
+		self.threshold = threshold
+		self.sample = sample
+		self.limit = limit
+		# Directory for the profiles, next to the bundle when None
+		self.path = path
+		self.enabled = True
+		self.captured: List[str] = []
+		self._batches = 0
+		self._random = random.Random(seed)
+		self._lock = Lock()
+		# tracemalloc is process wide so only one batch is traced at a time, a thread can hold it for
+		# several batches
+		self._trace_lock = RLock()
+
+	# The locks are recreated when a profiler is passed to a worker process
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['_lock'], state['_trace_lock']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._lock = Lock()
+		self._trace_lock = RLock()
+
+	# Whether the next batch is profiled, and the threshold its profile must exceed to be kept
+	def _select(self) -> (bool, float):
+		with self._lock:
+			if self.limit is not None and len(self.captured) >= self.limit:
+				return False, None
+			self._batches += 1
+			if self.every is not None and self._batches % self.every == 0:
+				return True, 0.0
+			if self.sample is not None and self._random.random() < self.sample:
+				return True, 0.0
+			return self.threshold is not None, self.threshold
+
+	def profile_filename(self, filename: str, stage: str) -> str:
+		extension = '.prof' if self.mode == PROFILE_CPROFILE else '.tracemalloc'
+		name = '{0}.{1}{2}'.format(filename, stage, extension)
+		if self.path is not None:
+			name = os.path.join(self.path, os.path.basename(name))
+		return name
+
+	def capture(self, filename: str, stage: str) -> Union['BatchCapture', None]:
+		"""The capture of the batch of the bundle filename if it is selected, otherwise None."""
+		if not self.enabled:
+			return None
+		selected, threshold = self._select()
+		if not selected:
+			return None
+		return BatchCapture(self, filename, stage, threshold)
+
+	def run(self, filename: str, stage: str, function: Callable, *args):
+		"""Call function(*args) for the batch of the bundle filename, profiling it if it is selected."""
+		capture = self.capture(filename, stage)
+		if capture is None:
+			return function(*args)
+		try:
+			return capture.call(function, *args)
+		finally:
+			capture.finish()
+
+	def _write(self, filename: str, stage: str, elapsed: float, dump: Callable):
+		name = self.profile_filename(filename, stage)
+		try:
+			dump(name)
+		except OSError as error:
+			# Profiling must never fail the batch itself
+			print('Profile write failed:', name, error)
+			return
+		with self._lock:
+			self.captured.append(name)
+		print('Profiled {0} of {1} in {2:.3f}s: {3}'.format(stage, filename, elapsed, name))
+
+
+class BatchCapture:
+	"""The profile of one selected batch, taken over one or more calls on one thread.
+
+	finish() must be called once the batch is done, it keeps the profile if the calls took at least
+	the threshold in total.
+	"""
+
+	def __init__(self, profiler: BatchProfiler, filename: str, stage: str, threshold: float):
+		self.filename = filename
+		self.stage = stage
+		self.elapsed = 0.0
+		self._profiler = profiler
+		self._threshold = threshold
+		self._profile: Union[cProfile.Profile, None] = None
+		self._tracing = False
+		self._started = False
+		self._skipped = False
+
+	# The capture of the same batch for a later stage, such as the write behind the flush
+	def next_stage(self, stage: str) -> 'BatchCapture':
+		return BatchCapture(self._profiler, self.filename, stage, self._threshold)
+
+	def call(self, function: Callable, *args):
+		if self._skipped:
+			return function(*args)
+		if self._profiler.mode == PROFILE_CPROFILE:
+			return self._call_cprofile(function, args)
+		if not self._tracing:
+			self._profiler._trace_lock.acquire()
+			self._tracing = True
+			self._started = not tracemalloc.is_tracing()
+			if self._started:
+				tracemalloc.start(TRACEMALLOC_FRAMES)
+		return self._timed(function, args)
+
+	def _call_cprofile(self, function: Callable, args: tuple):
+		if self._profile is None:
+			self._profile = cProfile.Profile()
+		try:
+			self._profile.enable()
+		except ValueError as error:
+			# Another profiler is already active on this thread
+			print('Profiling skipped:', error)
+			self._skipped = True
+			return function(*args)
+		try:
+			return self._timed(function, args)
+		finally:
+			self._profile.disable()
+
+	def _timed(self, function: Callable, args: tuple):
+		start = time.perf_counter()
+		try:
+			return function(*args)
+		finally:
+			self.elapsed += time.perf_counter() - start
+
+	def finish(self):
+		keep = not self._skipped and self.elapsed >= self._threshold
+		if self._tracing:
+			try:
+				# Tracing may have been stopped by an enclosing capture that finished first
+				snapshot = tracemalloc.take_snapshot() if keep and tracemalloc.is_tracing() else None
+			finally:
+				if self._started:
+					tracemalloc.stop()
+				self._tracing = False
+				self._profiler._trace_lock.release()
+			if snapshot is not None:
+				self._profiler._write(self.filename, self.stage, self.elapsed, snapshot.dump)
+		elif keep and self._profile is not None:
+			self._profiler._write(self.filename, self.stage, self.elapsed, self._profile.dump_stats)
+
+
+def profiler_options(args: List[str]) -> BatchProfiler:
+	"""Remove the --profile options from the command line arguments, and return the profiler or None.
+
+	--profile cprofile|tracemalloc [--profile-every N] [--profile-threshold S] [--profile-sample F]
+	[--profile-limit N]
+
+	Raises ValueError for an option without a value or with a value that doesn't parse.
+	"""
+	options = {'profile': None, 'profile-every': None, 'profile-threshold': None, 'profile-sample': None,
+				'profile-limit': None}
+	for option, parse in [('profile', str), ('profile-every', int), ('profile-threshold', float),
+							('profile-sample', float), ('profile-limit', int)]:
+		if '--' + option in args:
+			index = args.index('--' + option)
+			if index + 1 >= len(args) or args[index + 1].startswith('--'):
+				raise ValueError('--{0} needs a value'.format(option))
+			options[option] = parse(args[index + 1])
+			del args[index:index + 2]
+	if options['profile'] is None:
+		return None
+	if options['profile-every'] is None and options['profile-threshold'] is None and options['profile-sample'] is None:
+		# Profile every batch when no trigger is given
+		options['profile-every'] = 1
+	return BatchProfiler(options['profile'], options['profile-every'], options['profile-threshold'],
+							options['profile-sample'], options['profile-limit'])
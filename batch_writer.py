@@ -0,0 +1,225 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Write-behind stage for encoded reporting bundles so the log manager consumer never waits on disk I/O.
+# Each batch is written to a temporary name next to its final name. The fsyncs of all of the batches
+# submitted within the fsync window are done together before each batch is atomically renamed, so a
+# crash can never leave a truncated bundle under its final name. An optional write rate limit paces
+# the writes for flash-backed devices. A batch can be submitted with a callback that is called on the
+# writer thread once the batch is on disk under its final name, or has failed, and with the capture
+# of a profiled batch whose file write, fsync and rename are then profiled on the writer thread.
+# A batch that fails for any reason has its temporary file removed and is reported to its callback
+# without stopping the writer thread.
+
+from batch_profiler import BatchCapture
+from threading import Thread, Condition
+from queue import Queue, Empty
+from typing import Callable, Dict, List, Tuple, Union
+import os
+import time
+
+TEMPORARY_SUFFIX = '.tmp'
+# Most batch files held open waiting for one fsync pass
+MAX_GROUP = 64
+
+
+class BatchWriter(Thread):
+
+	def __init__(self, fsync_window: float = 0.0, rate_limit: int = None, fsync: bool = True):
+		"""fsync_window is the seconds to wait for more batches to share an fsync pass with and
+		rate_limit is the maximum bytes/sec written, None for no limit."""
+		super().__init__(daemon=True)
+		self._fsync_window = fsync_window
+		self._rate_limit = rate_limit
+		self._fsync = fsync
+		self._queue = Queue()
+		self._next_write = time.monotonic()
+		self._condition = Condition()
+		self._submitted = 0
+		self._completed = 0
+		self.last_error: Union[Exception, None] = None
+		self.counters: Dict[str, Union[int, float]] = {
+			'batches': 0,
+			'bytes': 0,
+			'fsync_groups': 0,
+			'errors': 0,
+			'rate_limit_wait': 0.0,
+			'max_queued': 0,
+		}
+		self.start()
+
+	# Queue an encoded batch to be written under filename, callback(filename, error) is called with
+	# error None once it has been committed, and capture profiles the batch until then
+	def submit(self, filename: str, data: bytes, callback: Callable[[str, Union[Exception, None]], None] = None,
+				capture: BatchCapture = None):
+		with self._condition:
+			self._submitted += 1
+			self.counters['max_queued'] = max(self.counters['max_queued'], self._submitted - self._completed)
+		self._queue.put((filename, data, callback, capture))
+
+	# Block until every submitted batch is on disk under its final name
+	def drain(self):
+		with self._condition:
+			while self._completed < self._submitted:
+				self._condition.wait()
+
+	def close(self):
+		self.drain()
+		self._queue.put(None)
+		self.join()
+
+	def _pace(self, length: int):
+		if self._rate_limit is None:
+			return
+		now = time.monotonic()
+		if self._next_write > now:
+			self.counters['rate_limit_wait'] += self._next_write - now
+			time.sleep(self._next_write - now)
+			now = self._next_write
+		self._next_write = now + length / self._rate_limit
+
+	def _write(self, filename: str, data: bytes) -> Tuple[str, int]:
+		self._pace(len(data))
+		temporary = filename + TEMPORARY_SUFFIX
+		fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+		try:
+			view = memoryview(data)
+			while view:
+				view = view[os.write(fd, view):]
+		except Exception:
+			os.close(fd)
+			self._remove(temporary)
+			raise
+		self.counters['bytes'] += len(data)
+		return filename, fd
+
+	def _sync(self, filename: str, fd: int):
+		temporary = filename + TEMPORARY_SUFFIX
+		try:
+			try:
+				if self._fsync:
+					os.fsync(fd)
+			finally:
+				os.close(fd)
+			os.replace(temporary, filename)
+		except Exception:
+			self._remove(temporary)
+			raise
+
+	# A failed batch leaves no temporary file behind in the archive
+	@staticmethod
+	def _remove(temporary: str):
+		try:
+			os.unlink(temporary)
+		except OSError:
+			pass
+
+	def _commit(self, pending: List[Tuple[str, int, Callable, BatchCapture]]):
+		directories = set()
+		committed = []
+		for filename, fd, callback, capture in pending:
+			try:
+				if capture is not None:
+					capture.call(self._sync, filename, fd)
+				else:
+					self._sync(filename, fd)
+			except Exception as error:
+				self._error(error)
+				self._notify(callback, filename, error)
+				continue
+			directories.add(os.path.dirname(os.path.abspath(filename)))
+			committed.append((filename, callback))
+			self.counters['batches'] += 1
+
+		# Persist the renames, not every platform can open a directory
+		group_error = None
+		try:
+			if self._fsync and hasattr(os, 'O_DIRECTORY'):
+				for directory in directories:
+					fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+					try:
+						os.fsync(fd)
+					finally:
+						os.close(fd)
+		except Exception as error:
+			self._error(error)
+			group_error = error
+		self.counters['fsync_groups'] += 1
+		for filename, callback in committed:
+			self._notify(callback, filename, group_error)
+
+	@staticmethod
+	def _notify(callback: Callable, filename: str, error: Union[Exception, None]):
+		if callback is None:
+			return
+		try:
+			callback(filename, error)
+		except Exception as callback_error:
+			# The writer thread must outlive a failing callback
+			print('Batch write callback failed:', callback_error)
+
+	@staticmethod
+	def _finish(capture: Union[BatchCapture, None]):
+		if capture is None:
+			return
+		try:
+			capture.finish()
+		except Exception as capture_error:
+			print('Batch profile failed:', capture_error)
+
+	def _error(self, error: Exception):
+		print('Batch write failed:', error)
+		self.last_error = error
+		self.counters['errors'] += 1
+
+	def _complete(self, count: int):
+		with self._condition:
+			self._completed += count
+			self._condition.notify_all()
+
+	def run(self):
+		while True:
+			item = self._queue.get()
+			if item is None:
+				return
+
+			# Gather the batches that arrive within the window into one fsync pass
+			pending = []
+			deadline = time.monotonic() + self._fsync_window
+			count = 0
+			try:
+				while item is not None:
+					count += 1
+					filename, data, callback, capture = item
+					try:
+						if capture is not None:
+							written = capture.call(self._write, filename, data)
+						else:
+							written = self._write(filename, data)
+						pending.append(written + (callback, capture))
+					except Exception as error:
+						# Any failure of one batch is reported to its callback, the thread must keep running
+						self._error(error)
+						self._notify(callback, filename, error)
+						self._finish(capture)
+					if len(pending) >= MAX_GROUP:
+						break
+					# Past the window only the batches already queued join the group
+					remaining = deadline - time.monotonic()
+					try:
+						if remaining > 0:
+							item = self._queue.get(timeout=remaining)
+						else:
+							item = self._queue.get_nowait()
+					except Empty:
+						break
+					if item is None:
+						# Stop once this group is committed
+						self._queue.put(None)
+
+				self._commit(pending)
+			finally:
+				# Latest first, so a capture nested in another's tracemalloc session ends before it
+				for _, _, _, capture in reversed(pending):
+					self._finish(capture)
+				# drain() must never wait on a group that didn't complete
+				self._complete(count)
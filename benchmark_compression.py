@@ -0,0 +1,60 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Size and throughput comparison of the bundle compression options over a corpus of .10n files,
+# by default the ion_files directory written by test_data.py. The zstd dictionary is trained on
+# every other bundle and all of the methods are measured on the remaining bundles.
+#
+# Usage: python benchmark_compression.py [directory or glob ...]
+
+from bundle_compression import *
+from ingest_ion_files import find_files
+import sys
+import time
+
+
+def measure(name: str, compressor: Union[BundleCompressor, None], samples: List[bytes]) -> Dict[str, float]:
+	start = time.perf_counter()
+	compressed = [compressor.compress(sample) if compressor else sample for sample in samples]
+	compress_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for data in compressed:
+		decompress(data)
+	decompress_time = time.perf_counter() - start
+
+	raw_size = sum(len(sample) for sample in samples)
+	size = sum(len(data) for data in compressed)
+	return {
+		'method': name,
+		'bytes': size,
+		'ratio': raw_size / size,
+		'compress_mb_s': raw_size / compress_time / (1 << 20) if compressor else 0.0,
+		'decompress_mb_s': raw_size / decompress_time / (1 << 20) if compressor else 0.0,
+	}
+
+
+def run_benchmark(paths: List[str]) -> List[Dict[str, float]]:
+	files = find_files(paths)
+	if len(files) < 2:
+		raise RuntimeError('At least two bundles are needed, run test_data.py to build a corpus')
+	samples = [read_bundle(filename) for filename in files[1::2]]
+
+	methods = [('none', None), ('gzip', BundleCompressor(COMPRESSION_GZIP))]
+	if zstandard is not None:
+		methods.append(('zstd', BundleCompressor(COMPRESSION_ZSTD)))
+		methods.append(('zstd+dict', BundleCompressor(COMPRESSION_ZSTD, dictionary=train_dictionary(files[::2]))))
+	else:
+		print('zstandard is not installed, skipping zstd')
+
+	print('{0} bundles, {1} bytes'.format(len(samples), sum(len(sample) for sample in samples)))
+	print('{0:<10} {1:>10} {2:>7} {3:>12} {4:>12}'.format('method', 'bytes', 'ratio', 'comp MB/s', 'decomp MB/s'))
+	results = []
+	for name, compressor in methods:
+		result = measure(name, compressor, samples)
+		print('{method:<10} {bytes:>10} {ratio:>7.2f} {compress_mb_s:>12.1f} {decompress_mb_s:>12.1f}'.format(**result))
+		results.append(result)
+	return results
+
+
+if __name__ == '__main__':
+	run_benchmark(sys.argv[1:] or ['ion_files'])
@@ -0,0 +1,86 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Compares decoding the loaded Ion events one at a time with EventFactory.factory against decoding the
+# whole batch with factory_many, and times read_data end to end for the same bundles. Without paths a
+# single large bundle is built offline with the same batch layout as benchmark_encoder.
+#
+# Usage: python benchmark_decode.py [directory or glob ...] [--events N] [--repeats N]
+
+from benchmark_reader import write_sample_bundle
+from bundle_compression import open_bundle
+from ingest_ion_files import find_files
+from reporting_events import *
+from verify_ion_file import build_catalog, read_data
+from amazon.ion import simpleion
+import sys
+import tempfile
+import time
+
+
+def _load_events(files: List[str]) -> List[List[Any]]:
+	catalog = build_catalog()
+	batches = []
+	for filename in files:
+		with open_bundle(filename) as bundle_file:
+			_, events = IdentityHeader.unpack_header(simpleion.load(bundle_file, catalog=catalog))
+		batches.append(list(events))
+	return batches
+
+
+def _factory(factory: EventFactory, batches: List[List[Any]]) -> int:
+	count = 0
+	for events in batches:
+		for item in events:
+			factory.factory(item[EVENT_ID], item)
+			count += 1
+	return count
+
+
+def _factory_many(factory: EventFactory, batches: List[List[Any]]) -> int:
+	return sum(len(factory.factory_many(events)) for events in batches)
+
+
+def measure(files: List[str], repeats: int = 3) -> List[Dict]:
+	factory = EventFactory()
+	results = []
+	print('{0:<14} {1:>14}'.format('decoder', 'events/sec'))
+	for name, decode in [('factory', _factory), ('factory_many', _factory_many)]:
+		best = None
+		for _ in range(repeats):
+			# factory replaces the Ion nulls in place so every repeat starts from freshly loaded events
+			batches = _load_events(files)
+			start = time.perf_counter()
+			count = decode(factory, batches)
+			elapsed = time.perf_counter() - start
+			best = elapsed if best is None else min(best, elapsed)
+		results.append({'decoder': name, 'events_per_sec': count / best})
+		print('{decoder:<14} {events_per_sec:>14.0f}'.format(**results[-1]))
+
+	best = None
+	for _ in range(repeats):
+		start = time.perf_counter()
+		count = sum(len(read_data(filename).events) for filename in files)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	results.append({'decoder': 'read_data', 'events_per_sec': count / best})
+	print('{decoder:<14} {events_per_sec:>14.0f}'.format(**results[-1]))
+	return results
+
+
+def run_benchmark(paths: List[str] = None, events: int = 5000, repeats: int = 3) -> List[Dict]:
+	if paths:
+		return measure(find_files(paths), repeats)
+	with tempfile.TemporaryDirectory() as path:
+		return measure([write_sample_bundle(path, events)], repeats)
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	options = {'events': 5000, 'repeats': 3}
+	for option in list(options):
+		if '--' + option in args:
+			index = args.index('--' + option)
+			options[option] = int(args[index + 1])
+			del args[index:index + 2]
+
+	run_benchmark(args, options['events'], options['repeats'])
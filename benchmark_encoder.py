@@ -0,0 +1,99 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Compares the batches/sec of the simpleion and direct binary Ion encoders used by LogManager._flush.
+# The batches are built offline the same way _flush builds them so no network access is required.
+#
+# Usage: python benchmark_encoder.py [events per batch] [number of batches]
+
+from reporting_events import *
+from datetime import timedelta
+from amazon.ion import simpleion, symbols
+from ion_binary_writer import IonBinaryWriter
+import analytics_symbols
+import io
+import sys
+import time
+
+
+def sample_header() -> IdentityHeader:
+	return IdentityHeader(
+		datetime(2019, 6, 14, 5, 42, 0, 123000),
+		0x50000,
+		'17.27.0.C',
+		bytes.fromhex('2b9c5d351a879a25b86851adc36acea6'),
+		'1.16.1.9',
+		'62081957540',
+		'000229047600',
+		bytes.fromhex('026b45850456f79041d9fcf54b8fddf51ad41d8cd98f00b204e9800998ecf8427e'),
+		1
+	)
+
+
+def sample_events(timestamp: datetime, count: int) -> List[EventHeader]:
+	events: List[EventHeader] = []
+	for index in range(count):
+		timestamp += timedelta(seconds=30)
+		kind = index % 4
+		if kind == 0:
+			events.append(PageViewEvent(timestamp, 'player', previous='home'))
+		elif kind == 1:
+			events.append(LivePlayEvent(
+				timestamp, timestamp, 'FOX8', 'FX0123456789', 'SC0123456789', timestamp - timedelta(minutes=10),
+				3600, 'The Simpsons', 'PG', 'HD', ContentTypeType.TUNER_SUB, ViewStatusType.CAPTIONS, bytes(16),
+				'Homer the Great'))
+		elif kind == 2:
+			events.append(ViewingStopEvent(
+				timestamp, timestamp - timedelta(minutes=5), 'FOX8', 'FX0123456789', 'SC0123456789',
+				timestamp - timedelta(minutes=10), 3600, 'The Simpsons', 'PG', 'HD', ContentTypeType.TUNER_SUB,
+				ViewStatusType.CAPTIONS, 600, 300, selector_track_id=bytes(16), qos_startup_ms=450))
+		else:
+			events.append(PowerStatusEvent(timestamp, PowerStateType.ACTIVE, True))
+	return events
+
+
+def sample_batch(count: int) -> OrderedDict:
+	header = sample_header()
+	packed = header.pack_header()
+	batch = packed[EVENT_LIST]
+	for event in sample_events(header.timestamp, count):
+		data = event.pack_event()
+		data[APP_SESSION_ID] = header.timestamp
+		data[USAGE_SESSION_ID] = header.timestamp
+		data[PAGE_SESSION_ID] = header.timestamp
+		data[CONTEXT_EVENT_ID] = int(header.timestamp.timestamp())
+		batch.append(data)
+	batch.append(EndOfFileEvent(header.timestamp).pack_event())
+	return packed
+
+
+def run_benchmark(events_per_batch: int = 100, batches: int = 200):
+	ion_symbols = symbols.SymbolTable(symbols.SHARED_TABLE_TYPE, analytics_symbols.table, "foxtel.engagement.format", 1)
+	writer = IonBinaryWriter([ion_symbols])
+	batch = sample_batch(events_per_batch)
+
+	def encode_simpleion():
+		out = io.BytesIO()
+		simpleion.dump(batch, fp=out, imports=[ion_symbols], binary=True)
+		return out.getvalue()
+
+	def encode_binary():
+		return writer.dumps(batch)
+
+	if encode_simpleion() != encode_binary():
+		raise RuntimeError("Encoders produced different output")
+
+	print('Events per batch:', events_per_batch, 'Batches:', batches)
+	results = {}
+	for name, encode in [('simpleion', encode_simpleion), ('binary', encode_binary)]:
+		start = time.perf_counter()
+		for _ in range(batches):
+			encode()
+		elapsed = time.perf_counter() - start
+		results[name] = batches / elapsed
+		print('{0:>10}: {1:10.1f} batches/sec'.format(name, results[name]))
+	print('   speedup: {0:10.1f}x'.format(results['binary'] / results['simpleion']))
+	return results
+
+
+if __name__ == '__main__':
+	run_benchmark(*[int(arg) for arg in sys.argv[1:3]])
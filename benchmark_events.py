@@ -0,0 +1,100 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Microbenchmark of pack_event/unpack_event throughput for every EventHeader sub-class.
+# Sample events are built from the dataclass field annotations so no network access is required.
+#
+# Usage: python benchmark_events.py [iterations] [--save results.json] [--compare results.json]
+
+from reporting_events import *
+from dataclasses import fields, MISSING
+from enum import Enum
+from typing import Dict
+import json
+import sys
+import time
+
+SAMPLE_TIMESTAMP = datetime(2019, 6, 18, 13, 37, 0, 250000)
+
+_SAMPLE_VALUES = {
+	str: 'sample',
+	int: 1234,
+	bool: True,
+	bytes: bytes(16),
+	datetime: SAMPLE_TIMESTAMP,
+}
+
+
+def sample_value(annotation):
+	if isinstance(annotation, type) and issubclass(annotation, Enum):
+		return list(annotation)[0]
+	return _SAMPLE_VALUES.get(annotation)
+
+
+def sample_event(cls, fill_optional: bool = True) -> EventHeader:
+	arguments = {}
+	for item in fields(cls):
+		if not item.init:
+			continue
+		if item.default is not MISSING and not fill_optional:
+			continue
+		arguments[item.name] = sample_value(item.type)
+	return cls(**arguments)
+
+
+def measure(function, iterations: int, repeats: int = 5) -> float:
+	# Best of several runs to keep scheduler noise out of the comparison
+	best = None
+	for _ in range(repeats):
+		start = time.perf_counter()
+		for _ in range(iterations):
+			function()
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return iterations / best
+
+
+def run_benchmark(iterations: int = 5000) -> Dict[str, Dict[str, float]]:
+	results = {}
+	for cls in sorted(event_classes(), key=lambda cls: cls.get_event_id()):
+		event = sample_event(cls)
+		properties = event.pack_event()
+		results[cls.__name__] = {
+			'pack': measure(event.pack_event, iterations),
+			'unpack': measure(lambda: cls.unpack_event(properties), iterations)
+		}
+	return results
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]] = None):
+	print('{0:<30} {1:>14} {2:>14}'.format('Event', 'pack/sec', 'unpack/sec'))
+	for name, result in results.items():
+		line = '{0:<30} {1:>14.0f} {2:>14.0f}'.format(name, result['pack'], result['unpack'])
+		if baseline is not None and name in baseline:
+			line += '   {0:>5.2f}x {1:>5.2f}x'.format(
+				result['pack'] / baseline[name]['pack'], result['unpack'] / baseline[name]['unpack'])
+		print(line)
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	save_file = None
+	compare_file = None
+	if '--save' in args:
+		index = args.index('--save')
+		save_file = args[index + 1]
+		del args[index:index + 2]
+	if '--compare' in args:
+		index = args.index('--compare')
+		compare_file = args[index + 1]
+		del args[index:index + 2]
+
+	benchmark = run_benchmark(*[int(arg) for arg in args[:1]])
+	reference = None
+	if compare_file is not None:
+		with open(compare_file) as baseline_file:
+			reference = json.load(baseline_file)
+	print_results(benchmark, reference)
+
+	if save_file is not None:
+		with open(save_file, 'w') as results_file:
+			json.dump(benchmark, results_file, indent=4)
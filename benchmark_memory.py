@@ -0,0 +1,38 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Measures the memory held per decoded event object. The events are created through unpack_event as
+# verify_ion_file does when decoding a batch, and the property values are shared between the copies so
+# only the cost of the event objects themselves is reported.
+#
+# Usage: python benchmark_memory.py [number of events]
+
+from benchmark_events import sample_event
+from reporting_events import *
+import sys
+import tracemalloc
+
+MEASURED_EVENTS = [ViewingStopEvent, DeviceContextEvent, PageViewEvent]
+
+
+def bytes_per_event(cls, count: int) -> float:
+	properties = sample_event(cls).pack_event()
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	events = [cls.unpack_event(properties) for _ in range(count)]
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	# Exclude the list holding the events
+	return (after - before - sys.getsizeof(events)) / len(events)
+
+
+def run_benchmark(count: int = 100000):
+	print('{0:<25} {1:>8} {2:>15}'.format('Event', 'fields', 'bytes/event'))
+	results = {}
+	for cls in MEASURED_EVENTS:
+		results[cls.__name__] = bytes_per_event(cls, count)
+		print('{0:<25} {1:>8} {2:>15.1f}'.format(cls.__name__, len(fields(cls)), results[cls.__name__]))
+	return results
+
+
+if __name__ == '__main__':
+	run_benchmark(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,117 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Scaling benchmark of simulated devices against events/sec and resident memory for the
+# LogManagerPool, optionally alongside one LogManager thread per device. Every configuration
+# runs in a fresh process so that the memory figures are not inflated by earlier runs.
+#
+# Usage: python benchmark_pool.py [devices ...] [--events N] [--workers N] [--threads]
+
+from benchmark_encoder import sample_events
+from log_manager import LogManager, LogManagerBase
+from log_manager_pool import LogManagerPool
+from reporting_events import *
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+SAMPLE_TIMESTAMP = datetime(2019, 6, 18, 13, 37, 0)
+
+
+def resident_memory() -> int:
+	# Current RSS in bytes where /proc is available, otherwise the peak RSS
+	try:
+		with open('/proc/self/statm') as statm:
+			return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except (OSError, ValueError):
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def device_events(count: int) -> List[EventHeader]:
+	context = DeviceContextEvent(
+		SAMPLE_TIMESTAMP, '110', '539', 0x8A, 82, 2566526, 926, 27, 100, 241, '1.x', 'SAMSUNG', 'SAM', '1:27',
+		'117', '13', 1, 'RC', bytes(8), RcuTypeType.BT_STANDARD_REMOTE, 16401, 4012, 16384, 'PH', '274',
+		datetime(2019, 5, 20))
+	return [context, PowerStatusEvent(SAMPLE_TIMESTAMP, PowerStateType.POWER_ON, False)] + \
+		sample_events(SAMPLE_TIMESTAMP, count - 2)
+
+
+def run_configuration(devices: int, events: int, workers: int, threads: bool) -> Dict[str, float]:
+	# The same event objects are pushed for every device as the managers only read them
+	stream = device_events(events)
+	identities = ['SIM{0:08d}'.format(index) for index in range(devices)]
+	baseline = resident_memory()
+
+	with tempfile.TemporaryDirectory() as path, contextlib.redirect_stdout(io.StringIO()):
+		start = time.perf_counter()
+		if threads:
+			managers = []
+			for hw_client_id in identities:
+				manager = LogManager(0x50000, path=path, encoder=LogManagerBase.ENCODER_BINARY)
+				manager.set_identity('17.27.0.C', bytes(16), '1.16.1.9', hw_client_id, '000229047600', bytes(32), 1)
+				manager.clear_state(SAMPLE_TIMESTAMP)
+				manager.start()
+				managers.append(manager)
+			memory = resident_memory()
+			for manager in managers:
+				manager.push_events(stream)
+			for manager in managers:
+				manager.stop()
+			batches = sum(len(manager.get_batch_filenames()) for manager in managers)
+		else:
+			pool = LogManagerPool(workers, path=path, encoder=LogManagerBase.ENCODER_BINARY)
+			for hw_client_id in identities:
+				pool.add_device(0x50000, '17.27.0.C', bytes(16), '1.16.1.9', hw_client_id, '000229047600', bytes(32), 1)
+				pool.clear_state(hw_client_id, SAMPLE_TIMESTAMP)
+			pool.start()
+			memory = resident_memory()
+			for hw_client_id in identities:
+				pool.push_events(hw_client_id, stream)
+			pool.stop()
+			batches = len(pool.get_batch_filenames())
+		elapsed = time.perf_counter() - start
+		memory = max(memory, resident_memory())
+
+	return {
+		'events_per_sec': devices * events / elapsed,
+		'batches': batches,
+		'rss_mb': (memory - baseline) / (1 << 20),
+	}
+
+
+def run_benchmark(device_counts: List[int], events: int = 50, workers: int = 4, threads: bool = False):
+	modes = [False, True] if threads else [False]
+	context = multiprocessing.get_context('spawn')
+	print('{0:<8} {1:>8} {2:>14} {3:>10} {4:>10}'.format('mode', 'devices', 'events/sec', 'batches', 'RSS MB'))
+	results = []
+	for devices in device_counts:
+		for mode in modes:
+			with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+				result = executor.submit(run_configuration, devices, events, workers, mode).result()
+			name = 'threads' if mode else 'pool'
+			print('{0:<8} {1:>8} {2:>14.0f} {3:>10} {4:>10.1f}'.format(
+				name, devices, result['events_per_sec'], result['batches'], result['rss_mb']))
+			result.update({'mode': name, 'devices': devices})
+			results.append(result)
+	return results
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	options = {'events': 50, 'workers': 4}
+	for option in list(options):
+		if '--' + option in args:
+			index = args.index('--' + option)
+			options[option] = int(args[index + 1])
+			del args[index:index + 2]
+	compare_threads = '--threads' in args
+	if compare_threads:
+		args.remove('--threads')
+
+	run_benchmark([int(arg) for arg in args] or [10, 100, 1000, 10000], options['events'], options['workers'],
+					compare_threads)
@@ -0,0 +1,112 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Compares a selective query run through event_query against fully decoding every bundle with read_data
+# and filtering the events with isinstance checks, and against streaming them with iter_events. Without
+# paths a set of bundles is built offline with the same batch layout as benchmark_encoder.
+#
+# Usage: python benchmark_query.py [directory or glob ...] [--bundles N] [--events N]
+
+from benchmark_encoder import sample_batch
+from event_query import select
+from ingest_ion_files import find_files
+from ion_binary_writer import IonBinaryWriter
+from log_manager import build_symbol_table
+from reporting_events import *
+from verify_ion_file import build_catalog, iter_events, read_data
+from bundle_catalog import naive_utc
+from datetime import timedelta
+import os
+import sys
+import tempfile
+import time
+
+FIELDS = ('timestamp', 'program_id', 'player_viewed_duration')
+
+
+def write_sample_bundles(path: str, bundles: int, events: int) -> List[str]:
+	writer = IonBinaryWriter([build_symbol_table()])
+	filenames = []
+	for index in range(bundles):
+		batch = sample_batch(events)
+		# Give each bundle its own time range so that the time filter is selective
+		for event in batch[EVENT_LIST]:
+			event[TIMESTAMP] += timedelta(days=index)
+		filename = os.path.join(path, 'benchmark_query_{0:04d}.10n'.format(index))
+		with open(filename, 'wb') as bundle_file:
+			bundle_file.write(writer.dumps(batch))
+		filenames.append(filename)
+	return filenames
+
+
+def _time_range(files: List[str]) -> Tuple[datetime, datetime]:
+	# Roughly the first tenth of the events by time
+	timestamps = sorted(naive_utc(event.timestamp) for filename in files
+						for event in list(iter_events(filename))[1:])
+	return timestamps[0], timestamps[len(timestamps) // 10]
+
+
+def _project(event: EventHeader) -> Dict:
+	return OrderedDict((name, getattr(event, name)) for name in FIELDS)
+
+
+def full_decode(files: List[str], start: datetime, end: datetime) -> List[Dict]:
+	rows = []
+	for filename in files:
+		for event in read_data(filename).events:
+			if isinstance(event, ViewingStopEvent) and start <= naive_utc(event.timestamp) <= end:
+				rows.append(_project(event))
+	return rows
+
+
+def stream_decode(files: List[str], start: datetime, end: datetime) -> List[Dict]:
+	rows = []
+	catalog = build_catalog()
+	for filename in files:
+		events = iter_events(filename, catalog)
+		next(events)
+		for event in events:
+			if isinstance(event, ViewingStopEvent) and start <= naive_utc(event.timestamp) <= end:
+				rows.append(_project(event))
+	return rows
+
+
+def pushdown(files: List[str], start: datetime, end: datetime) -> List[Dict]:
+	query = select(*FIELDS).where(event_id=EventHeader.VIEWING_STOP_EVENT, timestamp=(start, end))
+	return list(query.run(files))
+
+
+def measure(files: List[str]) -> Dict[str, float]:
+	start, end = _time_range(files)
+	print('{0} bundles, ViewingStop events between {1} and {2}'.format(len(files), start, end))
+	results = {}
+	expected = None
+	for name, run in [('read_data', full_decode), ('iter_events', stream_decode), ('event_query', pushdown)]:
+		began = time.perf_counter()
+		rows = run(files, start, end)
+		results[name] = time.perf_counter() - began
+		if expected is None:
+			expected = [list(row.values()) for row in rows]
+		elif [list(row.values()) for row in rows] != expected:
+			raise RuntimeError(name + ' returned different rows')
+		print('{0:>12}: {1:8.3f}s {2:>6} rows {3:6.1f}x'.format(
+			name, results[name], len(rows), results['read_data'] / results[name]))
+	return results
+
+
+def run_benchmark(paths: List[str] = None, bundles: int = 20, events: int = 500) -> Dict[str, float]:
+	if paths:
+		return measure(find_files(paths))
+	with tempfile.TemporaryDirectory() as path:
+		return measure(write_sample_bundles(path, bundles, events))
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	options = {'bundles': 20, 'events': 500}
+	for option in list(options):
+		if '--' + option in args:
+			index = args.index('--' + option)
+			options[option] = int(args[index + 1])
+			del args[index:index + 2]
+
+	run_benchmark(args, options['bundles'], options['events'])
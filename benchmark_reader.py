@@ -0,0 +1,82 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Compares reading bundles through a Python file object with parsing them in place from a memory map
+# (zero_copy), for both the streaming iter_events and read_data. Without paths a single large bundle
+# is built offline with the same batch layout as benchmark_encoder.
+#
+# Usage: python benchmark_reader.py [directory or glob ...] [--events N] [--repeats N]
+
+from benchmark_encoder import sample_batch
+from ingest_ion_files import find_files
+from ion_binary_writer import IonBinaryWriter
+from log_manager import build_symbol_table
+from verify_ion_file import build_catalog, iter_events, read_data
+from typing import Dict, List
+import os
+import sys
+import tempfile
+import time
+
+
+def write_sample_bundle(path: str, events: int) -> str:
+	filename = os.path.join(path, 'benchmark_reader.10n')
+	with open(filename, 'wb') as bundle_file:
+		bundle_file.write(IonBinaryWriter([build_symbol_table()]).dumps(sample_batch(events)))
+	return filename
+
+
+def _stream(files: List[str], zero_copy: bool) -> int:
+	catalog = build_catalog()
+	count = 0
+	for filename in files:
+		for _ in iter_events(filename, catalog, zero_copy):
+			count += 1
+	return count
+
+
+def _load(files: List[str], zero_copy: bool) -> int:
+	return sum(len(read_data(filename, zero_copy).events) + 1 for filename in files)
+
+
+def measure(files: List[str], repeats: int = 3) -> List[Dict]:
+	size = sum(os.path.getsize(filename) for filename in files)
+	print('{0} bundles, {1} bytes'.format(len(files), size))
+	print('{0:<12} {1:<6} {2:>14} {3:>10}'.format('reader', 'mode', 'events/sec', 'MB/s'))
+	results = []
+	for name, read in [('iter_events', _stream), ('read_data', _load)]:
+		for zero_copy in [False, True]:
+			# Best of the repeats to keep page cache warm-up out of the comparison
+			best = None
+			for _ in range(repeats):
+				start = time.perf_counter()
+				count = read(files, zero_copy)
+				elapsed = time.perf_counter() - start
+				best = elapsed if best is None else min(best, elapsed)
+			result = {
+				'reader': name,
+				'mode': 'mmap' if zero_copy else 'file',
+				'events_per_sec': count / best,
+				'mb_s': size / best / (1 << 20),
+			}
+			print('{reader:<12} {mode:<6} {events_per_sec:>14.0f} {mb_s:>10.2f}'.format(**result))
+			results.append(result)
+	return results
+
+
+def run_benchmark(paths: List[str] = None, events: int = 5000, repeats: int = 3) -> List[Dict]:
+	if paths:
+		return measure(find_files(paths), repeats)
+	with tempfile.TemporaryDirectory() as path:
+		return measure([write_sample_bundle(path, events)], repeats)
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	options = {'events': 5000, 'repeats': 3}
+	for option in list(options):
+		if '--' + option in args:
+			index = args.index('--' + option)
+			options[option] = int(args[index + 1])
+			del args[index:index + 2]
+
+	run_benchmark(args, options['events'], options['repeats'])
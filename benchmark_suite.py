@@ -0,0 +1,238 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Benchmark suite over the pack, encode, decode and export hot paths with a stored baseline. Every
+# case is measured offline from generated events as operations/sec, the best of several repeats, and
+# a run takes the median of several rounds over all of the cases. A run can be saved as a baseline and
+# a later run compared against it. A case that slowed down by more than the tolerance is measured
+# again and only reported as a regression, with exit status 1, when the second measurement agrees.
+# The ratios are normalised by a pure Python calibration loop timed in both runs, which takes out most
+# of the difference in machine speed.
+#
+# Usage: python benchmark_suite.py [--scale F] [--runs N] [--save results.json]
+#                                  [--compare results.json | --baseline] [--tolerance F] [--only PREFIX]
+#
+# --baseline compares against the stored benchmark_baseline.json, which is refreshed with
+# --save benchmark_baseline.json after an intended change in performance.
+
+from benchmark_encoder import sample_batch, sample_header
+from benchmark_events import measure, sample_event
+from benchmark_pool import device_events
+from jsonify_ion import export_bundle
+from log_manager import LogManager, LogManagerBase, build_symbol_table
+from reporting_events import *
+from verify_ion_file import build_catalog
+from amazon.ion import simpleion
+from typing import Tuple
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+BASELINE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_TOLERANCE = 0.4
+# Rounds over the cases in a run, each result is the median of the rounds
+DEFAULT_RUNS = 3
+BATCH_SIZES = (10, 100, 1000)
+SAMPLE_TIMESTAMP = datetime(2019, 6, 18, 13, 37, 0)
+
+
+def _iterations(count: int, scale: float) -> int:
+	return max(1, int(count * scale))
+
+
+def _event_cases(scale: float) -> List[Tuple[str, str, Callable]]:
+	cases = []
+	for cls in sorted(event_classes(), key=lambda cls: cls.get_event_id()):
+		event = sample_event(cls)
+		properties = event.pack_event()
+		# Enough iterations for each repeat to take tens of milliseconds
+		iterations = _iterations(20000, scale)
+		cases.append(('pack_event/' + cls.__name__, 'events/sec',
+						lambda event=event, iterations=iterations: measure(event.pack_event, iterations)))
+		cases.append(('unpack_event/' + cls.__name__, 'events/sec',
+						lambda cls=cls, properties=properties, iterations=iterations:
+						measure(lambda: cls.unpack_event(properties), iterations)))
+	header = sample_header()
+	cases.append(('pack_header', 'headers/sec', lambda: measure(header.pack_header, _iterations(20000, scale))))
+	return cases
+
+
+def _log_manager(events: int) -> float:
+	# Events pushed through the manager until the batch files are written on stop()
+	stream = device_events(events)
+	with tempfile.TemporaryDirectory() as path, contextlib.redirect_stdout(io.StringIO()):
+		start = time.perf_counter()
+		manager = LogManager(0x50000, path=path, encoder=LogManagerBase.ENCODER_BINARY)
+		manager.set_identity('17.27.0.C', bytes(16), '1.16.1.9', 'SIM00000001', '000229047600', bytes(32), 1)
+		manager.clear_state(SAMPLE_TIMESTAMP)
+		manager.start()
+		manager.push_events(stream)
+		manager.stop()
+		# Joins the consumer, so the time includes draining the queue and writing the batches
+		filenames = manager.get_batch_filenames()
+		elapsed = time.perf_counter() - start
+		if not filenames:
+			raise RuntimeError('LogManager wrote no batches')
+	return events / elapsed
+
+
+def _simpleion_cases(scale: float) -> List[Tuple[str, str, Callable]]:
+	imports = [build_symbol_table()]
+	catalog = build_catalog()
+	cases = []
+	for size in BATCH_SIZES:
+		batch = sample_batch(size)
+		encoded = simpleion.dumps(batch, imports=imports, binary=True)
+		# Around 2000 events per repeat, with a few batches at least so that the large batches are stable
+		iterations = _iterations(max(2000 // size, 3), scale)
+		cases.append(('simpleion_dump/{0}'.format(size), 'batches/sec',
+						lambda batch=batch, iterations=iterations:
+						measure(lambda: simpleion.dumps(batch, imports=imports, binary=True), iterations)))
+		cases.append(('simpleion_load/{0}'.format(size), 'batches/sec',
+						lambda encoded=encoded, iterations=iterations:
+						measure(lambda: simpleion.loads(encoded, catalog=catalog, single_value=True), iterations)))
+	return cases
+
+
+def _jsonify(events: int, repeats: int = 5) -> float:
+	catalog = build_catalog()
+	with tempfile.TemporaryDirectory() as path:
+		filename = os.path.join(path, 'benchmark_suite.10n')
+		with open(filename, 'wb') as bundle_file:
+			bundle_file.write(simpleion.dumps(sample_batch(events), imports=[build_symbol_table()], binary=True))
+		best = None
+		for _ in range(repeats):
+			start = time.perf_counter()
+			count = export_bundle(filename, [io.StringIO()], catalog)
+			elapsed = time.perf_counter() - start
+			best = elapsed if best is None else min(best, elapsed)
+	return count / best
+
+
+def benchmark_cases(scale: float = 1.0) -> List[Tuple[str, str, Callable]]:
+	"""The (name, unit, run) of every case, where run() returns the operations/sec."""
+	cases = _event_cases(scale)
+	cases.append(('log_manager', 'events/sec', lambda: _log_manager(_iterations(2000, scale))))
+	cases.extend(_simpleion_cases(scale))
+	cases.append(('jsonify_ion', 'events/sec', lambda: _jsonify(_iterations(1000, scale))))
+	return cases
+
+
+def _calibration_loop():
+	total = 0
+	for index in range(1000):
+		total += index % 7
+	return total
+
+
+def calibrate() -> float:
+	"""Loops/sec of a fixed pure Python workload, used to normalise runs on machines of different speed."""
+	return measure(_calibration_loop, 500)
+
+
+def environment() -> Dict[str, str]:
+	return {
+		'python': platform.python_version(),
+		'implementation': platform.python_implementation(),
+		'machine': platform.machine(),
+		'system': platform.system(),
+	}
+
+
+def run_benchmark(scale: float = 1.0, only: str = None, runs: int = DEFAULT_RUNS, names: List[str] = None) -> Dict:
+	"""The median ops/sec of each case over the runs, of the cases starting with only or in names."""
+	cases = [(name, unit, run) for name, unit, run in benchmark_cases(scale)
+				if (only is None or name.startswith(only)) and (names is None or name in names)]
+	samples = OrderedDict((name, []) for name, _, _ in cases)
+	units = OrderedDict((name, unit) for name, unit, _ in cases)
+	# Each round runs every case once, so a slow spell of the machine affects one sample of a case at
+	# most. Calibrated between the rounds in case the machine speed changes during the run.
+	calibrations = []
+	for _ in range(runs):
+		calibrations.append(calibrate())
+		for name, _, run in cases:
+			samples[name].append(run())
+	calibrations.append(calibrate())
+	results = OrderedDict((name, statistics.median(values)) for name, values in samples.items())
+	return {'environment': environment(), 'calibration': statistics.median(calibrations), 'runs': runs,
+			'units': units, 'results': results}
+
+
+def ratios(run: Dict, baseline: Dict) -> Dict[str, float]:
+	"""The speed of each case relative to the baseline, normalised by the calibration of both runs."""
+	reference = baseline['results']
+	scale = baseline['calibration'] / run['calibration']
+	return OrderedDict((name, value / reference[name] * scale) for name, value in run['results'].items()
+						if reference.get(name))
+
+
+def compare(run: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+	"""The names of the cases that are slower than the baseline by more than the tolerance."""
+	return [name for name, ratio in ratios(run, baseline).items() if ratio < 1 - tolerance]
+
+
+def confirm(run: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE, scale: float = 1.0,
+			runs: int = DEFAULT_RUNS) -> List[str]:
+	"""The regressions of the run that are still slower than the baseline when measured again."""
+	regressions = compare(run, baseline, tolerance)
+	if not regressions:
+		return []
+	again = run_benchmark(scale, runs=runs, names=regressions)
+	return [name for name in compare(again, baseline, tolerance) if name in regressions]
+
+
+def print_report(run: Dict, baseline: Dict = None, tolerance: float = DEFAULT_TOLERANCE):
+	regressions = set(compare(run, baseline, tolerance)) if baseline is not None else set()
+	relative = ratios(run, baseline) if baseline is not None else {}
+	if baseline is not None:
+		if baseline.get('environment') != run['environment']:
+			print('Baseline environment {0} differs from {1}'.format(baseline.get('environment'), run['environment']))
+		print('Calibration {0:.0f} loops/sec, baseline {1:.0f}'.format(run['calibration'], baseline['calibration']))
+	print('{0:<40} {1:>14} {2:<12} {3:>14} {4:>8}'.format('case', 'ops/sec', 'unit', 'baseline', 'ratio'))
+	for name, value in run['results'].items():
+		line = '{0:<40} {1:>14.1f} {2:<12}'.format(name, value, run['units'][name])
+		if name in relative:
+			line += ' {0:>14.1f} {1:>7.2f}x'.format(baseline['results'][name], relative[name])
+			if name in regressions:
+				line += '  REGRESSION'
+		print(line)
+	if baseline is not None:
+		missing = [name for name in run['results'] if name not in baseline['results']]
+		if missing:
+			print('Not in the baseline:', ', '.join(missing))
+		print('{0} regressions beyond {1:.0%}'.format(len(regressions), tolerance))
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	options = {'scale': 1.0, 'runs': DEFAULT_RUNS, 'save': None, 'compare': None, 'tolerance': DEFAULT_TOLERANCE,
+				'only': None}
+	for option, parse in [('scale', float), ('runs', int), ('save', str), ('compare', str), ('tolerance', float),
+							('only', str)]:
+		if '--' + option in args:
+			index = args.index('--' + option)
+			options[option] = parse(args[index + 1])
+			del args[index:index + 2]
+	if '--baseline' in args:
+		options['compare'] = BASELINE_FILENAME
+
+	benchmark = run_benchmark(options['scale'], options['only'], options['runs'])
+	reference = None
+	if options['compare'] is not None:
+		with open(options['compare']) as baseline_file:
+			reference = json.load(baseline_file)
+	print_report(benchmark, reference, options['tolerance'])
+
+	if options['save'] is not None:
+		with open(options['save'], 'w') as results_file:
+			json.dump(benchmark, results_file, indent=4)
+	if reference is not None and compare(benchmark, reference, options['tolerance']):
+		confirmed = confirm(benchmark, reference, options['tolerance'], options['scale'], options['runs'])
+		print('Confirmed on a second measurement:', ', '.join(confirmed) if confirmed else 'none')
+		if confirmed:
+			sys.exit(1)
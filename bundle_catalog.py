@@ -0,0 +1,254 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Catalog index over an archive of reporting bundles so that a time, device or event type filter only
+# has to decode the bundles that can match. Each bundle is scanned once for its device, sequence,
+# event timestamp range and event counts by event id. The index is a JSON lines file in the archive,
+# new bundles are appended to it and it is only rewritten when bundles change or are removed.
+#
+# Usage: python bundle_catalog.py <archive> [--device ID] [--start ISO] [--end ISO] [--event-id N ...]
+#                                 [--workers N]
+
+from verify_ion_file import build_catalog, iter_events
+from ingest_ion_files import find_files
+from reporting_events import *
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+import json
+import os
+import sys
+
+INDEX_FILENAME = 'bundle_catalog.jsonl'
+
+_EPOCH = datetime(1970, 1, 1)
+# The Ion catalog of each scanning process
+_ion_catalog = None
+
+
+def naive_utc(value: datetime) -> datetime:
+	if value.tzinfo is not None:
+		value = value.astimezone(timezone.utc)
+	# A plain naive datetime rather than the Ion Timestamp sub-class
+	return datetime(value.year, value.month, value.day, value.hour, value.minute, value.second, value.microsecond)
+
+
+def _micros(value: Union[datetime, None]) -> Union[int, None]:
+	if value is None:
+		return None
+	return (naive_utc(value) - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: Union[int, None]) -> Union[datetime, None]:
+	if value is None:
+		return None
+	return _EPOCH + timedelta(microseconds=value)
+
+
+@dataclass
+class CatalogEntry:
+	# Path relative to the archive
+	filename: str
+	size: int
+	mtime: float
+	device: Union[str, None]
+	sequence: Union[int, None] = None
+	# Naive UTC range of the event timestamps in the bundle
+	min_timestamp: Union[datetime, None] = None
+	max_timestamp: Union[datetime, None] = None
+	counts: Dict[int, int] = field(default_factory=dict)
+	# Set when the bundle could not be decoded, it is then matched on its device alone
+	error: Union[str, None] = None
+
+	def matches(self, device: str = None, start: datetime = None, end: datetime = None,
+				event_ids: Iterable[int] = None) -> bool:
+		if device is not None and self.device != device:
+			return False
+		if self.error is not None:
+			return True
+		if start is not None and (self.max_timestamp is None or self.max_timestamp < naive_utc(start)):
+			return False
+		if end is not None and (self.min_timestamp is None or self.min_timestamp > naive_utc(end)):
+			return False
+		if event_ids is not None and not any(event_id in self.counts for event_id in event_ids):
+			return False
+		return True
+
+	def to_record(self) -> Dict:
+		return {
+			'f': self.filename,
+			's': self.size,
+			'm': self.mtime,
+			'd': self.device,
+			'q': self.sequence,
+			't': [_micros(self.min_timestamp), _micros(self.max_timestamp)],
+			'c': {str(event_id): count for event_id, count in sorted(self.counts.items())},
+			'e': self.error,
+		}
+
+	@staticmethod
+	def from_record(record: Dict) -> 'CatalogEntry':
+		return CatalogEntry(
+			record['f'], record['s'], record['m'], record['d'], record['q'], _from_micros(record['t'][0]),
+			_from_micros(record['t'][1]), {int(event_id): count for event_id, count in record['c'].items()},
+			record['e'])
+
+
+def _device_from_filename(filename: str) -> Union[str, None]:
+	# Batch files are named <flush time>_<hw_client_id>.10n by the log manager
+	name = os.path.splitext(os.path.basename(filename))[0]
+	return name.split('_', 1)[1] if '_' in name else None
+
+
+def scan_bundle(filename: str, relative: str = None) -> CatalogEntry:
+	"""Stream one bundle and summarise it for the catalog."""
+	global _ion_catalog
+	if _ion_catalog is None:
+		_ion_catalog = build_catalog()
+
+	stat = os.stat(filename)
+	entry = CatalogEntry(relative or filename, stat.st_size, stat.st_mtime, _device_from_filename(filename))
+	try:
+		events = iter_events(filename, _ion_catalog)
+		header = next(events)
+		entry.device = header.hw_client_id
+		entry.sequence = header.sequence
+		for event in events:
+			timestamp = naive_utc(event.timestamp)
+			if entry.min_timestamp is None or timestamp < entry.min_timestamp:
+				entry.min_timestamp = timestamp
+			if entry.max_timestamp is None or timestamp > entry.max_timestamp:
+				entry.max_timestamp = timestamp
+			entry.counts[event.event_id] = entry.counts.get(event.event_id, 0) + 1
+	except Exception as e:
+		entry.error = '{0}: {1}'.format(type(e).__name__, str(e)[:200])
+	return entry
+
+
+def _scan(item: Tuple[str, str]) -> CatalogEntry:
+	return scan_bundle(*item)
+
+
+class BundleCatalog:
+	"""Index of the bundles in an archive directory, kept up to date with update()."""
+
+	def __init__(self, archive: str, index_path: str = None):
+		self.archive = archive
+		self.index_path = index_path or os.path.join(archive, INDEX_FILENAME)
+		self._entries: Dict[str, CatalogEntry] = {}
+		# Set when the index has superseded or unreadable records and should be rewritten
+		self._rewrite = False
+		self._load()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def _load(self):
+		if not os.path.exists(self.index_path):
+			return
+		with open(self.index_path, encoding='utf-8') as index_file:
+			for line in index_file:
+				line = line.strip()
+				if not line:
+					continue
+				try:
+					entry = CatalogEntry.from_record(json.loads(line))
+				except (ValueError, KeyError, TypeError, IndexError):
+					# A partly written last line, the bundle is rescanned by the next update
+					self._rewrite = True
+					continue
+				# Later records replace earlier ones for the same bundle
+				self._rewrite |= entry.filename in self._entries
+				self._entries[entry.filename] = entry
+
+	def _save(self):
+		temporary = self.index_path + '.tmp'
+		with open(temporary, 'w', encoding='utf-8') as index_file:
+			for entry in sorted(self._entries.values(), key=lambda item: item.filename):
+				index_file.write(json.dumps(entry.to_record(), separators=(',', ':')) + '\n')
+		os.replace(temporary, self.index_path)
+		self._rewrite = False
+
+	def _append(self, entries: List[CatalogEntry]):
+		with open(self.index_path, 'a', encoding='utf-8') as index_file:
+			for entry in entries:
+				index_file.write(json.dumps(entry.to_record(), separators=(',', ':')) + '\n')
+
+	def update(self, workers: int = 1) -> Dict[str, int]:
+		"""Scan the bundles that are new or have changed since the last update."""
+		present = {}
+		for filename in find_files([self.archive]):
+			present[os.path.relpath(filename, self.archive)] = filename
+
+		pending = []
+		changed = 0
+		for relative, filename in present.items():
+			entry = self._entries.get(relative)
+			stat = os.stat(filename)
+			if entry is not None and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+				continue
+			if entry is not None:
+				changed += 1
+			pending.append((filename, relative))
+		removed = [relative for relative in self._entries if relative not in present]
+
+		if workers > 1 and len(pending) > 1:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				entries = list(executor.map(_scan, pending, chunksize=max(1, len(pending) // (workers * 8))))
+		else:
+			entries = [_scan(item) for item in pending]
+
+		for relative in removed:
+			del self._entries[relative]
+		for entry in entries:
+			self._entries[entry.filename] = entry
+		if changed or removed or self._rewrite or not os.path.exists(self.index_path):
+			self._save()
+		elif entries:
+			self._append(entries)
+
+		return {'scanned': len(entries), 'changed': changed, 'removed': len(removed), 'bundles': len(self._entries)}
+
+	def entries(self) -> List[CatalogEntry]:
+		return sorted(self._entries.values(), key=lambda item: item.filename)
+
+	def lookup(self, device: str = None, start: datetime = None, end: datetime = None,
+				event_ids: Iterable[int] = None) -> List[str]:
+		"""Paths of the bundles that can hold events matching all of the given filters.
+
+		start and end are inclusive, naive datetimes are taken as UTC. Bundles that could not be
+		decoded are only filtered on their device.
+		"""
+		if event_ids is not None:
+			event_ids = set(event_ids)
+		matches = [entry for entry in self._entries.values() if entry.matches(device, start, end, event_ids)]
+		matches.sort(key=lambda item: (item.device or '', item.min_timestamp or _EPOCH, item.filename))
+		return [os.path.join(self.archive, entry.filename) for entry in matches]
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	filters = {}
+	worker_count = 1
+	event_id_filter = None
+	while '--event-id' in args:
+		index = args.index('--event-id')
+		event_id_filter = (event_id_filter or []) + [int(args[index + 1])]
+		del args[index:index + 2]
+	for option, parse in [('device', str), ('start', datetime.fromisoformat), ('end', datetime.fromisoformat),
+							('workers', int)]:
+		if '--' + option in args:
+			index = args.index('--' + option)
+			filters[option] = parse(args[index + 1])
+			del args[index:index + 2]
+	worker_count = filters.pop('workers', 1)
+
+	if len(args) != 1:
+		print('Usage: python bundle_catalog.py <archive> [--device ID] [--start ISO] [--end ISO] [--event-id N ...] '
+				'[--workers N]')
+		sys.exit(1)
+
+	catalog = BundleCatalog(args[0])
+	print('Catalog update:', catalog.update(worker_count))
+	for path in catalog.lookup(event_ids=event_id_filter, **filters):
+		print(path)
@@ -0,0 +1,187 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Optional compression of the .10n reporting bundles.
+# gzip is always available. zstd needs the zstandard module and can use a dictionary trained over a
+# sample of existing bundles, which suits the repetitive identity header and device context well.
+# The readers detect the format from the leading magic bytes so compressed and plain bundles can be
+# mixed in an archive. A bundle compressed with a dictionary needs that dictionary to be registered
+# or saved as zstd-<dictionary id>.zdict next to the bundle.
+
+from typing import BinaryIO, Dict, List, Union
+import gzip
+import io
+import mmap
+import os
+import zlib
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+DEFAULT_DICTIONARY_SIZE = 16 * 1024
+
+_dictionaries: Dict[int, 'zstandard.ZstdCompressionDict'] = {}
+
+
+def _require_zstandard():
+	if zstandard is None:
+		raise RuntimeError('zstd compression requires the zstandard module')
+
+
+def dictionary_filename(dictionary_id: int) -> str:
+	return 'zstd-{0}.zdict'.format(dictionary_id)
+
+
+def register_dictionary(data: bytes) -> int:
+	_require_zstandard()
+	dictionary = zstandard.ZstdCompressionDict(data)
+	_dictionaries[dictionary.dict_id()] = dictionary
+	return dictionary.dict_id()
+
+
+def load_dictionary(filename: str) -> int:
+	with open(filename, 'rb') as dictionary_file:
+		return register_dictionary(dictionary_file.read())
+
+
+def train_dictionary(filenames: List[str], size: int = DEFAULT_DICTIONARY_SIZE) -> bytes:
+	"""Train a zstd dictionary from a sample of existing uncompressed or compressed bundles."""
+	_require_zstandard()
+	samples = [read_bundle(filename) for filename in filenames]
+	return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+def _find_dictionary(dictionary_id: int, directory: str):
+	dictionary = _dictionaries.get(dictionary_id)
+	if dictionary is None:
+		filename = os.path.join(directory, dictionary_filename(dictionary_id))
+		if not os.path.exists(filename):
+			raise RuntimeError('zstd dictionary {0} is not available'.format(dictionary_id))
+		load_dictionary(filename)
+		dictionary = _dictionaries[dictionary_id]
+	return dictionary
+
+
+class BundleCompressor:
+	"""Compresses encoded bundles, an instance must only be used from one thread at a time."""
+
+	def __init__(self, method: str, level: int = None, dictionary: bytes = None):
+		if method not in [COMPRESSION_GZIP, COMPRESSION_ZSTD]:
+			raise ValueError('Unknown compression: ' + method)
+		if dictionary is not None and method != COMPRESSION_ZSTD:
+			raise ValueError('A dictionary is only used by zstd compression')
+		self.method = method
+		self.dictionary = dictionary
+		self.dictionary_id = None
+		if method == COMPRESSION_GZIP:
+			self._level = 6 if level is None else level
+			self._compressor = None
+		else:
+			_require_zstandard()
+			self._level = 3 if level is None else level
+			dictionary_data = None
+			if dictionary is not None:
+				self.dictionary_id = register_dictionary(dictionary)
+				dictionary_data = _dictionaries[self.dictionary_id]
+			self._compressor = zstandard.ZstdCompressor(level=self._level, dict_data=dictionary_data)
+
+	def compress(self, data: bytes) -> bytes:
+		if self._compressor is None:
+			# zlib rather than gzip.compress so that the header doesn't carry a timestamp
+			compressor = zlib.compressobj(self._level, zlib.DEFLATED, _GZIP_WBITS)
+			return compressor.compress(data) + compressor.flush()
+		return self._compressor.compress(data)
+
+	# Save the dictionary next to the bundles so the readers can find it
+	def save_dictionary(self, path: str):
+		if self.dictionary is None:
+			return
+		filename = os.path.join(path, dictionary_filename(self.dictionary_id))
+		if not os.path.exists(filename):
+			with open(filename + '.tmp', 'wb') as dictionary_file:
+				dictionary_file.write(self.dictionary)
+			os.replace(filename + '.tmp', filename)
+
+
+def compression_of(prefix: bytes) -> Union[str, None]:
+	"""The compression of a bundle from its leading bytes, None for a plain Ion bundle."""
+	if prefix.startswith(GZIP_MAGIC):
+		return COMPRESSION_GZIP
+	if prefix.startswith(ZSTD_MAGIC):
+		return COMPRESSION_ZSTD
+	return None
+
+
+def decompress(data: bytes, directory: str = '.') -> bytes:
+	method = compression_of(data[:4])
+	if method == COMPRESSION_GZIP:
+		return zlib.decompress(data, _GZIP_WBITS)
+	if method == COMPRESSION_ZSTD:
+		_require_zstandard()
+		dictionary_id = zstandard.get_frame_parameters(data).dict_id
+		dictionary = _find_dictionary(dictionary_id, directory) if dictionary_id else None
+		return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(data)
+	return data
+
+
+def read_bundle(filename: str) -> bytes:
+	with open(filename, 'rb') as bundle_file:
+		return decompress(bundle_file.read(), os.path.dirname(filename))
+
+
+def open_bundle(filename: str) -> BinaryIO:
+	"""Open a bundle for streaming whether or not it is compressed."""
+	bundle_file = open(filename, 'rb')
+	method = compression_of(bundle_file.peek(4)[:4])
+	if method is None:
+		return bundle_file
+	if method == COMPRESSION_GZIP:
+		bundle_file.close()
+		return gzip.open(filename, 'rb')
+
+	# Frames are small enough to decompress in one call, it also avoids keeping the file open
+	with bundle_file:
+		return io.BytesIO(decompress(bundle_file.read(), os.path.dirname(filename)))
+
+
+class MappedBundle:
+	"""Read-only memory map of a bundle with a file-like read that returns memoryview slices.
+
+	The Ion reader parses straight from the map and the blob values it returns are slices of it, so
+	pass the whole length as the reader buffer size to avoid joining chunks. The map is released when
+	the last of the slices is. A compressed bundle is decompressed into memory instead.
+	"""
+
+	def __init__(self, filename: str):
+		with open(filename, 'rb') as bundle_file:
+			if compression_of(bundle_file.read(4)) is not None:
+				bundle_file.seek(0)
+				self.view = memoryview(decompress(bundle_file.read(), os.path.dirname(filename)))
+			elif os.fstat(bundle_file.fileno()).st_size == 0:
+				self.view = memoryview(b'')
+			else:
+				# The map keeps its own handle so the file can be closed straight away
+				self.view = memoryview(mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ))
+		self._position = 0
+
+	def __len__(self):
+		return len(self.view)
+
+	def read(self, size: int = -1) -> memoryview:
+		start = self._position
+		self._position = len(self.view) if size < 0 else min(len(self.view), start + size)
+		return self.view[start:self._position]
+
+	def tell(self) -> int:
+		return self._position
+
+	def seek(self, position: int):
+		self._position = position
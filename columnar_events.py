@@ -0,0 +1,229 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Columnar (struct-of-arrays) export of decoded events for vectorised aggregation.
+# Each event type becomes an EventTable of column buffers keyed by the analytics symbol names:
+# integers and booleans are NumPy masked arrays (masked where the value is null), timestamps are
+# datetime64[us] with NaT for nulls, strings are dictionary encoded and blobs are object arrays.
+#
+# Usage: python columnar_events.py file.10n [file.10n ...]
+
+from reporting_events import *
+from dataclasses import dataclass
+from datetime import timedelta, timezone
+from operator import attrgetter
+from typing import Iterable, Iterator
+import numpy as np
+import sys
+
+COLUMN_INT = 'int'
+COLUMN_BOOL = 'bool'
+COLUMN_TIMESTAMP = 'timestamp'
+COLUMN_STRING = 'string'
+COLUMN_BYTES = 'bytes'
+
+_ANNOTATION_KINDS = {
+	int: COLUMN_INT,
+	bool: COLUMN_BOOL,
+	datetime: COLUMN_TIMESTAMP,
+	str: COLUMN_STRING,
+	bytes: COLUMN_BYTES,
+}
+
+# The device context id is the integer epoch of the device context event rather than a datetime
+_HEADER_KINDS = {
+	EVENT_ID: COLUMN_INT,
+	TIMESTAMP: COLUMN_TIMESTAMP,
+	APP_SESSION_ID: COLUMN_TIMESTAMP,
+	USAGE_SESSION_ID: COLUMN_TIMESTAMP,
+	PAGE_SESSION_ID: COLUMN_TIMESTAMP,
+	CONTEXT_EVENT_ID: COLUMN_INT,
+}
+
+
+class DictionaryColumn:
+	"""A string column held as int32 codes into the list of distinct values, -1 marks a null."""
+
+	def __init__(self, codes: np.ndarray, dictionary: List[str]):
+		self.codes = codes
+		self.dictionary = dictionary
+
+	def __len__(self):
+		return len(self.codes)
+
+	def __repr__(self):
+		return 'DictionaryColumn(length={0}, distinct={1})'.format(len(self.codes), len(self.dictionary))
+
+	def code(self, value: str) -> int:
+		try:
+			return self.dictionary.index(value)
+		except ValueError:
+			return -1
+
+	def equals(self, value: str) -> np.ndarray:
+		code = self.code(value)
+		if code < 0:
+			return np.zeros(len(self.codes), dtype=bool)
+		return self.codes == code
+
+	def counts(self) -> Dict[str, int]:
+		counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.dictionary))
+		return dict(zip(self.dictionary, counts.tolist()))
+
+	def decode(self) -> np.ndarray:
+		values = np.array(self.dictionary + [None], dtype=object)
+		return values[self.codes]
+
+
+@dataclass()
+class EventTable:
+	event_id: int
+	event_type: str
+	length: int
+	columns: Dict[str, Any]
+
+	def __len__(self):
+		return self.length
+
+	def __getitem__(self, symbol: str):
+		return self.columns[symbol]
+
+	def __contains__(self, symbol: str):
+		return symbol in self.columns
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NOT_A_TIME = np.iinfo(np.int64).min
+
+
+def column_kind(cls, item: EventField) -> Tuple[str, bool]:
+	"""The column kind for a schema field and whether the attribute holds an enumeration."""
+	if item.symbol in _HEADER_KINDS:
+		return _HEADER_KINDS[item.symbol], False
+	annotation = cls.__dataclass_fields__[item.attribute].type
+	if isinstance(annotation, type) and issubclass(annotation, Enum):
+		# Enumerations are exported as the value that is packed into the ION struct
+		return _ANNOTATION_KINDS.get(type(list(annotation)[0].value), COLUMN_BYTES), True
+	return _ANNOTATION_KINDS.get(annotation, COLUMN_BYTES), False
+
+
+def _utc_naive(value: datetime) -> datetime:
+	return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _masked_column(values: tuple, dtype, empty) -> np.ndarray:
+	if None not in values:
+		return np.ma.MaskedArray(np.array(values, dtype=dtype))
+	mask = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+	data = np.fromiter((empty if value is None else value for value in values), dtype=dtype, count=len(values))
+	return np.ma.MaskedArray(data, mask=mask)
+
+
+def _timestamp_column(values: tuple) -> np.ndarray:
+	# Going through integer microseconds is several times faster than numpy converting datetime objects
+	micros = np.fromiter(
+		(_NOT_A_TIME if value is None else
+			((value if value.tzinfo is None else _utc_naive(value)) - _EPOCH) // _MICROSECOND
+			for value in values),
+		dtype=np.int64, count=len(values))
+	return micros.view('datetime64[us]')
+
+
+def _dictionary_column(values: tuple) -> DictionaryColumn:
+	lookup: Dict[str, int] = {None: -1}
+	codes = np.fromiter((lookup.setdefault(value, len(lookup) - 1) for value in values), dtype=np.int32,
+		count=len(values))
+	del lookup[None]
+	return DictionaryColumn(codes, list(lookup))
+
+
+def build_column(kind: str, values: tuple, enumeration: bool = False):
+	if enumeration:
+		# Fields without an unpack conversion hold the raw value after decoding
+		values = tuple(value.value if isinstance(value, Enum) else value for value in values)
+	if kind == COLUMN_INT:
+		return _masked_column(values, np.int64, 0)
+	if kind == COLUMN_BOOL:
+		return _masked_column(values, np.bool_, False)
+	if kind == COLUMN_TIMESTAMP:
+		return _timestamp_column(values)
+	if kind == COLUMN_STRING:
+		return _dictionary_column(values)
+	column = np.empty(len(values), dtype=object)
+	column[:] = values
+	return column
+
+
+class _TableBuilder:
+
+	def __init__(self, cls):
+		self.cls = cls
+		schema = HEADER_SCHEMA + cls.schema
+		self.symbols = [item.symbol for item in schema]
+		self.kinds = [column_kind(cls, item) for item in schema]
+		self.getter = attrgetter(*[item.attribute for item in schema])
+		self.rows: List[tuple] = []
+
+	def build(self) -> EventTable:
+		columns = OrderedDict()
+		# Transpose the rows once rather than appending to a list per column for every event
+		for symbol, (kind, enumeration), values in zip(self.symbols, self.kinds, zip(*self.rows)):
+			columns[symbol] = build_column(kind, values, enumeration)
+		return EventTable(self.cls.get_event_id(), self.cls.__name__, len(self.rows), columns)
+
+
+class ColumnarExport:
+	"""Accumulates decoded events into per event type tables.
+
+	The identity header yielded by verify_ion_file.iter_events is ignored so the reader output can be
+	passed straight to extend().
+	"""
+
+	def __init__(self):
+		self._builders: Dict[type, _TableBuilder] = {}
+
+	def append(self, event: EventHeader):
+		builder = self._builders.get(type(event))
+		if builder is None:
+			builder = self._builders[type(event)] = _TableBuilder(type(event))
+		builder.rows.append(builder.getter(event))
+
+	def extend(self, events: Iterable[Union[IdentityHeader, EventHeader]]):
+		for event in events:
+			if isinstance(event, IdentityHeader):
+				continue
+			self.append(event)
+
+	def tables(self) -> Dict[int, EventTable]:
+		tables = {}
+		for builder in sorted(self._builders.values(), key=lambda item: item.cls.get_event_id()):
+			table = builder.build()
+			tables[table.event_id] = table
+		return tables
+
+
+def export_columns(events: Iterable[Union[IdentityHeader, EventHeader]]) -> Dict[int, EventTable]:
+	export = ColumnarExport()
+	export.extend(events)
+	return export.tables()
+
+
+def _iter_files(filenames: List[str]) -> Iterator[Union[IdentityHeader, EventHeader]]:
+	from verify_ion_file import build_catalog, iter_events
+	catalog = build_catalog()
+	for filename in filenames:
+		yield from iter_events(filename, catalog)
+
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+	start = datetime.utcnow()
+	event_tables = export_columns(_iter_files(sys.argv[1:]))
+	end = datetime.utcnow()
+	for event_table in event_tables.values():
+		print('{0:<30} {1:>8} rows {2:>4} columns'.format(event_table.event_type, len(event_table),
+			len(event_table.columns)))
+
+	stops = event_tables.get(EventHeader.VIEWING_STOP_EVENT)
+	if stops is not None:
+		print('Viewed duration:', stops[PLAYER_VIEWED_DURATION].sum(), 'seconds over', len(stops), 'views')
+	print('Export time:', end - start)
@@ -0,0 +1,306 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Query engine over .10n bundles that pushes the predicates and the projection down into the Ion reader.
+# The event id, the first field of every event, is read before anything else and events of any other
+# type are skipped by the reader without decoding them. The filtered fields are tested as soon as they
+# are read and the rest of a failing event is skipped. Only the selected fields are materialised.
+#
+#     rows = select('timestamp', 'program_id', 'player_viewed_duration') \
+#         .where(event_id=EventHeader.VIEWING_STOP_EVENT, timestamp=(start, end), program_id='FX0123456789') \
+#         .run('ion_files')
+#
+# Fields are named by the event attribute, for example program_id rather than metadata-programmeId.
+# The identity header attributes (hw_client_id, sequence, ...) can be used for events that don't
+# carry a field of the same name.
+
+from bundle_catalog import BundleCatalog, naive_utc
+from bundle_compression import open_bundle
+from ingest_ion_files import find_files
+from reporting_events import *
+from verify_ion_file import build_catalog
+from amazon.ion.core import IonEventType, IonType
+from amazon.ion.reader import blocking_reader, NEXT_EVENT, SKIP_EVENT
+from amazon.ion.reader_binary import binary_reader
+from amazon.ion.reader_managed import managed_reader
+from typing import Iterable, Iterator
+
+# The identity header attributes and their symbols
+IDENTITY_FIELDS = OrderedDict([
+	('sequence', SEQUENCE_ID),
+	('hw_version', DEVICE_VARIANT),
+	('hw_id', DEVICE_HW_ID),
+	('app_version', SOFTWARE_VERSION),
+	('hw_client_id', DEVICE_CDSN),
+	('hw_card_id', DEVICE_CA_CARD),
+	('ams_id', CUSTOMER_AMS_ID),
+	('ams_panel', CUSTOMER_AMS_PANEL),
+])
+
+_CONTAINER_START = IonEventType.CONTAINER_START
+_CONTAINER_END = IonEventType.CONTAINER_END
+
+
+def _raw(value):
+	# Filter values are compared with the packed values
+	if isinstance(value, Enum):
+		return value.value
+	if isinstance(value, datetime) and value.tzinfo is not None:
+		return naive_utc(value)
+	return value
+
+
+def _comparable(value):
+	if isinstance(value, datetime) and value.tzinfo is not None:
+		return naive_utc(value)
+	return value
+
+
+def build_predicate(condition) -> Callable[[Any], bool]:
+	"""A test of a packed field value from a where() condition.
+
+	A tuple is an inclusive (low, high) range where either end can be None, a list or set tests
+	membership, a callable is called with the packed value and anything else tests equality.
+	"""
+	if callable(condition) and not isinstance(condition, Enum):
+		return condition
+	if isinstance(condition, tuple):
+		low, high = _raw(condition[0]), _raw(condition[1])
+
+		def between(value) -> bool:
+			if value is None:
+				return False
+			value = _comparable(value)
+			return (low is None or value >= low) and (high is None or value <= high)
+		return between
+	if isinstance(condition, (list, set, frozenset)):
+		members = frozenset(_raw(item) for item in condition)
+		return lambda value: _comparable(value) in members
+	expected = _raw(condition)
+	return lambda value: _comparable(value) == expected
+
+
+@dataclass
+class _Slot:
+	attribute: str
+	unpack: Union[Callable, None]
+	predicate: Union[Callable, None]
+
+
+class _Plan:
+	"""The fields to read and test for one event type."""
+
+	def __init__(self, cls, fields: List[str], filters: Dict[str, Callable]):
+		schema = {item.attribute: item for item in HEADER_SCHEMA + cls.schema}
+		self.event_id = cls.get_event_id()
+		self.fields = fields
+		self.valid = True
+		# Event fields read from the struct keyed by symbol and by attribute
+		self.slots: Dict[str, _Slot] = {}
+		self.attributes: Dict[str, _Slot] = {}
+		# Identity header fields keyed by attribute
+		self.header_fields: Dict[str, str] = {}
+		self.header_predicates: Dict[str, Callable] = {}
+		self.predicate_count = 0
+
+		for attribute in set(fields) | set(filters):
+			predicate = filters.get(attribute)
+			item = schema.get(attribute)
+			if item is not None:
+				if attribute == 'event_id':
+					continue
+				slot = _Slot(attribute, item.unpack, predicate)
+				self.slots[item.symbol] = slot
+				self.attributes[attribute] = slot
+				if predicate is not None:
+					self.predicate_count += 1
+			elif attribute in IDENTITY_FIELDS:
+				if attribute in fields:
+					self.header_fields[attribute] = IDENTITY_FIELDS[attribute]
+				if predicate is not None:
+					self.header_predicates[IDENTITY_FIELDS[attribute]] = predicate
+			elif predicate is not None:
+				# The event type doesn't carry a filtered field so none of its events can match
+				self.valid = False
+
+	def header_matches(self, header: Dict[str, Any]) -> bool:
+		return all(predicate(header.get(symbol)) for symbol, predicate in self.header_predicates.items())
+
+
+class EventQuery:
+	"""A selection of event fields filtered by where() conditions, built with select()."""
+
+	def __init__(self, fields: Iterable[str] = ()):
+		self._fields = list(fields)
+		self._filters: Dict[str, Callable] = {}
+		self._conditions: Dict[str, Any] = {}
+		self._event_ids: Union[frozenset, None] = None
+		known = set(IDENTITY_FIELDS) | {item.attribute for cls in event_classes() for item in HEADER_SCHEMA + cls.schema}
+		self._known = known
+		for name in self._fields:
+			if name not in known:
+				raise ValueError('Unknown event field: ' + name)
+
+	def where(self, **conditions) -> 'EventQuery':
+		for name, condition in conditions.items():
+			if name == 'event_id':
+				self._event_ids = frozenset(condition) if isinstance(condition, (list, set, frozenset, tuple)) \
+					else frozenset([condition])
+				continue
+			if name not in self._known:
+				raise ValueError('Unknown event field: ' + name)
+			self._filters[name] = build_predicate(condition)
+			self._conditions[name] = condition
+		return self
+
+	def _plans(self) -> Dict[int, _Plan]:
+		# Without a selection every field of the event is returned
+		plans = {}
+		for cls in event_classes():
+			event_id = cls.get_event_id()
+			if self._event_ids is not None and event_id not in self._event_ids:
+				continue
+			fields = self._fields or [item.attribute for item in HEADER_SCHEMA + cls.schema]
+			plan = _Plan(cls, fields, self._filters)
+			if plan.valid:
+				plans[event_id] = plan
+		return plans
+
+	def _files(self, source: Union[str, List[str], BundleCatalog]) -> List[str]:
+		if not isinstance(source, BundleCatalog):
+			return find_files([source] if isinstance(source, str) else list(source))
+
+		# Prune the bundles with the catalog where the conditions allow it
+		device = self._conditions.get('hw_client_id')
+		start = end = None
+		timestamp = self._conditions.get('timestamp')
+		if isinstance(timestamp, tuple):
+			start, end = timestamp
+		elif isinstance(timestamp, datetime):
+			start = end = timestamp
+		return source.lookup(device if isinstance(device, str) else None, start, end, self._event_ids)
+
+	def run(self, source: Union[str, List[str], BundleCatalog]) -> Iterator[Dict[str, Any]]:
+		"""Yield a row per matching event, keyed by field name in the selected order.
+
+		source is a directory, glob or list of them, or a BundleCatalog to prune the bundles with.
+		"""
+		plans = self._plans()
+		if not plans:
+			return
+		catalog = build_catalog()
+		for filename in self._files(source):
+			yield from self._run_file(filename, plans, catalog)
+
+	def count(self, source: Union[str, List[str], BundleCatalog]) -> int:
+		return sum(1 for _ in self.run(source))
+
+	@staticmethod
+	def _skip_value(reader, event):
+		if event.event_type is _CONTAINER_START:
+			reader.send(SKIP_EVENT)
+
+	def _run_file(self, filename: str, plans: Dict[int, _Plan], catalog) -> Iterator[Dict[str, Any]]:
+		with open_bundle(filename) as read_file:
+			reader = blocking_reader(managed_reader(binary_reader(), catalog), read_file)
+			event = reader.send(NEXT_EVENT)
+			if event.event_type is not _CONTAINER_START or event.ion_type is not IonType.STRUCT:
+				raise RuntimeError("ION format is incorrect")
+
+			# The identity header fields are packed ahead of the event list
+			header = {}
+			event = reader.send(NEXT_EVENT)
+			while event.event_type is not _CONTAINER_END:
+				name = event.field_name.text
+				if name != EVENT_LIST:
+					if event.event_type is _CONTAINER_START:
+						self._skip_value(reader, event)
+					else:
+						value = event.value
+						header[name] = bytes(value) if event.ion_type is IonType.BLOB and value is not None else value
+					event = reader.send(NEXT_EVENT)
+					continue
+
+				active = {event_id: plan for event_id, plan in plans.items() if plan.header_matches(header)}
+				if not active:
+					reader.send(SKIP_EVENT)
+				else:
+					yield from self._run_events(reader, active, header)
+				event = reader.send(NEXT_EVENT)
+
+	@staticmethod
+	def _run_events(reader, plans: Dict[int, _Plan], header: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+		event = reader.send(NEXT_EVENT)
+		while event.event_type is not _CONTAINER_END:
+			if event.event_type is not _CONTAINER_START or event.ion_type is not IonType.STRUCT:
+				raise RuntimeError("ION format is incorrect")
+
+			# The event id is always the first field of an event
+			event = reader.send(NEXT_EVENT)
+			if event.event_type is _CONTAINER_END:
+				event = reader.send(NEXT_EVENT)
+				continue
+			if event.field_name.text != EVENT_ID:
+				raise RuntimeError("ION format is incorrect, the event id is not the first field")
+			plan = plans.get(event.value)
+			if plan is None:
+				reader.send(SKIP_EVENT)
+				event = reader.send(NEXT_EVENT)
+				continue
+
+			values = {'event_id': plan.event_id}
+			tested = 0
+			matched = True
+			slots = plan.slots
+			event = reader.send(NEXT_EVENT)
+			while event.event_type is not _CONTAINER_END:
+				slot = slots.get(event.field_name.text)
+				if slot is None:
+					if event.event_type is _CONTAINER_START:
+						reader.send(SKIP_EVENT)
+					event = reader.send(NEXT_EVENT)
+					continue
+
+				if event.event_type is _CONTAINER_START:
+					# Events don't nest containers, they are passed over rather than materialised
+					reader.send(SKIP_EVENT)
+					value = None
+				else:
+					value = event.value
+					if event.ion_type is IonType.BLOB and value is not None:
+						value = bytes(value)
+				if slot.predicate is not None:
+					tested += 1
+					if not slot.predicate(value):
+						matched = False
+						reader.send(SKIP_EVENT)
+						break
+				values[slot.attribute] = value
+				event = reader.send(NEXT_EVENT)
+
+			if matched and tested < plan.predicate_count:
+				# Optional fields that were left out of the struct are tested as None
+				for slot in slots.values():
+					if slot.predicate is not None and slot.attribute not in values and not slot.predicate(None):
+						matched = False
+						break
+
+			if matched:
+				row = OrderedDict()
+				for name in plan.fields:
+					if name in values:
+						value = values[name]
+						slot = plan.attributes.get(name)
+						if value is not None and slot is not None and slot.unpack is not None:
+							value = slot.unpack(value)
+						row[name] = value
+					elif name in plan.header_fields:
+						row[name] = header.get(plan.header_fields[name])
+					else:
+						row[name] = None
+				yield row
+			event = reader.send(NEXT_EVENT)
+
+
+def select(*fields: str) -> EventQuery:
+	"""Start a query returning the given event fields, or every field of the event when none are given."""
+	return EventQuery(fields)
@@ -0,0 +1,156 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Bounded event queue between the application threads and the LogManager consumer thread.
+# Producers can push a burst of events under a single lock acquisition and the consumer drains
+# everything that is queued in one call. When the queue is full the overflow policy decides
+# whether the producer waits, an event is dropped or the event is spilled to a temporary file.
+# A timed queue also keeps the enqueue time of every event for the queue wait statistics.
+
+from collections import deque
+from threading import Condition
+from typing import Iterable, List, Dict, Any
+import pickle
+import tempfile
+import time
+
+
+class EventQueue:
+	# Overflow policies applied when the queue is at capacity
+	OVERFLOW_BLOCK = 'block'
+	OVERFLOW_DROP_OLDEST = 'drop-oldest'
+	OVERFLOW_DROP_NEWEST = 'drop-newest'
+	OVERFLOW_SPILL = 'spill'
+
+	def __init__(self, capacity: int = 20, overflow: str = OVERFLOW_BLOCK, spill_path: str = None,
+					timed: bool = False):
+		if capacity < 1:
+			raise ValueError('Queue capacity must be at least one')
+		if overflow not in [EventQueue.OVERFLOW_BLOCK, EventQueue.OVERFLOW_DROP_OLDEST,
+							EventQueue.OVERFLOW_DROP_NEWEST, EventQueue.OVERFLOW_SPILL]:
+			raise ValueError('Unknown overflow policy: ' + overflow)
+		self._capacity = capacity
+		self._overflow = overflow
+		self._spill_path = spill_path
+		# Timed queues hold (perf_counter at enqueue, event) pairs
+		self._timed = timed
+		self._queue = deque()
+		self._lock = Condition()
+		self._not_full = Condition(self._lock)
+		self._not_empty = Condition(self._lock)
+
+		# Spilled events are pickled to a temporary file and read back in order once the
+		# in-memory queue has drained. While any are pending new events are also spilled.
+		self._spill_file = None
+		self._spill_read = 0
+		self._spill_pending = 0
+
+		self.counters: Dict[str, int] = {
+			'enqueued': 0,
+			'dequeued': 0,
+			'blocked': 0,
+			'dropped_oldest': 0,
+			'dropped_newest': 0,
+			'spilled': 0,
+		}
+
+	def __len__(self):
+		with self._lock:
+			return len(self._queue) + self._spill_pending
+
+	def put(self, event, overflow: str = None):
+		with self._lock:
+			self._put(event, overflow or self._overflow)
+			self._not_empty.notify()
+
+	def put_many(self, events: Iterable[Any], overflow: str = None):
+		overflow = overflow or self._overflow
+		with self._lock:
+			for event in events:
+				self._put(event, overflow)
+				# Let the consumer start on the burst if this producer has to wait for space
+				if overflow == EventQueue.OVERFLOW_BLOCK and len(self._queue) >= self._capacity:
+					self._not_empty.notify()
+			self._not_empty.notify()
+
+	def _put(self, event, overflow: str):
+		if self._timed:
+			event = (time.perf_counter(), event)
+		if self._spill_pending > 0 and self._overflow == EventQueue.OVERFLOW_SPILL:
+			# Keep the stream in order behind the events already on disk
+			self._spill(event)
+			return
+
+		if len(self._queue) >= self._capacity:
+			if overflow == EventQueue.OVERFLOW_BLOCK:
+				self.counters['blocked'] += 1
+				while len(self._queue) >= self._capacity:
+					self._not_full.wait()
+			elif overflow == EventQueue.OVERFLOW_DROP_OLDEST:
+				self._queue.popleft()
+				self.counters['dropped_oldest'] += 1
+			elif overflow == EventQueue.OVERFLOW_DROP_NEWEST:
+				self.counters['dropped_newest'] += 1
+				return
+			else:
+				self._spill(event)
+				return
+
+		self._queue.append(event)
+		self.counters['enqueued'] += 1
+
+	def _spill(self, event):
+		if self._spill_file is None:
+			self._spill_file = tempfile.TemporaryFile(prefix='spill_', suffix='.pkl', dir=self._spill_path)
+		self._spill_file.seek(0, 2)
+		pickle.dump(event, self._spill_file, pickle.HIGHEST_PROTOCOL)
+		self._spill_pending += 1
+		self.counters['spilled'] += 1
+
+	def _unspill(self):
+		# Refill the in-memory queue from the oldest spilled events
+		self._spill_file.seek(self._spill_read)
+		while self._spill_pending > 0 and len(self._queue) < self._capacity:
+			self._queue.append(pickle.load(self._spill_file))
+			self._spill_pending -= 1
+		self._spill_read = self._spill_file.tell()
+		if self._spill_pending == 0:
+			self._spill_file.seek(0)
+			self._spill_file.truncate()
+			self._spill_read = 0
+
+	def get_many(self, timeout: float = None, stamps: List[float] = None) -> List[Any]:
+		"""Returns all of the queued events, waiting up to timeout seconds for the first one.
+
+		An empty list is returned when the timeout expires. The enqueue times of a timed queue are
+		appended to stamps when it is given.
+		"""
+		with self._lock:
+			if not self._queue and self._spill_pending == 0:
+				if timeout is None:
+					while not self._queue and self._spill_pending == 0:
+						self._not_empty.wait()
+				else:
+					deadline = time.monotonic() + timeout
+					while not self._queue and self._spill_pending == 0:
+						remaining = deadline - time.monotonic()
+						if remaining <= 0:
+							return []
+						self._not_empty.wait(remaining)
+
+			if not self._queue:
+				self._unspill()
+			events = list(self._queue)
+			self._queue.clear()
+			self.counters['dequeued'] += len(events)
+			self._not_full.notify_all()
+		if self._timed:
+			if stamps is not None:
+				stamps.extend(stamp for stamp, _ in events)
+			events = [event for _, event in events]
+		return events
+
+	def close(self):
+		with self._lock:
+			if self._spill_file is not None:
+				self._spill_file.close()
+				self._spill_file = None
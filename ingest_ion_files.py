@@ -0,0 +1,141 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Bulk ingest of reporting bundles. The files are fanned out across a process pool where each
+# worker builds the shared symbol table catalog once and streams its files through iter_events.
+#
+# Usage: python ingest_ion_files.py <directory or glob> [...] [--workers N] [--mmap]
+#                                   [--profile cprofile|tracemalloc [--profile-threshold S] ...]
+#
+# The --profile options of batch_profiler capture the decode of selected files, counted per worker.
+
+from verify_ion_file import build_catalog, iter_events
+from batch_profiler import BatchProfiler, STAGE_DECODE, profiler_options
+from reporting_events import *
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from typing import Dict
+import glob
+import os
+import sys
+import time
+
+# The catalog owned by each worker process, whether it parses memory-mapped files in place and
+# its profiler
+_catalog = None
+_zero_copy = False
+_profiler = None
+
+
+def _init_worker(zero_copy: bool = False, profiler: BatchProfiler = None):
+	global _catalog, _zero_copy, _profiler
+	_catalog = build_catalog()
+	_zero_copy = zero_copy
+	_profiler = profiler
+
+
+# Counts in place so that the events before a decode error are still reported
+def _count_events(filename: str, counts: Counter):
+	events = iter_events(filename, _catalog, _zero_copy)
+	next(events)
+	for event in events:
+		counts[event.event_id] += 1
+
+
+def ingest_file(filename: str) -> Dict:
+	if _catalog is None:
+		_init_worker()
+
+	start = time.perf_counter()
+	counts = Counter()
+	error = None
+	try:
+		if _profiler is not None:
+			_profiler.run(filename, STAGE_DECODE, _count_events, filename, counts)
+		else:
+			_count_events(filename, counts)
+	except Exception as e:
+		error = '{0}: {1}'.format(type(e).__name__, str(e)[:200])
+
+	return {
+		'filename': filename,
+		'events': counts,
+		'error': error,
+		'seconds': time.perf_counter() - start
+	}
+
+
+def find_files(paths: List[str]) -> List[str]:
+	files = []
+	for path in paths:
+		if os.path.isdir(path):
+			files.extend(glob.glob(os.path.join(path, '*.10n')))
+		else:
+			files.extend(glob.glob(path))
+	return sorted(set(files))
+
+
+def ingest(paths: List[str], workers: int = None, zero_copy: bool = False, profiler: BatchProfiler = None) -> Dict:
+	files = find_files(paths)
+	workers = workers or os.cpu_count() or 1
+	# Hand out work in chunks so the per-file IPC overhead doesn't dominate for small bundles
+	chunk_size = max(1, len(files) // (workers * 8))
+
+	start = time.perf_counter()
+	results = []
+	if len(files) > 0:
+		with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(zero_copy, profiler)) as executor:
+			results = list(executor.map(ingest_file, files, chunksize=chunk_size))
+	elapsed = time.perf_counter() - start
+
+	counts = Counter()
+	for result in results:
+		counts.update(result['events'])
+
+	return {
+		'files': len(files),
+		'workers': workers,
+		'events': counts,
+		'errors': [(result['filename'], result['error']) for result in results if result['error'] is not None],
+		'results': results,
+		'seconds': elapsed,
+		'files_per_sec': len(files) / elapsed if elapsed > 0 else 0.0
+	}
+
+
+def print_summary(summary: Dict):
+	classes = EventFactory().classes
+	print('Files:', summary['files'], 'Workers:', summary['workers'])
+	print('Events:', sum(summary['events'].values()))
+	for event_id, count in sorted(summary['events'].items()):
+		cls = classes[event_id] if 0 <= event_id < len(classes) else None
+		name = cls.__name__ if cls is not None else 'Unknown'
+		print('  {0:>3} {1:<30} {2}'.format(event_id, name, count))
+	print('Decode errors:', len(summary['errors']))
+	for filename, error in summary['errors']:
+		print('  ', filename, error)
+	print('Ingest time: {0:.3f}s ({1:.1f} files/sec)'.format(summary['seconds'], summary['files_per_sec']))
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	worker_count = None
+	if '--workers' in args:
+		index = args.index('--workers')
+		worker_count = int(args[index + 1])
+		del args[index:index + 2]
+
+	mapped = '--mmap' in args
+	if mapped:
+		args.remove('--mmap')
+	try:
+		decode_profiler = profiler_options(args)
+	except ValueError as error:
+		print(error)
+		args = []
+
+	if len(args) > 0:
+		print_summary(ingest(args, worker_count, mapped, decode_profiler))
+	else:
+		print('Usage: python ingest_ion_files.py <directory or glob> [...] [--workers N] [--mmap]')
+		print('                                   [--profile cprofile|tracemalloc [--profile-threshold S] ...]')
+		sys.exit(1)
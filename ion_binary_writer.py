@@ -0,0 +1,313 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# A binary Ion writer that only caters to the requirements of the Foxtel reporting specification.
+# It follows the field classes in c_proto/ion_binary_writer.cpp but encodes directly into a bytearray
+# from the packed OrderedDict batch rather than generating a stream of Ion events for simpleion.
+# The output is byte-identical to simpleion.dump(..., imports=[...], binary=True) so either encoder
+# can be used to produce reporting bundles.
+
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Dict, Callable, Any
+from amazon.ion import symbols
+from amazon.ion.simple_types import IonPyNull
+from amazon.ion.core import Timestamp, TimestampPrecision, TIMESTAMP_PRECISION_FIELD, \
+	TIMESTAMP_FRACTIONAL_SECONDS_FIELD
+from amazon.ion.symbols import SID_ION_SYMBOL_TABLE, SID_IMPORTS, SID_SYMBOLS, SID_NAME, SID_VERSION, SID_MAX_ID
+import struct
+import math
+
+# Binary typed value identifiers (high nibble of the type descriptor)
+ION_NULL = 0x00
+ION_BOOL = 0x10
+ION_POS_INT = 0x20
+ION_NEG_INT = 0x30
+ION_FLOAT = 0x40
+ION_TIMESTAMP = 0x60
+ION_STRING = 0x80
+ION_BLOB = 0xA0
+ION_LIST = 0xB0
+ION_STRUCT = 0xD0
+ION_ANNOTATION = 0xE0
+
+ION_VERSION_MARKER = b'\xe0\x01\x00\xea'
+
+_LENGTH_FIELD_THRESHOLD = 14
+_LENGTH_FIELD_INDICATOR = 0x0E
+_NULL_INDICATOR = 0x0F
+_VAR_INT_NEG_ZERO = 0xC0
+_INT_NEG_ZERO = 0x80
+_MICROSECOND_EXPONENT = -6
+
+
+def var_uint(value: int) -> bytearray:
+	buf = bytearray([(value & 0x7F) | 0x80])
+	value >>= 7
+	while value:
+		buf.append(value & 0x7F)
+		value >>= 7
+	buf.reverse()
+	return buf
+
+
+def var_int(value: int) -> bytearray:
+	sign = 0x40 if value < 0 else 0
+	magnitude = -value if value < 0 else value
+	buf = bytearray([magnitude & 0x7F])
+	magnitude >>= 7
+	while magnitude:
+		buf.append(magnitude & 0x7F)
+		magnitude >>= 7
+	# The most significant octet only has six value bits as it also carries the sign
+	if buf[-1] & 0x40:
+		buf.append(0)
+	buf[-1] |= sign
+	buf[0] |= 0x80
+	buf.reverse()
+	return buf
+
+
+def ion_uint(value: int) -> bytes:
+	return value.to_bytes((value.bit_length() + 7) // 8, 'big')
+
+
+def ion_int(value: int) -> bytearray:
+	magnitude = -value if value < 0 else value
+	# Reserve room for the sign bit in the most significant octet
+	buf = bytearray(magnitude.to_bytes(magnitude.bit_length() // 8 + 1, 'big'))
+	if value < 0:
+		buf[0] |= 0x80
+	return buf
+
+
+def typed_field(buf: bytearray, type_id: int, length: int):
+	if length < _LENGTH_FIELD_THRESHOLD:
+		buf.append(type_id | length)
+	else:
+		buf.append(type_id | _LENGTH_FIELD_INDICATOR)
+		buf += var_uint(length)
+
+
+def struct_field(buf: bytearray, length: int):
+	# Non-empty structs always carry a VarUInt length so a length of one is never read as a sorted struct
+	if length == 0:
+		buf.append(ION_STRUCT)
+	else:
+		buf.append(ION_STRUCT | _LENGTH_FIELD_INDICATOR)
+		buf += var_uint(length)
+
+
+class IonBinaryWriter:
+	"""Encodes packed reporting batches straight to binary Ion.
+
+	Field names are resolved against the imported shared symbol tables once, up front, so encoding a
+	field is a dictionary lookup of its pre-built symbol identifier. Names that are not in the imports
+	are appended to the local symbol table exactly as simpleion does.
+	"""
+
+	def __init__(self, imports: List[symbols.SymbolTable]):
+		self._imports = imports
+		self._local_symbols = symbols.SymbolTable(symbols.LOCAL_TABLE_TYPE, [], imports=imports)
+		self._max_id = self._local_symbols.max_id
+		self._field_ids: Dict[str, bytes] = {}
+		for table in imports:
+			for token in table:
+				if token.text is not None and token.text not in self._field_ids:
+					self._field_ids[token.text] = bytes(var_uint(self._local_symbols.get(token.text).sid))
+		self._symbol_table_imports = self._pack_imports()
+		self._encoders: Dict[type, Callable[[bytearray, Any], None]] = {
+			type(None): self._write_null,
+			IonPyNull: self._write_null,
+			bool: self._write_bool,
+			int: self._write_int,
+			float: self._write_float,
+			str: self._write_string,
+			bytes: self._write_blob,
+			bytearray: self._write_blob,
+			datetime: self._write_timestamp,
+			Timestamp: self._write_timestamp,
+			list: self._write_list,
+			tuple: self._write_list,
+			dict: self._write_struct,
+		}
+		# Per call state for any field names missing from the imported symbol tables
+		self._local_ids: Dict[str, bytes] = {}
+		self._local_names: List[str] = []
+
+	def _pack_imports(self) -> bytearray:
+		imports = bytearray()
+		for table in self._imports:
+			entry = bytearray()
+			entry += var_uint(SID_NAME)
+			self._write_string(entry, table.name)
+			entry += var_uint(SID_VERSION)
+			self._write_int(entry, table.version)
+			entry += var_uint(SID_MAX_ID)
+			self._write_int(entry, table.max_id)
+			struct_field(imports, len(entry))
+			imports += entry
+
+		field = var_uint(SID_IMPORTS)
+		typed_field(field, ION_LIST, len(imports))
+		return field + imports
+
+	def _pack_symbol_table(self) -> bytearray:
+		local_symbols = bytearray()
+		for name in self._local_names:
+			self._write_string(local_symbols, name)
+
+		content = bytearray(self._symbol_table_imports)
+		content += var_uint(SID_SYMBOLS)
+		typed_field(content, ION_LIST, len(local_symbols))
+		content += local_symbols
+
+		value = bytearray()
+		struct_field(value, len(content))
+		value += content
+
+		annotations = var_uint(SID_ION_SYMBOL_TABLE)
+		wrapper = var_uint(len(annotations))
+		wrapper += annotations
+		buf = bytearray()
+		typed_field(buf, ION_ANNOTATION, len(wrapper) + len(value))
+		buf += wrapper
+		buf += value
+		return buf
+
+	def dumps(self, value) -> bytes:
+		self._local_ids = {}
+		self._local_names = []
+		body = bytearray()
+		self._write_value(body, value)
+		return ION_VERSION_MARKER + self._pack_symbol_table() + body
+
+	def dump(self, value, fp):
+		fp.write(self.dumps(value))
+
+	def _field_id(self, name: str) -> bytes:
+		field_id = self._field_ids.get(name)
+		if field_id is None:
+			field_id = self._local_ids.get(name)
+			if field_id is None:
+				self._local_names.append(name)
+				field_id = bytes(var_uint(self._max_id + len(self._local_names)))
+				self._local_ids[name] = field_id
+		return field_id
+
+	def _write_value(self, buf: bytearray, value):
+		encoder = self._encoders.get(type(value))
+		if encoder is None:
+			encoder = self._find_encoder(type(value))
+		encoder(buf, value)
+
+	def _find_encoder(self, value_type: type):
+		# Resolve sub-classes (IntEnum, OrderedDict, IonPy types) the same way simpleion does
+		types = [value_type]
+		while types:
+			current = types.pop()
+			if current in self._encoders:
+				self._encoders[value_type] = self._encoders[current]
+				return self._encoders[current]
+			types.extend(current.__bases__)
+
+		raise TypeError('Unknown scalar type %r' % (value_type,))
+
+	@staticmethod
+	def _write_null(buf: bytearray, value):
+		buf.append(ION_NULL | _NULL_INDICATOR)
+
+	@staticmethod
+	def _write_bool(buf: bytearray, value: bool):
+		buf.append(ION_BOOL | (1 if value else 0))
+
+	@staticmethod
+	def _write_int(buf: bytearray, value: int):
+		if value == 0:
+			buf.append(ION_POS_INT)
+			return
+		if value < 0:
+			type_id = ION_NEG_INT
+			value = -value
+		else:
+			type_id = ION_POS_INT
+		magnitude = ion_uint(value)
+		typed_field(buf, type_id, len(magnitude))
+		buf += magnitude
+
+	@staticmethod
+	def _write_float(buf: bytearray, value: float):
+		if value == 0.0 and math.copysign(1.0, value) > 0:
+			buf.append(ION_FLOAT)
+		else:
+			buf.append(ION_FLOAT | 0x08)
+			buf += struct.pack('>d', value)
+
+	@staticmethod
+	def _write_string(buf: bytearray, value: str):
+		data = value.encode('utf-8')
+		typed_field(buf, ION_STRING, len(data))
+		buf += data
+
+	@staticmethod
+	def _write_blob(buf: bytearray, value: bytes):
+		typed_field(buf, ION_BLOB, len(value))
+		buf += value
+
+	@staticmethod
+	def _write_decimal_value(buf: bytearray, exponent: int, coefficient: int, sign: int = 0):
+		buf += var_int(exponent)
+		if coefficient:
+			buf += ion_int(coefficient)
+		elif sign:
+			buf.append(_INT_NEG_ZERO)
+
+	def _write_timestamp(self, buf: bytearray, value: datetime):
+		precision = getattr(value, TIMESTAMP_PRECISION_FIELD, TimestampPrecision.SECOND)
+		if precision is None:
+			precision = TimestampPrecision.SECOND
+		content = bytearray()
+		dt = value
+		if dt.tzinfo is None:
+			# Unknown local offset
+			content.append(_VAR_INT_NEG_ZERO)
+		else:
+			offset = dt.utcoffset()
+			dt -= offset
+			content += var_int(int(offset.total_seconds() // 60))
+		content += var_uint(dt.year)
+		if precision.includes_month:
+			content += var_uint(dt.month)
+		if precision.includes_day:
+			content += var_uint(dt.day)
+		if precision.includes_minute:
+			content += var_uint(dt.hour)
+			content += var_uint(dt.minute)
+		if precision.includes_second:
+			content += var_uint(dt.second)
+			if isinstance(value, Timestamp):
+				fractional_seconds: Decimal = getattr(value, TIMESTAMP_FRACTIONAL_SECONDS_FIELD, None)
+				if fractional_seconds is not None:
+					sign, digits, exponent = fractional_seconds.as_tuple()
+					coefficient = int(fractional_seconds.scaleb(-exponent).to_integral_value())
+					if coefficient != 0 or exponent < 0:
+						self._write_decimal_value(content, exponent, coefficient, sign)
+			else:
+				self._write_decimal_value(content, _MICROSECOND_EXPONENT, dt.microsecond)
+
+		typed_field(buf, ION_TIMESTAMP, len(content))
+		buf += content
+
+	def _write_list(self, buf: bytearray, value: list):
+		content = bytearray()
+		for item in value:
+			self._write_value(content, item)
+		typed_field(buf, ION_LIST, len(content))
+		buf += content
+
+	def _write_struct(self, buf: bytearray, value: dict):
+		content = bytearray()
+		for name, item in value.items():
+			content += self._field_id(name)
+			self._write_value(content, item)
+		struct_field(buf, len(content))
+		buf += content
@@ -2,47 +2,174 @@
 #  Last modified 17/6/19, 9:07 am
 #  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
 
+# Streaming export of 10n bundles to newline delimited JSON. Each bundle is written as one compact
+# JSON line for the identity header, without the event list, followed by one line per event. The
+# values are converted from the Ion reader events as they are read, so memory use does not depend
+# on the size of a bundle or the number of bundles.
+#
+# Usage: python jsonify_ion.py <bundle, directory or glob> [...] [--output FILE] [--echo] [--mmap]
+#
+# Without --output every bundle is written to <bundle>.ndjson alongside it. --echo also writes the
+# lines to stdout and --output - writes them to stdout alone.
+
 from reporting_events import *
+from amazon.ion import symbols as ion_symbols
+from amazon.ion.core import IonEventType, IonType
+from amazon.ion.reader import blocking_reader, NEXT_EVENT
+from amazon.ion.reader_binary import binary_reader
+from amazon.ion.reader_managed import managed_reader
+from bundle_compression import open_bundle, MappedBundle
+from ingest_ion_files import find_files
+from verify_ion_file import build_catalog
+from datetime import timezone
+from typing import Iterator, TextIO
 import json
-from amazon.ion import symbols as ion_symbols, simpleion, simple_types, core as ion_core
 import sys
-import six
-from datetime import timezone
 
 
-class JSONEncoderForIonTypes(json.JSONEncoder):
-	def default(self, obj):
-		if isinstance(obj, ion_core.Timestamp):
-			return obj.replace(tzinfo=timezone.utc).isoformat(timespec="milliseconds")
-		if isinstance(obj, six.binary_type):
-			return obj.hex()
-		if isinstance(obj, simple_types.IonPyNull):
-			return None
-		if isinstance(obj, simple_types.IonPyDict):
-			# print(ion.simple_types.IonPyDict(obj))
-			keys = OrderedDict()
-			for (k, v) in obj.items():
-				keys[k] = v
-			return keys
-		if isinstance(obj, simple_types.IonPyBool):
-			return 'true' if obj == 1 else 'false'
-		return json.JSONEncoder.default(self, obj)
-
-
-# Here we are reading back the 10n file and creating a JSON output in the same directory
-def read_data(filename: str):
-	catalog = ion_symbols.SymbolTableCatalog()
-	symbols = ion_symbols.SymbolTable(ion_symbols.SHARED_TABLE_TYPE, table, "foxtel.engagement.format", 1)
-	catalog.register(symbols)
-
-	with open(filename, "rb") as read_file:
-		data = simpleion.load(read_file, catalog, single_value=True)
-		with open(filename + '.json', 'w', encoding='utf-8') as outfile:
-			json.dump(data, outfile, ensure_ascii=False, indent=4, cls=JSONEncoderForIonTypes)
-			print(json.dumps(data, ensure_ascii=False, indent=4, cls=JSONEncoderForIonTypes))
-
-
-# MAIN program start
-
-if len(sys.argv) > 1:
-	read_data(sys.argv[1])
+def _timestamp(value):
+	return value.replace(tzinfo=timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _hex(value):
+	return value.hex()
+
+
+# Conversions of the Ion scalar values that JSON can't represent, by Ion type. The other
+# types are written as they are read.
+_CONVERTERS: Dict[IonType, Callable] = {
+	IonType.TIMESTAMP: _timestamp,
+	IonType.BLOB: _hex,
+	IonType.CLOB: _hex,
+	IonType.DECIMAL: float,
+	IonType.SYMBOL: lambda value: value.text,
+}
+
+
+def _read_value(reader, event):
+	if event.event_type is IonEventType.CONTAINER_START:
+		if event.ion_type is IonType.STRUCT:
+			container = OrderedDict()
+			event = reader.send(NEXT_EVENT)
+			while event.event_type is not IonEventType.CONTAINER_END:
+				container[event.field_name.text] = _read_value(reader, event)
+				event = reader.send(NEXT_EVENT)
+		else:
+			container = []
+			event = reader.send(NEXT_EVENT)
+			while event.event_type is not IonEventType.CONTAINER_END:
+				container.append(_read_value(reader, event))
+				event = reader.send(NEXT_EVENT)
+		return container
+
+	value = event.value
+	if value is None:
+		return None
+	convert = _CONVERTERS.get(event.ion_type)
+	return value if convert is None else convert(value)
+
+
+# The identity header properties followed by each event, as JSON ready dictionaries
+def iter_records(read_file, catalog: ion_symbols.SymbolTableCatalog, buffer_size: int = None) -> Iterator[Dict]:
+	reader = managed_reader(binary_reader(), catalog)
+	if buffer_size:
+		reader = blocking_reader(reader, read_file, buffer_size)
+	else:
+		reader = blocking_reader(reader, read_file)
+	event = reader.send(NEXT_EVENT)
+	if event.event_type is not IonEventType.CONTAINER_START or event.ion_type is not IonType.STRUCT:
+		raise RuntimeError("ION format is incorrect")
+
+	# The header fields are packed ahead of the event list
+	header = OrderedDict()
+	event = reader.send(NEXT_EVENT)
+	while event.event_type is not IonEventType.CONTAINER_END:
+		if event.field_name.text != EVENT_LIST:
+			header[event.field_name.text] = _read_value(reader, event)
+			event = reader.send(NEXT_EVENT)
+			continue
+
+		if event.event_type is not IonEventType.CONTAINER_START or event.ion_type is not IonType.LIST:
+			raise RuntimeError("ION format is incorrect")
+		yield header
+
+		event = reader.send(NEXT_EVENT)
+		while event.event_type is not IonEventType.CONTAINER_END:
+			if event.event_type is not IonEventType.CONTAINER_START or event.ion_type is not IonType.STRUCT:
+				raise RuntimeError("ION format is incorrect")
+			yield _read_value(reader, event)
+			event = reader.send(NEXT_EVENT)
+
+		event = reader.send(NEXT_EVENT)
+
+
+def export_bundle(filename: str, outputs: List[TextIO], catalog: ion_symbols.SymbolTableCatalog = None,
+					zero_copy: bool = False) -> int:
+	"""Write the bundle as JSON lines to each of the outputs and return the number of events."""
+	if catalog is None:
+		catalog = build_catalog()
+
+	lines = 0
+	# The bundle may be gzip or zstd compressed. With zero_copy it is parsed in place from a memory map.
+	if zero_copy:
+		mapped = MappedBundle(filename)
+		records = iter_records(mapped, catalog, len(mapped))
+	else:
+		read_file = open_bundle(filename)
+		records = iter_records(read_file, catalog)
+	try:
+		for record in records:
+			line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+			for output in outputs:
+				output.write(line)
+			lines += 1
+	finally:
+		if not zero_copy:
+			read_file.close()
+	return max(lines - 1, 0)
+
+
+def export_files(paths: List[str], output: str = None, echo: bool = False, zero_copy: bool = False) -> Dict[str, int]:
+	"""Export the bundles in the paths to <bundle>.ndjson, or to the single output file ('-' for stdout)."""
+	catalog = build_catalog()
+	totals = {'bundles': 0, 'events': 0}
+	echo = [sys.stdout] if echo and output != '-' else []
+	if output == '-':
+		combined = sys.stdout
+	elif output is not None:
+		combined = open(output, 'w', encoding='utf-8')
+	else:
+		combined = None
+
+	try:
+		for filename in find_files(paths):
+			if combined is not None:
+				totals['events'] += export_bundle(filename, [combined] + echo, catalog, zero_copy)
+			else:
+				with open(filename + '.ndjson', 'w', encoding='utf-8') as outfile:
+					totals['events'] += export_bundle(filename, [outfile] + echo, catalog, zero_copy)
+			totals['bundles'] += 1
+	finally:
+		if combined is not None and combined is not sys.stdout:
+			combined.close()
+	return totals
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	output_path = None
+	if '--output' in args:
+		index = args.index('--output')
+		output_path = args[index + 1]
+		del args[index:index + 2]
+	echo_lines = '--echo' in args
+	use_mmap = '--mmap' in args
+	args = [arg for arg in args if arg not in ('--echo', '--mmap')]
+
+	if not args:
+		print('Usage: python jsonify_ion.py <bundle, directory or glob> [...] [--output FILE] [--echo] [--mmap]')
+		sys.exit(1)
+
+	totals = export_files(args, output_path, echo_lines, use_mmap)
+	if output_path != '-':
+		print('Exported {bundles} bundles, {events} events'.format(**totals), file=sys.stderr)
@@ -4,16 +4,51 @@
 from reporting_events import *
 from datetime import datetime, timedelta
 from threading import Thread
-from queue import Queue, Empty
 from amazon.ion import simpleion, symbols
 import os.path
 import analytics_symbols
 import hashlib
-from typing import List, Union
+from typing import List, Union, Iterable, Dict, Tuple
+from ion_binary_writer import IonBinaryWriter
+from event_queue import EventQueue
+from batch_writer import BatchWriter
+from bundle_compression import BundleCompressor
+from ring_spool import RingSpool
+from batch_profiler import BatchProfiler, BatchCapture, STAGE_FLUSH, STAGE_WRITE as PROFILE_STAGE_WRITE
+from manager_stats import ManagerStats, clock, FLUSH_SIZE, FLUSH_TIME, FLUSH_STOP, FLUSH_MANUAL, \
+	STAGE_SESSION_STATE, STAGE_TRACK_ID, STAGE_PACK_EVENT, STAGE_ENCODE, STAGE_WRITE
+from functools import partial
+from collections import deque
+import pickle
 
 
-class LogManager(Thread):
-	def __init__(self, sequence_counter: int, send_period: int = 3600, max_events: int = 20, path: str = './'):
+def build_symbol_table() -> symbols.SymbolTable:
+	return symbols.SymbolTable(
+		symbols.SHARED_TABLE_TYPE,
+		analytics_symbols.table,
+		"foxtel.engagement.format", 1)
+
+
+class LogManagerBase:
+	"""Session state and batch building shared by the threaded and asyncio log managers.
+
+	Sub-classes own the event queue and decide when _process_event, _build_batch and _write_batch
+	are called. The session state must only be touched from the single consumer of the queue.
+	"""
+
+	# Batch encoders, simpleion is the reference implementation
+	ENCODER_SIMPLEION = 'simpleion'
+	ENCODER_BINARY = 'binary'
+
+	def __init__(self, sequence_counter: int, send_period: int = 3600, max_events: int = 20, path: str = './',
+					encoder: str = ENCODER_SIMPLEION, ion_symbols: symbols.SymbolTable = None,
+					binary_writer: IonBinaryWriter = None, writer: BatchWriter = None,
+					compressor: BundleCompressor = None, spool: RingSpool = None, stats: ManagerStats = None,
+					profiler: BatchProfiler = None, retry_failed_writes: bool = False):
+		# A BatchWriter commits a batch after the flush returns, so the spool would release its events
+		# before they are on disk and a failed write could not keep them
+		if spool is not None and writer is not None:
+			raise ValueError('A spool cannot be used with a write-behind writer')
 		self._sequence_counter = sequence_counter
 		self._send_period = send_period
 		self._max_events = max_events
@@ -30,16 +65,42 @@ class LogManager(Thread):
 		self._device_context: Union[OrderedDict, None] = None
 		self._device_context_id: Union[datetime, None] = None
 		self._last_activity_state = None
-		self._ion_symbols = symbols.SymbolTable(
-			symbols.SHARED_TABLE_TYPE,
-			analytics_symbols.table,
-			"foxtel.engagement.format", 1)
-
-		# Implement a queue that the external devices push into.
-		# A single thread pulls from the queue to guarantee correct processing of the event
-		# stream context.
-		self._event_queue = Queue(maxsize=20)
-		super().__init__()
+		# The symbol table can be shared between managers, a binary writer only by managers that
+		# flush from the same thread
+		self._ion_symbols = ion_symbols or build_symbol_table()
+		if encoder not in [LogManagerBase.ENCODER_SIMPLEION, LogManagerBase.ENCODER_BINARY]:
+			raise ValueError('Unknown batch encoder: ' + encoder)
+		self._encoder = encoder
+		self._binary_writer = binary_writer or IonBinaryWriter([self._ion_symbols])
+		# Optional write-behind stage, the batch files are written on the consumer when None
+		self._writer = writer
+		self._compressor = compressor
+		if compressor is not None:
+			compressor.save_dictionary(path)
+		# Optional store and forward spool holding a copy of every stored event until it has been sent
+		self._spool = spool
+		# A failed batch write is raised unless its events can be kept and retried, as they always are
+		# with a spool. Set after a failed write so that the stored events are retried at the flush time
+		# rather than on every event.
+		self._retry_failed_writes = retry_failed_writes or spool is not None
+		self._retry_pending = False
+		self._write_errors: List[Exception] = []
+		# With a BatchWriter the events of the batches being written by filename, and those of the
+		# failed batches as (filename, events), handed back by the writer thread to the next flush
+		self._unconfirmed: Dict[str, List[OrderedDict]] = {}
+		self._failed_writes = deque()
+		# Optional stage latencies and counters, every stage skips them with a None check when disabled
+		self._stats = stats
+		# Optional profiling of selected batch writes, can be replaced at any time with set_profiler
+		self._profiler = profiler
+		# Lateness of the time based flushes against the scheduled flush time, in seconds
+		self._flush_counters: Dict[str, Union[int, float]] = {
+			'flushes': 0,
+			'timed_flushes': 0,
+			'flush_latency_last': 0.0,
+			'flush_latency_max': 0.0,
+			'flush_latency_total': 0.0,
+		}
 
 	def clear_state(self, timestamp: datetime):
 		self._application_session = timestamp
@@ -52,7 +113,7 @@ class LogManager(Thread):
 						hw_card_id: str, ams_id: bytes, ams_panel: int):
 		self._hw_client_id = hw_client_id
 		self._header = IdentityHeader(
-			datetime.utcnow(),
+			self._now(),
 			0,
 			hw_version,
 			hw_id,
@@ -63,61 +124,262 @@ class LogManager(Thread):
 			ams_panel
 		)
 
-	# Application method to push an event into the log queue
-	def push_event(self, event: EventHeader):
-		self._event_queue.put(event)
+	# Counts of flushes and the latency of the time based flushes
+	def flush_counters(self) -> Dict[str, Union[int, float]]:
+		return dict(self._flush_counters)
 
-	# Convenience method to stop the dequeue thread
-	def stop(self):
+	# Start, replace or with None stop the profiling of batch writes, safe to call while running
+	def set_profiler(self, profiler: Union[BatchProfiler, None]):
+		self._profiler = profiler
+
+	# The time written in the identity header and the batch filenames, simulations override it to
+	# replace the wall clock
+	def _now(self) -> datetime:
+		return datetime.utcnow()
+
+	@staticmethod
+	def _stop_event() -> EventHeader:
 		stop = EventHeader(timestamp=datetime.utcnow())
 		stop.event_id = EventHeader.STOP_EVENT
-		self._event_queue.put(stop)
+		return stop
 
-	# Convenience method for the testing harness to get the list of generated filenames
-	def get_batch_filenames(self) -> List[str]:
-		self.join()
-		return self._batches
+	# Take the stored events as a packed batch and its filename, or None when there is nothing to send.
+	# trigger is the send criterion that was met.
+	def _build_batch(self, trigger: str = FLUSH_MANUAL) -> Union[Tuple[str, OrderedDict], None]:
+		if len(self._events) == 0:
+			return None
 
-	# Convenience method for the testing harness
-	def flush(self):
-		self._flush()
-
-	# Flush the stored events
-	def _flush(self):
-		if len(self._events) > 0:
-			print("Flushing stored events")
-			self._header.sequence = self._sequence_counter
-			self._sequence_counter += 1
-			header = self._header.pack_header()
-			batch = header[EVENT_LIST]
-
-			# Prepend a device context event to every batch and fudge the values
-			# so that it appears as part of this batch.
-			self._device_context[TIMESTAMP] = self._events[0][TIMESTAMP]
-			self._device_context[APP_SESSION_ID] = self._events[0][APP_SESSION_ID]
-			self._device_context[USAGE_SESSION_ID] = self._events[0][USAGE_SESSION_ID]
-			self._device_context[PAGE_SESSION_ID] = self._events[0][PAGE_SESSION_ID]
-			batch.append(self._device_context)
-
-			for event in self._events:
-				event[CONTEXT_EVENT_ID] = self._device_context_id
-				batch.append(event)
-
-			# Add the end of file event and use the timestamp of the last event
-			# leave the Session and context values set to null
-			batch.append(EndOfFileEvent(self._events[-1][TIMESTAMP]).pack_event())
-
-			# Build a filename according to the specification
-			filename = datetime.utcnow().strftime("%Y%m%d-%H%M%S%f") + '_' + self._hw_client_id + '.10n'
-			filename = os.path.join(self._path, filename)
+		print("Flushing stored events")
+		self._count_flush(trigger)
+		self._header.sequence = self._sequence_counter
+		self._sequence_counter += 1
+		header = self._header.pack_header()
+		batch = header[EVENT_LIST]
+
+		# Prepend a device context event to every batch and fudge the values
+		# so that it appears as part of this batch. The batch gets its own copy as it
+		# may still be encoding when the next batch is built.
+		device_context = OrderedDict(self._device_context)
+		device_context[TIMESTAMP] = self._events[0][TIMESTAMP]
+		device_context[APP_SESSION_ID] = self._events[0][APP_SESSION_ID]
+		device_context[USAGE_SESSION_ID] = self._events[0][USAGE_SESSION_ID]
+		device_context[PAGE_SESSION_ID] = self._events[0][PAGE_SESSION_ID]
+		batch.append(device_context)
+
+		for event in self._events:
+			event[CONTEXT_EVENT_ID] = self._device_context_id
+			batch.append(event)
+
+		# Add the end of file event and use the timestamp of the last event
+		# leave the Session and context values set to null
+		batch.append(EndOfFileEvent(self._events[-1][TIMESTAMP]).pack_event())
+
+		# Build a filename according to the specification
+		filename = self._now().strftime("%Y%m%d-%H%M%S%f") + '_' + self._hw_client_id + '.10n'
+		filename = os.path.join(self._path, filename)
+
+		self._flush_time += timedelta(seconds=self._send_period)
+
+		# Clear the stored events
+		self._events = []
+		return filename, header
+
+	# Encode and write a batch, this doesn't touch the session state so it can run off the consumer.
+	# capture is the profile of a selected batch, carried on to the writer thread with a BatchWriter.
+	def _write_batch(self, filename: str, header: OrderedDict, capture: BatchCapture = None):
+		stats = self._stats
+		encoded = None
+		if stats is not None:
+			started = clock()
+		data = self._encode(header)
+		if stats is not None:
+			encoded = clock()
+			stats.record(STAGE_ENCODE, encoded - started)
+		if self._writer is not None:
+			self._writer.submit(filename, data, partial(self._batch_committed, written=encoded),
+								capture.next_stage(PROFILE_STAGE_WRITE) if capture is not None else None)
+		else:
 			with open(filename, "wb") as write_file:
-				simpleion.dump(header, fp=write_file, imports=[self._ion_symbols], binary=True)
-				self._batches.append(filename)
+				write_file.write(data)
+			self._batch_committed(filename, None, encoded)
+
+	# Called once a batch is on disk under its final name, on the writer thread with a BatchWriter, so
+	# that get_batch_filenames() never lists a batch that failed to write. written is the time the write
+	# started for the statistics.
+	def _batch_committed(self, filename: str, error: Union[Exception, None], written: float = None):
+		stats = self._stats
+		events = self._unconfirmed.pop(filename, None)
+		if error is not None:
+			self._write_errors.append(error)
+			if events is not None:
+				# Only the consumer touches the stored events, it takes them back at its next flush
+				self._failed_writes.append((filename, events))
+			elif stats is not None:
+				stats.lost(filename)
+			return
+		self._batches.append(filename)
+		if stats is not None:
+			now = clock()
+			stats.record(STAGE_WRITE, now - written)
+			stats.written(filename, now)
+
+	# Store again the events of the batches that failed on a BatchWriter, ahead of the other events
+	def _take_failed_writes(self):
+		failed = []
+		while self._failed_writes:
+			failed.append(self._failed_writes.popleft())
+		for filename, events in reversed(failed):
+			if self._stats is not None:
+				self._stats.failed(filename)
+			self._events = events + self._events
+
+	# Flush the stored events, trigger is the send criterion that was met
+	def _flush(self, trigger: str = FLUSH_MANUAL):
+		self._take_failed_writes()
+		events = self._events
+		batch = self._build_batch(trigger)
+		if batch is None:
+			return
+		if self._stats is not None:
+			self._stats.flushes[trigger] += 1
+			self._stats.sent(batch[0], len(events))
+		if self._writer is not None and self._retry_failed_writes:
+			self._unconfirmed[batch[0]] = events
+		try:
+			profiler = self._profiler
+			capture = profiler.capture(batch[0], STAGE_FLUSH) if profiler is not None else None
+			if capture is not None:
+				try:
+					capture.call(self._write_batch, *batch, capture)
+				finally:
+					capture.finish()
+			else:
+				self._write_batch(*batch)
+		except OSError as error:
+			self._unconfirmed.pop(batch[0], None)
+			if self._stats is not None:
+				self._stats.failed(batch[0])
+			if not self._retry_failed_writes:
+				raise
+			self._write_failed(events, error)
+			return
+		self._written(events)
+
+	# Release the spooled events of a batch once it has been written
+	def _written(self, events: List[OrderedDict]):
+		self._retry_pending = False
+		if self._spool is not None:
+			self._spool.consume(len(events))
+
+	# Keep the events of a failed batch, the spool byte budget bounds how many are held
+	def _write_failed(self, events: List[OrderedDict], error: Exception):
+		print('Batch write failed, keeping the events for the next flush:', error)
+		self._write_errors.append(error)
+		self._retry_pending = True
+		self._events = events + self._events
+
+	# Append a stored event to the spool and drop the events it evicted
+	def _store_event(self, data: OrderedDict):
+		self._events.append(data)
+		if self._stats is not None:
+			self._stats.stored()
+		if self._spool is not None:
+			evicted = self._spool.append(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+			if evicted:
+				del self._events[:evicted]
+				if self._stats is not None:
+					self._stats.evicted(evicted)
+
+	# Reload the device context and the events that were spooled but not sent before a restart
+	def _recover_spool(self):
+		if self._spool is None:
+			return
+		context = self._spool.context()
+		if context is not None:
+			self._device_context = pickle.loads(context)
+			self._device_context_id = self._device_context[CONTEXT_EVENT_ID]
+		self._events = [pickle.loads(record) for record in self._spool.records()]
+		if self._stats is not None:
+			self._stats.recovered(len(self._events))
+		if self._events:
+			print('Recovered spooled events:', len(self._events))
+
+	def _sync_spool(self):
+		if self._spool is not None:
+			self._spool.sync()
+
+	# Apply the session state to an event and store it, returns False on the stop event
+	def _process_event(self, event: EventHeader) -> bool:
+		stats = self._stats
+		if stats is not None:
+			stats.next_event()
+			started = clock()
+		data: OrderedDict = event.pack_event()
+		if stats is not None:
+			stats.record(STAGE_PACK_EVENT, clock() - started)
+
+		# Exit out of the thread if a stop event is received
+		if data[EVENT_ID] == EventHeader.STOP_EVENT:
+			self._flush(FLUSH_STOP)
+			return False
+
+		if stats is not None:
+			stats.events_in += 1
+			started = clock()
+		self._apply_session_state(data)
+		if stats is not None:
+			stats.record(STAGE_SESSION_STATE, clock() - started)
+
+		# We treat the device context specially so that emulates the header functionality of DINS 121
+		# The Device Context is retained until a flush and always the first event in the batch.
+		if data[EVENT_ID] != EventHeader.DEVICE_CONTEXT_EVENT:
+			# Send the events if the send criteria are met
+			if self._flush_due():
+				self._flush(self._flush_trigger())
+			self._store_event(data)
 
-			self._flush_time += timedelta(seconds=self._send_period)
+		return True
 
-			# Clear the stored events
-			self._events.clear()
+	# Only the flushes made by the timer count towards the lateness, a flush on the event count, stop
+	# or request can also happen after the deadline
+	def _count_flush(self, trigger: str):
+		self._flush_counters['flushes'] += 1
+		if trigger == FLUSH_TIME:
+			late = max(0.0, (datetime.utcnow() - self._flush_time).total_seconds())
+			self._flush_counters['timed_flushes'] += 1
+			self._flush_counters['flush_latency_last'] = late
+			self._flush_counters['flush_latency_max'] = max(late, self._flush_counters['flush_latency_max'])
+			self._flush_counters['flush_latency_total'] += late
+
+	# The event count send criterion, suspended after a failed write until the next flush time
+	def _batch_full(self) -> bool:
+		return len(self._events) >= self._max_events and not self._retry_pending
+
+	# Seconds until the stored events must be sent, or None to wait for the next event
+	def _flush_timeout(self) -> Union[float, None]:
+		if len(self._events) == 0:
+			return None
+		if self._batch_full():
+			return 0
+		return max(0.0, (self._flush_time - datetime.utcnow()).total_seconds())
+
+	# Send criteria checked before another event is stored
+	def _flush_due(self) -> bool:
+		return (len(self._events) > self._max_events and not self._retry_pending) or \
+			datetime.utcnow() >= self._flush_time
+
+	# The send criterion of a due flush, the event count when both are met
+	def _flush_trigger(self) -> str:
+		return FLUSH_SIZE if self._batch_full() else FLUSH_TIME
+
+	def _encode(self, header: OrderedDict) -> bytes:
+		if self._encoder == LogManagerBase.ENCODER_BINARY:
+			data = self._binary_writer.dumps(header)
+		else:
+			data = simpleion.dumps(header, imports=[self._ion_symbols], binary=True)
+		if self._compressor is not None:
+			data = self._compressor.compress(data)
+		return data
 
 	def _change_page_state(self, timestamp: datetime, page: str, page_activity: str = '') -> str:
 		self._page_session = timestamp
@@ -129,68 +391,132 @@ class LogManager(Thread):
 
 		return last_page
 
+	# Apply the page, usage and application session state to a packed event
+	def _apply_session_state(self, data: OrderedDict):
+		if data[EVENT_ID] == EventHeader.PAGE_VIEW_EVENT:
+			page_name = data[PAGE_NAME]
+			last_page = self._change_page_state(data[TIMESTAMP], page_name, PageActivityType.get_activity(page_name))
+			data[PREVIOUS_PAGE] = last_page
+
+		elif data[EVENT_ID] in [EventHeader.POWER_STATE_EVENT, EventHeader.VIDEO_OUTPUT_EVENT]:
+			self._application_session = data[TIMESTAMP]
+			if data[EVENT_ID] == EventHeader.POWER_STATE_EVENT and data[DEVICE_POWER_STATUS] == PowerStateType.POWER_ON.value:
+				self._usage_session = data[TIMESTAMP]
+				self._page_session = data[TIMESTAMP]
+
+		elif data[EVENT_ID] == EventHeader.APPLICATION_LAUNCH_EVENT:
+			self._change_page_state(data[TIMESTAMP], 'app:' + data[APP_NAME], 'application')
+
+		elif data[EVENT_ID] == EventHeader.DEVICE_CONTEXT_EVENT:
+			data[CONTEXT_EVENT_ID] = int(data[TIMESTAMP].timestamp())
+			self._device_context = data
+			self._device_context_id = data[CONTEXT_EVENT_ID]
+			if self._spool is not None:
+				self._spool.set_context(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+		elif PAGE_NAME in data and data[EVENT_ID] != EventHeader.PAGE_VIEW_EVENT:
+			data[PAGE_NAME] = self._last_page
+
+		data[APP_SESSION_ID] = self._application_session
+		data[USAGE_SESSION_ID] = self._usage_session
+		data[PAGE_SESSION_ID] = self._page_session
+
+		if data[EVENT_ID] in [EventHeader.VIEWING_STOP_EVENT, EventHeader.PLAYBACK_EVENT, EventHeader.LIVE_PLAY_EVENT,
+								EventHeader.CONTENT_SELECTOR_EVENT]:
+			if self._stats is not None:
+				started = clock()
+			m = hashlib.md5()
+			m.update(data[CONTENT_PROGRAM_TITLE].encode('utf-8'))
+			m.update(data[APP_SESSION_ID].isoformat().encode('utf-8'))
+			data[SELECTOR_TRACK_ID] = m.digest()
+			if self._stats is not None:
+				self._stats.record(STAGE_TRACK_ID, clock() - started)
+
+
+class LogManager(LogManagerBase, Thread):
+	# Event queue overflow policies
+	OVERFLOW_BLOCK = EventQueue.OVERFLOW_BLOCK
+	OVERFLOW_DROP_OLDEST = EventQueue.OVERFLOW_DROP_OLDEST
+	OVERFLOW_DROP_NEWEST = EventQueue.OVERFLOW_DROP_NEWEST
+	OVERFLOW_SPILL = EventQueue.OVERFLOW_SPILL
+
+	def __init__(self, sequence_counter: int, send_period: int = 3600, max_events: int = 20, path: str = './',
+					encoder: str = LogManagerBase.ENCODER_SIMPLEION, queue_capacity: int = 20,
+					overflow: str = OVERFLOW_BLOCK, writer: BatchWriter = None, compression: str = None,
+					compression_dictionary: bytes = None, spool: RingSpool = None, stats: bool = False,
+					profiler: BatchProfiler = None):
+		compressor = BundleCompressor(compression, dictionary=compression_dictionary) if compression else None
+		LogManagerBase.__init__(self, sequence_counter, send_period, max_events, path, encoder, writer=writer,
+								compressor=compressor, spool=spool, stats=ManagerStats() if stats else None,
+								profiler=profiler)
+
+		# Implement a queue that the external devices push into.
+		# A single thread pulls from the queue to guarantee correct processing of the event
+		# stream context. Spilled events are held in a temporary file alongside the batches.
+		self._event_queue = EventQueue(queue_capacity, overflow, spill_path=path, timed=stats)
+		Thread.__init__(self)
+
+	# Application method to push an event into the log queue
+	def push_event(self, event: EventHeader):
+		self._event_queue.put(event)
+
+	# Push a burst of events under a single queue lock
+	def push_events(self, events: Iterable[EventHeader]):
+		self._event_queue.put_many(events)
+
+	# Counts of queued, dequeued, blocked, dropped and spilled events
+	def queue_counters(self) -> Dict[str, int]:
+		return dict(self._event_queue.counters)
+
+	# Snapshot of the stage latency percentiles, flushes by trigger and event counts, None unless
+	# the manager was created with stats=True
+	def stats(self) -> Union[Dict, None]:
+		if self._stats is None:
+			return None
+		snapshot = self._stats.snapshot()
+		snapshot['queue'] = self.queue_counters()
+		return snapshot
+
+	# Convenience method to stop the dequeue thread
+	def stop(self):
+		# The stop event is never dropped by the overflow policy
+		self._event_queue.put(self._stop_event(), EventQueue.OVERFLOW_BLOCK)
+
+	# Convenience method for the testing harness to get the list of generated filenames
+	def get_batch_filenames(self) -> List[str]:
+		self.join()
+		if self._writer is not None:
+			self._writer.drain()
+		return self._batches
+
+	# Convenience method for the testing harness
+	def flush(self):
+		self._flush(FLUSH_MANUAL)
+
 	# Private method executed by the read queue thread
 	def run(self):
 		print('Event collection thread started')
+		self._recover_spool()
 		while True:
-			try:
-				event: EventHeader = self._event_queue.get(block=True, timeout=2)
-			except Empty:
+			# Persist the spooled events of the last burst before waiting
+			self._sync_spool()
+			# Sleep until an event arrives or the flush deadline passes rather than polling
+			stamps = [] if self._stats is not None else None
+			events = self._event_queue.get_many(timeout=self._flush_timeout(), stamps=stamps)
+			if not events:
 				# Send the events if the send criteria are met
 				if len(self._events) > 0:
-					if len(self._events) >= self._max_events or datetime.utcnow() >= self._flush_time:
+					if self._batch_full() or datetime.utcnow() >= self._flush_time:
 						print("Flushing automatically:", len(self._events), self._max_events, datetime.utcnow(), self._flush_time)
-						self._flush()
+						self._flush(self._flush_trigger())
 				continue
+			if stamps is not None:
+				# The burst and what is still queued or spilled behind it
+				self._stats.dequeued(len(events) + len(self._event_queue), stamps, clock())
 
-			data: OrderedDict = event.pack_event()
-
-			# Exit out of the thread if a stop event is received
-			if data[EVENT_ID] == EventHeader.STOP_EVENT:
-				if len(self._events) > 0:
-					self._flush()
-				print('Stopping thread')
-				return
-
-			if data[EVENT_ID] == EventHeader.PAGE_VIEW_EVENT:
-				page_name = data[PAGE_NAME]
-				last_page = self._change_page_state(data[TIMESTAMP], page_name, PageActivityType.get_activity(page_name))
-				data[PREVIOUS_PAGE] = last_page
-
-			elif data[EVENT_ID] in [EventHeader.POWER_STATE_EVENT, EventHeader.VIDEO_OUTPUT_EVENT]:
-				self._application_session = data[TIMESTAMP]
-				if data[EVENT_ID] == EventHeader.POWER_STATE_EVENT and data[DEVICE_POWER_STATUS] == PowerStateType.POWER_ON.value:
-					self._usage_session = data[TIMESTAMP]
-					self._page_session = data[TIMESTAMP]
-
-			elif data[EVENT_ID] == EventHeader.APPLICATION_LAUNCH_EVENT:
-				self._change_page_state(data[TIMESTAMP], 'app:' + data[APP_NAME], 'application')
-
-			elif data[EVENT_ID] == EventHeader.DEVICE_CONTEXT_EVENT:
-				data[CONTEXT_EVENT_ID] = int(data[TIMESTAMP].timestamp())
-				self._device_context = data
-				self._device_context_id = data[CONTEXT_EVENT_ID]
-
-			elif PAGE_NAME in data and data[EVENT_ID] != EventHeader.PAGE_VIEW_EVENT:
-				data[PAGE_NAME] = self._last_page
-
-			data[APP_SESSION_ID] = self._application_session
-			data[USAGE_SESSION_ID] = self._usage_session
-			data[PAGE_SESSION_ID] = self._page_session
-
-			if data[EVENT_ID] in [EventHeader.VIEWING_STOP_EVENT, EventHeader.PLAYBACK_EVENT, EventHeader.LIVE_PLAY_EVENT,
-									EventHeader.CONTENT_SELECTOR_EVENT]:
-				m = hashlib.md5()
-				m.update(data[CONTENT_PROGRAM_TITLE].encode('utf-8'))
-				m.update(data[APP_SESSION_ID].isoformat().encode('utf-8'))
-				data[SELECTOR_TRACK_ID] = m.digest()
-
-			# We treat the device context specially so that emulates the header functionality of DINS 121
-			# The Device Context is retained until a flush and always the first event in the batch.
-			if data[EVENT_ID] != EventHeader.DEVICE_CONTEXT_EVENT:
-				# Send the events if the send criteria are met
-				if len(self._events) > self._max_events or datetime.utcnow() >= self._flush_time:
-					self._flush()
-				self._events.append(data)
-
-			self._event_queue.task_done()
+			for event in events:
+				if not self._process_event(event):
+					self._event_queue.close()
+					self._sync_spool()
+					print('Stopping thread')
+					return
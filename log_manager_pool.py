@@ -0,0 +1,174 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Multiplexes many device identities through a small fixed number of worker threads.
+# Each device, keyed by its hw_client_id, keeps its own session state and batch buffer in a
+# LogManagerBase and is pinned to one worker so its events are always processed in order.
+# All of the devices share one symbol table and each worker has one binary writer.
+# A failed batch write doesn't stop the worker, the device keeps the events and retries them at its
+# next flush time. With a BatchWriter the failure is only known once the writer has tried the batch, so
+# its events are handed back to the device and retried with its next flush.
+
+from log_manager import LogManagerBase, build_symbol_table
+from reporting_events import *
+from event_queue import EventQueue
+from ion_binary_writer import IonBinaryWriter
+from batch_writer import BatchWriter
+from bundle_compression import BundleCompressor
+from manager_stats import FLUSH_SIZE, FLUSH_TIME, FLUSH_STOP
+from threading import Thread, Lock
+from typing import Iterable, Set, Tuple
+import heapq
+import itertools
+
+
+class _PoolWorker(Thread):
+
+	def __init__(self, queue_capacity: int, overflow: str, path: str, binary_writer: IonBinaryWriter,
+					compressor: BundleCompressor = None):
+		super().__init__()
+		self.binary_writer = binary_writer
+		self.compressor = compressor
+		self.event_queue = EventQueue(queue_capacity, overflow, spill_path=path)
+		# Queued items carry the hw_client_id so that they can be spilled without the device state
+		self.devices: Dict[str, LogManagerBase] = {}
+		# Flush deadlines of the devices holding events as (flush time, tie breaker, device), with at most
+		# one entry per device. An entry that comes due before its device's flush time is pushed again
+		# at that time.
+		self._deadlines: List[Tuple[datetime, int, LogManagerBase]] = []
+		self._scheduled: Set[LogManagerBase] = set()
+		self._tie_breaker = itertools.count()
+
+	def _schedule(self, device: LogManagerBase):
+		if device in self._scheduled:
+			return
+		self._scheduled.add(device)
+		heapq.heappush(self._deadlines, (device._flush_time, next(self._tie_breaker), device))
+
+	def _timeout(self) -> Union[float, None]:
+		if not self._deadlines:
+			return None
+		return max(0.0, (self._deadlines[0][0] - datetime.utcnow()).total_seconds())
+
+	def _flush_expired(self):
+		now = datetime.utcnow()
+		while self._deadlines and self._deadlines[0][0] <= now:
+			flush_time, _, device = heapq.heappop(self._deadlines)
+			self._scheduled.discard(device)
+			if len(device._events) == 0:
+				continue
+			if device._flush_time > flush_time:
+				# Flushed on the event count since this was scheduled
+				self._schedule(device)
+				continue
+			device._flush(FLUSH_TIME)
+			if len(device._events) > 0:
+				# The write failed, retry at the next flush time
+				self._schedule(device)
+
+	def run(self):
+		while True:
+			items = self.event_queue.get_many(timeout=self._timeout())
+			full = set()
+			for hw_client_id, event in items:
+				if hw_client_id is None:
+					for stored in self.devices.values():
+						stored._flush(FLUSH_STOP)
+					self.event_queue.close()
+					return
+
+				device = self.devices[hw_client_id]
+				was_empty = len(device._events) == 0
+				device._process_event(event)
+				if was_empty and len(device._events) > 0:
+					self._schedule(device)
+				if device._batch_full():
+					full.add(device)
+
+			for device in full:
+				if device._batch_full():
+					device._flush(FLUSH_SIZE)
+			self._flush_expired()
+
+
+class LogManagerPool:
+	"""Runs the LogManager session and batching rules for many devices on a few threads.
+
+	Devices are added with add_device before their events are pushed. Each device is assigned
+	to a worker in turn and produces its own reporting bundles in path.
+	"""
+
+	def __init__(self, workers: int = 4, send_period: int = 3600, max_events: int = 20, path: str = './',
+					encoder: str = LogManagerBase.ENCODER_SIMPLEION, queue_capacity: int = 1000,
+					overflow: str = EventQueue.OVERFLOW_BLOCK, writer: BatchWriter = None, compression: str = None,
+					compression_dictionary: bytes = None):
+		self._send_period = send_period
+		self._max_events = max_events
+		self._path = path
+		self._encoder = encoder
+		self._writer = writer
+		self._ion_symbols = build_symbol_table()
+		# The binary writer and compressor keep per call state so each worker has its own
+		self._workers = [
+			_PoolWorker(queue_capacity, overflow, path, IonBinaryWriter([self._ion_symbols]),
+						BundleCompressor(compression, dictionary=compression_dictionary) if compression else None)
+			for _ in range(workers)]
+		self._devices: Dict[str, Tuple[LogManagerBase, _PoolWorker]] = {}
+		self._lock = Lock()
+
+	def __len__(self):
+		return len(self._devices)
+
+	def add_device(self, sequence_counter: int, hw_version: str, hw_id: bytes, app_version: str, hw_client_id: str,
+					hw_card_id: str, ams_id: bytes, ams_panel: int):
+		with self._lock:
+			if hw_client_id in self._devices:
+				raise ValueError('Device already in the pool: ' + hw_client_id)
+			worker = self._workers[len(self._devices) % len(self._workers)]
+			device = LogManagerBase(sequence_counter, self._send_period, self._max_events, self._path,
+									self._encoder, ion_symbols=self._ion_symbols,
+									binary_writer=worker.binary_writer, writer=self._writer,
+									compressor=worker.compressor, retry_failed_writes=True)
+			device.set_identity(hw_version, hw_id, app_version, hw_client_id, hw_card_id, ams_id, ams_panel)
+			worker.devices[hw_client_id] = device
+			self._devices[hw_client_id] = (device, worker)
+
+	# Only safe before start or for a device that has no events in flight
+	def clear_state(self, hw_client_id: str, timestamp: datetime):
+		self._devices[hw_client_id][0].clear_state(timestamp)
+
+	def start(self):
+		for worker in self._workers:
+			worker.start()
+
+	def push_event(self, hw_client_id: str, event: EventHeader):
+		self._devices[hw_client_id][1].event_queue.put((hw_client_id, event))
+
+	def push_events(self, hw_client_id: str, events: Iterable[EventHeader]):
+		self._devices[hw_client_id][1].event_queue.put_many((hw_client_id, event) for event in events)
+
+	# Flush every device and stop the workers
+	def stop(self):
+		for worker in self._workers:
+			worker.event_queue.put((None, None), EventQueue.OVERFLOW_BLOCK)
+
+	def get_batch_filenames(self, hw_client_id: str = None) -> List[str]:
+		for worker in self._workers:
+			worker.join()
+		if self._writer is not None:
+			self._writer.drain()
+		if hw_client_id is not None:
+			return self._devices[hw_client_id][0]._batches
+		return [filename for device, _ in self._devices.values() for filename in device._batches]
+
+	# Failed batch writes of every device as (hw_client_id, error). The events of a batch that failed on
+	# stop are not retried.
+	def write_errors(self) -> List[Tuple[str, Exception]]:
+		return [(hw_client_id, error) for hw_client_id, (device, _) in self._devices.items()
+				for error in device._write_errors]
+
+	def queue_counters(self) -> Dict[str, int]:
+		counters: Dict[str, int] = {}
+		for worker in self._workers:
+			for name, value in worker.event_queue.counters.items():
+				counters[name] = counters.get(name, 0) + value
+		return counters
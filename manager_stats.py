@@ -0,0 +1,175 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Optional instrumentation of the log manager pipeline. Each stage records its latency into a
+# log-linear histogram with four buckets per power of two microseconds, which is a couple of
+# integer operations per sample and a bounded amount of memory however long the manager runs.
+# The manager only holds a ManagerStats when stats are enabled, otherwise every stage is skipped
+# with a single None check.
+#
+#     manager = LogManager(0x50000, stats=True)
+#     ...
+#     manager.stats()['stages']['push_to_disk']['p99_ms']
+
+from collections import deque
+from typing import Dict, List, Union
+import time
+
+# Pipeline stages with a latency histogram
+STAGE_QUEUE_WAIT = 'queue_wait'
+STAGE_SESSION_STATE = 'session_state'
+STAGE_TRACK_ID = 'track_id'
+STAGE_PACK_EVENT = 'pack_event'
+STAGE_ENCODE = 'encode'
+STAGE_WRITE = 'write'
+STAGE_PUSH_TO_DISK = 'push_to_disk'
+STAGES = (STAGE_QUEUE_WAIT, STAGE_SESSION_STATE, STAGE_TRACK_ID, STAGE_PACK_EVENT, STAGE_ENCODE, STAGE_WRITE,
+			STAGE_PUSH_TO_DISK)
+
+# What triggered a flush
+FLUSH_SIZE = 'size'
+FLUSH_TIME = 'time'
+FLUSH_STOP = 'stop'
+FLUSH_MANUAL = 'manual'
+FLUSH_TRIGGERS = (FLUSH_SIZE, FLUSH_TIME, FLUSH_STOP, FLUSH_MANUAL)
+
+PERCENTILES = (50, 90, 99)
+
+# Enough buckets for latencies up to 2^60 microseconds
+_BUCKETS = 4 * 62
+
+clock = time.perf_counter
+
+
+def _bucket(micros: int) -> int:
+	if micros < 8:
+		return micros
+	shift = micros.bit_length() - 3
+	return 4 * shift + (micros >> shift)
+
+
+def _bucket_bounds(bucket: int) -> (int, int):
+	if bucket < 8:
+		return bucket, bucket + 1
+	shift = bucket // 4 - 1
+	mantissa = bucket % 4 + 4
+	return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+	"""Latency samples in seconds, with the percentiles accurate to a quarter of a power of two."""
+
+	def __init__(self):
+		self._counts: List[int] = [0] * _BUCKETS
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def record(self, seconds: float):
+		micros = int(seconds * 1000000)
+		self._counts[_bucket(micros) if micros > 0 else 0] += 1
+		self.count += 1
+		self.total += seconds
+		if seconds > self.max:
+			self.max = seconds
+
+	def percentile(self, percent: float) -> float:
+		"""The upper bound in seconds of the bucket holding the percentile, capped at the maximum."""
+		if self.count == 0:
+			return 0.0
+		rank = self.count * percent / 100
+		seen = 0
+		for bucket, count in enumerate(list(self._counts)):
+			seen += count
+			if count and seen >= rank:
+				return min(_bucket_bounds(bucket)[1] / 1000000, self.max)
+		return self.max
+
+	def snapshot(self) -> Dict[str, Union[int, float]]:
+		result = {
+			'count': self.count,
+			'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+			'max_ms': self.max * 1000,
+		}
+		for percent in PERCENTILES:
+			result['p{0}_ms'.format(percent)] = self.percentile(percent) * 1000
+		return result
+
+
+class ManagerStats:
+	"""Stage histograms and counters of one log manager.
+
+	They are updated by the consumer thread, except that with a BatchWriter the write and push_to_disk
+	stages and events_out are recorded by the writer thread once a batch is committed under its final
+	name, so that they cover the file write, fsync and rename.
+	"""
+
+	def __init__(self):
+		self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+		self.flushes: Dict[str, int] = {trigger: 0 for trigger in FLUSH_TRIGGERS}
+		self.events_in = 0
+		self.events_out = 0
+		self.queue_depth = 0
+		self.queue_depth_max = 0
+		# Enqueue times of the dequeued events still to be processed, empty when the queue doesn't
+		# time its events, and of the event being processed
+		self._incoming = deque()
+		self.current_stamp: Union[float, None] = None
+		# Enqueue times of the stored events, in the same order as the events, and of the events of the
+		# batches being written by filename
+		self.pending: List[Union[float, None]] = []
+		self.in_flight: Dict[str, List[Union[float, None]]] = {}
+
+	def record(self, stage: str, seconds: float):
+		self.histograms[stage].record(seconds)
+
+	def dequeued(self, depth: int, stamps: List[float], now: float):
+		self.queue_depth = depth
+		if depth > self.queue_depth_max:
+			self.queue_depth_max = depth
+		histogram = self.histograms[STAGE_QUEUE_WAIT]
+		for stamp in stamps:
+			histogram.record(now - stamp)
+		self._incoming.extend(stamps)
+
+	def next_event(self):
+		self.current_stamp = self._incoming.popleft() if self._incoming else None
+
+	def stored(self):
+		self.pending.append(self.current_stamp)
+
+	def evicted(self, count: int):
+		del self.pending[:count]
+
+	def recovered(self, count: int):
+		# Events reloaded from the spool have no enqueue time
+		self.pending = [None] * count
+
+	def sent(self, filename: str, count: int):
+		# The stored events are always sent oldest first
+		self.in_flight[filename] = self.pending[:count]
+		del self.pending[:count]
+
+	def failed(self, filename: str):
+		# The events of a batch that failed on the consumer are stored again ahead of the others
+		self.pending[:0] = self.in_flight.pop(filename, [])
+
+	def lost(self, filename: str):
+		self.in_flight.pop(filename, None)
+
+	def written(self, filename: str, now: float):
+		stamps = self.in_flight.pop(filename, [])
+		self.events_out += len(stamps)
+		histogram = self.histograms[STAGE_PUSH_TO_DISK]
+		for stamp in stamps:
+			if stamp is not None:
+				histogram.record(now - stamp)
+
+	def snapshot(self) -> Dict:
+		return {
+			'events_in': self.events_in,
+			'events_out': self.events_out,
+			'queue_depth': self.queue_depth,
+			'queue_depth_max': self.queue_depth_max,
+			'flushes': dict(self.flushes),
+			'stages': {stage: histogram.snapshot() for stage, histogram in self.histograms.items()},
+		}
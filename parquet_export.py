@@ -0,0 +1,232 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Export of decoded events to Parquet, or Arrow IPC files, with one file per event type. The columns
+# are keyed by the analytics symbol names as in columnar_events, with the device id and sequence of
+# the identity header denormalised onto every row. String columns are dictionary encoded in Parquet,
+# Arrow files hold them as plain strings as the IPC file format can't replace a dictionary between
+# record batches. Rows are
+# buffered per event type and written out one row group at a time, so memory use is bounded by the
+# row group size whatever the size of the archive. Needs the pyarrow module.
+#
+# Usage: python parquet_export.py <output directory> <directory or glob> [...] [--format parquet|arrow]
+#                                 [--row-group-size N]
+
+from columnar_events import column_kind, COLUMN_BOOL, COLUMN_INT, COLUMN_STRING, COLUMN_TIMESTAMP
+from bundle_catalog import naive_utc
+from ingest_ion_files import find_files
+from reporting_events import *
+from verify_ion_file import build_catalog, iter_events
+from operator import attrgetter
+from typing import Iterable
+import os
+import sys
+import time
+
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+FORMAT_PARQUET = 'parquet'
+FORMAT_ARROW = 'arrow'
+
+# Rows per row group, large enough for efficient scans of the small event structs
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+# The identity header fields written as columns of every table
+IDENTITY_COLUMNS = (DEVICE_CDSN, SEQUENCE_ID)
+
+
+def _require_pyarrow():
+	if pyarrow is None:
+		raise RuntimeError('Parquet and Arrow export requires the pyarrow module')
+
+
+def arrow_type(kind: str, dictionary: bool = True):
+	if kind == COLUMN_INT:
+		return pyarrow.int64()
+	if kind == COLUMN_BOOL:
+		return pyarrow.bool_()
+	if kind == COLUMN_TIMESTAMP:
+		return pyarrow.timestamp('us', tz='UTC')
+	if kind == COLUMN_STRING:
+		return pyarrow.dictionary(pyarrow.int32(), pyarrow.string()) if dictionary else pyarrow.string()
+	return pyarrow.binary()
+
+
+def _timestamps(values: tuple) -> tuple:
+	# Naive values are taken as UTC by pyarrow
+	return tuple(None if value is None else naive_utc(value) for value in values)
+
+
+def _enumeration_values(values: tuple) -> tuple:
+	return tuple(value.value if isinstance(value, Enum) else value for value in values)
+
+
+class _TableWriter:
+	"""The buffered rows and the open output file of one event type."""
+
+	def __init__(self, cls, filename: str, file_format: str, row_group_size: int):
+		self.cls = cls
+		self.filename = filename
+		self.row_group_size = row_group_size
+		items = HEADER_SCHEMA + cls.schema
+		self.getter = attrgetter(*[item.attribute for item in items])
+		self.kinds = [column_kind(cls, item) for item in items]
+		self.converters = []
+		fields = []
+		dictionary = file_format == FORMAT_PARQUET
+		for symbol, kind in zip(IDENTITY_COLUMNS, [COLUMN_STRING, COLUMN_INT]):
+			fields.append(pyarrow.field(symbol, arrow_type(kind, dictionary)))
+		for item, (kind, enumeration) in zip(items, self.kinds):
+			fields.append(pyarrow.field(item.symbol, arrow_type(kind, dictionary)))
+			if enumeration:
+				self.converters.append(_enumeration_values)
+			elif kind == COLUMN_TIMESTAMP:
+				self.converters.append(_timestamps)
+			else:
+				self.converters.append(None)
+		self.schema = pyarrow.schema(fields)
+		self.rows: List[tuple] = []
+		self.identity: List[tuple] = []
+		self.count = 0
+
+		if file_format == FORMAT_PARQUET:
+			string_columns = [field.name for field in fields if pyarrow.types.is_dictionary(field.type)]
+			self.writer = pyarrow.parquet.ParquetWriter(filename, self.schema, use_dictionary=string_columns)
+		else:
+			self.writer = pyarrow.ipc.new_file(filename, self.schema)
+
+	def append(self, event: EventHeader, identity: tuple):
+		self.rows.append(self.getter(event))
+		self.identity.append(identity)
+		if len(self.rows) >= self.row_group_size:
+			self.flush()
+
+	def _array(self, values: tuple, field):
+		if pyarrow.types.is_dictionary(field.type):
+			return pyarrow.array(values, type=pyarrow.string()).dictionary_encode()
+		return pyarrow.array(values, type=field.type)
+
+	def flush(self):
+		if not self.rows:
+			return
+		# Transpose the rows once rather than appending to a list per column for every event
+		columns = list(zip(*self.identity)) + list(zip(*self.rows))
+		converters = [None] * len(IDENTITY_COLUMNS) + self.converters
+		arrays = []
+		for values, convert, field in zip(columns, converters, self.schema):
+			arrays.append(self._array(values if convert is None else convert(values), field))
+		batch = pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+		if isinstance(self.writer, pyarrow.parquet.ParquetWriter):
+			self.writer.write_batch(batch, row_group_size=self.row_group_size)
+		else:
+			self.writer.write_batch(batch)
+		self.count += len(self.rows)
+		self.rows = []
+		self.identity = []
+
+	def close(self):
+		try:
+			self.flush()
+		finally:
+			self.writer.close()
+
+
+class ParquetExport:
+	"""Streams decoded events into one Parquet or Arrow file per event type in the output directory.
+
+	Events are passed as the iter_events stream, where each IdentityHeader sets the device id and
+	sequence written with the events that follow it.
+	"""
+
+	def __init__(self, path: str, file_format: str = FORMAT_PARQUET, row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+		_require_pyarrow()
+		if file_format not in (FORMAT_PARQUET, FORMAT_ARROW):
+			raise ValueError('Unknown export format: ' + file_format)
+		self.path = path
+		self.file_format = file_format
+		self.row_group_size = row_group_size
+		self._writers: Dict[type, _TableWriter] = {}
+		self._identity = (None, None)
+		os.makedirs(path, exist_ok=True)
+
+	def _writer(self, cls) -> _TableWriter:
+		writer = self._writers.get(cls)
+		if writer is None:
+			extension = '.parquet' if self.file_format == FORMAT_PARQUET else '.arrow'
+			filename = os.path.join(self.path, cls.__name__ + extension)
+			writer = self._writers[cls] = _TableWriter(cls, filename, self.file_format, self.row_group_size)
+		return writer
+
+	def extend(self, events: Iterable[Union[IdentityHeader, EventHeader]]):
+		for event in events:
+			if isinstance(event, IdentityHeader):
+				self._identity = (event.hw_client_id, event.sequence)
+				continue
+			self._writer(type(event)).append(event, self._identity)
+
+	def close(self) -> Dict[str, int]:
+		"""Write the remaining rows and return the row count of each file.
+
+		Every file is closed even when one of them fails, the first error is then raised.
+		"""
+		counts = {}
+		error = None
+		writers, self._writers = self._writers, {}
+		for writer in writers.values():
+			try:
+				writer.close()
+			except Exception as close_error:
+				error = error or close_error
+			counts[writer.filename] = writer.count
+		if error is not None:
+			raise error
+		return counts
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+def export_files(paths: List[str], output: str, file_format: str = FORMAT_PARQUET,
+					row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> Dict:
+	files = find_files(paths)
+	catalog = build_catalog()
+	start = time.perf_counter()
+	with ParquetExport(output, file_format, row_group_size) as export:
+		for filename in files:
+			export.extend(iter_events(filename, catalog))
+		tables = export.close()
+	elapsed = time.perf_counter() - start
+	rows = sum(tables.values())
+	return {
+		'bundles': len(files),
+		'rows': rows,
+		'seconds': elapsed,
+		'rows_per_sec': rows / elapsed if elapsed else 0.0,
+		'tables': tables,
+	}
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	options = {'format': FORMAT_PARQUET, 'row-group-size': DEFAULT_ROW_GROUP_SIZE}
+	for option, parse in [('format', str), ('row-group-size', int)]:
+		if '--' + option in args:
+			index = args.index('--' + option)
+			options[option] = parse(args[index + 1])
+			del args[index:index + 2]
+
+	if len(args) < 2:
+		print('Usage: python parquet_export.py <output directory> <directory or glob> [...] '
+				'[--format parquet|arrow] [--row-group-size N]')
+		sys.exit(1)
+
+	result = export_files(args[1:], args[0], options['format'], options['row-group-size'])
+	for table_filename, table_rows in sorted(result['tables'].items()):
+		print('{0:<60} {1:>10} rows'.format(table_filename, table_rows))
+	print('{bundles} bundles, {rows} rows in {seconds:.2f}s, {rows_per_sec:.0f} rows/sec'.format(**result))
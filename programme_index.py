@@ -0,0 +1,173 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Interval index over ProgrammeMetadata schedules for on-air lookups. Each channel keeps its
+# programmes sorted by start time in parallel arrays of start and end times in microseconds, with
+# the running maximum of the end times so that overlapping schedules are still searched correctly.
+# A single lookup is a bisect and a bulk lookup of an array of timestamps is one numpy searchsorted
+# per channel.
+#
+#     index = ProgrammeIndex({'F8D': f8d_events, 'SHC': shc_events})
+#     index.on_air('F8D', timestamp)
+#     index.overlapping('F8D', start, end)
+#     index.on_air_many(channel_tags, timestamps)
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Union
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _micros(value: datetime) -> int:
+	if value.tzinfo is not None:
+		value = value.astimezone(timezone.utc).replace(tzinfo=None)
+	return (value - _EPOCH) // _MICROSECOND
+
+
+def _micros_array(timestamps) -> np.ndarray:
+	if isinstance(timestamps, np.ndarray) and np.issubdtype(timestamps.dtype, np.datetime64):
+		return timestamps.astype('datetime64[us]').astype(np.int64)
+	return np.fromiter((_micros(value) for value in timestamps), dtype=np.int64)
+
+
+class _ChannelIndex:
+
+	def __init__(self, events: Iterable):
+		self.events = sorted(events, key=lambda event: event.start_time)
+		self.starts = [_micros(event.start_time) for event in self.events]
+		self.ends = [start + event.duration // _MICROSECOND for start, event in zip(self.starts, self.events)]
+		# Running maximum of the end times, the first programme that can still be on air at a time
+		# is the first one whose running maximum end is after it
+		self.max_ends = []
+		latest = None
+		for end in self.ends:
+			latest = end if latest is None else max(latest, end)
+			self.max_ends.append(latest)
+		self._arrays = None
+
+	def arrays(self):
+		if self._arrays is None:
+			self._arrays = (np.array(self.starts, dtype=np.int64), np.array(self.ends, dtype=np.int64),
+							np.array(self.max_ends, dtype=np.int64))
+		return self._arrays
+
+	def on_air(self, time: int) -> int:
+		# The latest starting programme that covers the time, or -1
+		index = bisect_right(self.starts, time) - 1
+		while index >= 0 and self.max_ends[index] > time:
+			if self.ends[index] > time:
+				return index
+			index -= 1
+		return -1
+
+	def latest_started(self, time: int) -> int:
+		return bisect_right(self.starts, time) - 1
+
+	def overlapping(self, start: int, end: int) -> List:
+		first = bisect_right(self.max_ends, start)
+		last = bisect_left(self.starts, end)
+		return [self.events[index] for index in range(first, last) if self.ends[index] > start]
+
+
+class ProgrammeIndex:
+	"""On-air lookups over the schedules of several channels.
+
+	Times may be naive UTC, as ProgrammeMetadata uses, or timezone aware. A programme is on air from
+	its start time up to but not including its end time.
+	"""
+
+	def __init__(self, schedules: Dict[str, Iterable] = None):
+		self._channels: Dict[str, _ChannelIndex] = {}
+		for channel, events in (schedules or {}).items():
+			self.add(channel, events)
+
+	@classmethod
+	def from_events(cls, events: Iterable) -> 'ProgrammeIndex':
+		"""Index programmes of any channels, keyed by their content_provider."""
+		schedules: Dict[str, List] = {}
+		for event in events:
+			schedules.setdefault(event.content_provider, []).append(event)
+		return cls(schedules)
+
+	def add(self, channel: str, events: Iterable):
+		"""Index the schedule of a channel, replacing any schedule already held for it."""
+		self._channels[channel] = _ChannelIndex(events)
+
+	def channels(self) -> List[str]:
+		return list(self._channels)
+
+	def __contains__(self, channel: str):
+		return channel in self._channels
+
+	def on_air(self, channel: str, timestamp: datetime):
+		"""The programme on the channel at the time, or None."""
+		index = self._channels.get(channel)
+		if index is None:
+			return None
+		position = index.on_air(_micros(timestamp))
+		return index.events[position] if position >= 0 else None
+
+	def latest_started(self, channel: str, timestamp: datetime):
+		"""The programme on the channel that started last at or before the time, on air or not, or None."""
+		index = self._channels.get(channel)
+		if index is None:
+			return None
+		position = index.latest_started(_micros(timestamp))
+		return index.events[position] if position >= 0 else None
+
+	def overlapping(self, channel: str, start: datetime, end: datetime) -> List:
+		"""The programmes on the channel that are on air at any time from start up to end, by start time."""
+		index = self._channels.get(channel)
+		if index is None:
+			return []
+		return index.overlapping(_micros(start), _micros(end))
+
+	def on_air_positions(self, channel: str, timestamps) -> np.ndarray:
+		"""Positions in schedule(channel) of the programme on air at each timestamp, -1 where there is none.
+
+		timestamps is a datetime64 array or a sequence of datetimes.
+		"""
+		times = _micros_array(timestamps)
+		positions = np.full(len(times), -1, dtype=np.int64)
+		index = self._channels.get(channel)
+		if index is None or not index.events:
+			return positions
+		starts, ends, max_ends = index.arrays()
+		candidates = np.searchsorted(starts, times, side='right') - 1
+		valid = candidates >= 0
+		covered = valid & (ends[np.maximum(candidates, 0)] > times)
+		positions[covered] = candidates[covered]
+		# Overlapping schedules where the latest starting programme has already ended
+		for item in np.nonzero(valid & ~covered & (max_ends[np.maximum(candidates, 0)] > times))[0]:
+			positions[item] = index.on_air(int(times[item]))
+		return positions
+
+	def on_air_many(self, channel_tags: Union[str, Iterable[str]], timestamps) -> List:
+		"""The programme, or None, on air for each timestamp, on one channel or on a channel per timestamp."""
+		if isinstance(channel_tags, str):
+			index = self._channels.get(channel_tags)
+			positions = self.on_air_positions(channel_tags, timestamps)
+			return [index.events[position] if position >= 0 else None for position in positions.tolist()]
+
+		tags = np.asarray(list(channel_tags), dtype=object)
+		times = _micros_array(timestamps).astype('datetime64[us]')
+		if len(tags) != len(times):
+			raise ValueError('One channel is needed per timestamp')
+		result: List = [None] * len(times)
+		for channel in set(tags.tolist()):
+			index = self._channels.get(channel)
+			if index is None:
+				continue
+			rows = np.nonzero(tags == channel)[0]
+			positions = self.on_air_positions(channel, times[rows])
+			for row, position in zip(rows.tolist(), positions.tolist()):
+				if position >= 0:
+					result[row] = index.events[position]
+		return result
+
+	def schedule(self, channel: str) -> List:
+		"""The indexed programmes of the channel, by start time."""
+		index = self._channels.get(channel)
+		return list(index.events) if index is not None else []
@@ -4,11 +4,12 @@
 
 from enum import Enum, IntFlag, IntEnum
 from datetime import datetime
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, MISSING
 from collections import OrderedDict
 from analytics_symbols import *
-from typing import List, Union, Any
+from typing import List, Union, Any, Dict, Tuple, Callable
 from amazon.ion import simple_types
+import inspect
 
 
 def get_booking_type(value: Any):
@@ -32,6 +33,67 @@ def conditional_fill(key: str, items: simple_types.IonPyDict):
 		return None
 
 
+# How an event attribute is written into the packed properties
+PACK_RAW = 0
+# Write the enumeration value of the attribute
+PACK_VALUE = 1
+# Write the enumeration value of the attribute or None
+PACK_OPTIONAL_VALUE = 2
+# Always write a null, the value is filled in by the log manager
+PACK_NULL = 3
+
+
+@dataclass(frozen=True)
+class EventField:
+	# Symbol used for the field in the ION struct
+	symbol: str
+	# Name of the event dataclass attribute
+	attribute: str
+	pack: int = PACK_RAW
+	# Conversion applied to the received value, typically the enumeration type
+	unpack: Callable = None
+	# The field is left out of the struct when the attribute is None
+	optional: bool = False
+	# The field is only packed when the named attribute is set
+	when: str = None
+
+
+def slotted(cls):
+	# Rebuild a dataclass with __slots__ for its own fields, the equivalent of dataclass(slots=True)
+	# on Python 3.10+, which also keeps Python 3.7 support. Dropping the per-instance __dict__ takes the
+	# larger events from around 890 to 280 bytes.
+	inherited = set()
+	for base in cls.__mro__[1:]:
+		inherited.update(base.__dict__.get('__slots__', ()))
+	names = tuple(item.name for item in fields(cls) if item.name not in inherited)
+	namespace = dict(cls.__dict__)
+	# The defaults are already bound into the generated __init__
+	for name in names:
+		namespace.pop(name, None)
+	namespace.pop('__dict__', None)
+	namespace.pop('__weakref__', None)
+	namespace['__slots__'] = names
+
+	# dataclass leaves init=False fields with a plain default to the class attribute, which the
+	# slot now replaces, so they are assigned before the generated __init__ runs
+	defaults = tuple((item.name, item.default) for item in fields(cls) if not item.init and
+		item.default is not MISSING)
+	if defaults and '__init__' in namespace:
+		dataclass_init = namespace['__init__']
+
+		def __init__(self, *args, **kwargs):
+			for name, value in defaults:
+				setattr(self, name, value)
+			dataclass_init(self, *args, **kwargs)
+
+		__init__.__qualname__ = dataclass_init.__qualname__
+		__init__.__signature__ = inspect.signature(dataclass_init)
+		namespace['__init__'] = __init__
+	slotted_cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+	slotted_cls.__qualname__ = cls.__qualname__
+	return slotted_cls
+
+
 class SearchTypeType(Enum):
 	EPG_SEARCH = 1
 	EPG_POPULAR = 2
@@ -188,6 +250,7 @@ GIZMO_TYPE_VALUE = 'STB'
 GIZMO_NAME_VALUE = 'DGS7000NF15'
 
 
+@slotted
 @dataclass()
 class IdentityHeader:
 	timestamp: datetime
@@ -250,6 +313,12 @@ class IdentityHeader:
 		return obj, properties[EVENT_LIST]
 
 
+def event_classes() -> List[Any]:
+	# The classes that @dataclass handed to @slotted stay listed by __subclasses__ until they are
+	# garbage collected, so only the slotted replacements are returned.
+	return [cls for cls in EventHeader.__subclasses__() if '__slots__' in cls.__dict__]
+
+
 class EventFactory:
 
 	def __init__(self):
@@ -259,12 +328,14 @@ class EventFactory:
 		# that exposes the event id and this is used to create the linkage.
 		self.classes: List[Union[None, EventHeader]] = [None] * 128
 		# Get all of the sub-classes
-		event_classes: List[Any] = EventHeader.__subclasses__()
-		for cls in event_classes:
+		for cls in event_classes():
 			# make the association of the defining class to the event identifier value
 			event: EventHeader = cls
 			event_id: int = event.get_event_id()
 			self.classes[event_id] = event
+		# The generated decode_event of each class by event id for factory_many
+		self.decoders: List[Union[None, Callable]] = [
+			cls.decode_event if cls is not None else None for cls in self.classes]
 
 	# Factory method to instantiate a class from the received ION event properties
 	def factory(self, event_type: int, properties):
@@ -274,7 +345,19 @@ class EventFactory:
 
 		return self.classes[event_type].unpack_event(properties)
 
+	# Decode a whole batch list of ION event properties, which are left unchanged
+	def factory_many(self, items: List[Any]) -> List['EventHeader']:
+		decoders = self.decoders
+		try:
+			return [decoders[item[EVENT_ID]](item) for item in items]
+		except TypeError:
+			for item in items:
+				if decoders[item[EVENT_ID]] is None:
+					raise ValueError('Unknown event id: {0}'.format(item[EVENT_ID]))
+			raise
+
 
+@slotted
 @dataclass()
 class EventHeader:
 	timestamp: datetime
@@ -351,6 +434,7 @@ class EventHeader:
 		self.device_context_id = properties[CONTEXT_EVENT_ID]
 
 
+@slotted
 @dataclass()
 class ErrorMessageEvent(EventHeader):
 	page: str
@@ -364,26 +448,14 @@ class ErrorMessageEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[ERROR_FNUM_MESSAGE] = self.error_num_message
-		properties[ERROR_TECHNICAL_MESSAGE] = self.technical_message
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = ErrorMessageEvent(
-			properties[TIMESTAMP],
-			properties[PAGE_NAME],
-			properties[ERROR_FNUM_MESSAGE],
-			technical_message=properties[ERROR_TECHNICAL_MESSAGE]
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(ERROR_FNUM_MESSAGE, 'error_num_message'),
+		EventField(ERROR_TECHNICAL_MESSAGE, 'technical_message'),
+	)
 
 
+@slotted
 @dataclass()
 class EndOfFileEvent(EventHeader):
 
@@ -394,19 +466,10 @@ class EndOfFileEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = EndOfFileEvent(
-			properties[TIMESTAMP]
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = ()
 
 
+@slotted
 @dataclass()
 class PowerStatusEvent(EventHeader):
 	power_status: PowerStateType
@@ -419,24 +482,13 @@ class PowerStatusEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[DEVICE_POWER_STATUS] = self.power_status.value
-		properties[EVENT_USER_INITIATED] = self.user_initiated
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = PowerStatusEvent(
-			properties[TIMESTAMP],
-			properties[DEVICE_POWER_STATUS],
-			properties[EVENT_USER_INITIATED]
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(DEVICE_POWER_STATUS, 'power_status', pack=PACK_VALUE),
+		EventField(EVENT_USER_INITIATED, 'user_initiated'),
+	)
 
 
+@slotted
 @dataclass()
 class RebootEvent(EventHeader):
 	reboot_type: RebootTypeType
@@ -448,22 +500,12 @@ class RebootEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[REBOOT_TYPE] = self.reboot_type.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = RebootEvent(
-			properties[TIMESTAMP],
-			properties[REBOOT_TYPE]
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(REBOOT_TYPE, 'reboot_type', pack=PACK_VALUE),
+	)
 
 
+@slotted
 @dataclass()
 class CodeDownloadEvent(EventHeader):
 	software_version: str
@@ -476,25 +518,13 @@ class CodeDownloadEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[SOFTWARE_VERSION] = self.software_version
-		if self.epg_version is not None:
-			properties[EPG_VERSION] = self.epg_version
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = CodeDownloadEvent(
-			properties[TIMESTAMP],
-			properties[SOFTWARE_VERSION],
-			conditional_fill(EPG_VERSION, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(SOFTWARE_VERSION, 'software_version'),
+		EventField(EPG_VERSION, 'epg_version', optional=True),
+	)
 
 
+@slotted
 @dataclass()
 class ApplicationLaunchEvent(EventHeader):
 	content_provider: str
@@ -509,28 +539,15 @@ class ApplicationLaunchEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[APP_NAME] = self.app_name
-		properties[APP_PROVIDER] = self.app_provider
-		properties[APP_STATE] = self.app_state
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = ApplicationLaunchEvent(
-			properties[TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[APP_NAME],
-			properties[APP_PROVIDER],
-			properties[APP_STATE]
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(APP_NAME, 'app_name'),
+		EventField(APP_PROVIDER, 'app_provider'),
+		EventField(APP_STATE, 'app_state', pack=PACK_VALUE, unpack=ApplicationStateType),
+	)
 
 
+@slotted
 @dataclass()
 class LivePlayEvent(EventHeader):
 	viewing_start: datetime
@@ -555,47 +572,24 @@ class LivePlayEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PLAYER_VIEWING_START_TIMESTAMP] = self.viewing_start
-		properties[SELECTOR_TRACK_ID] = self.selector_track_id
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_DURATION] = self.program_duration
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[PLAYER_VIEW_STATUS] = self.view_status.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = LivePlayEvent(
-			properties[TIMESTAMP],
-			properties[PLAYER_VIEWING_START_TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_DURATION],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			ViewStatusType(properties[PLAYER_VIEW_STATUS]),
-			selector_track_id=properties[SELECTOR_TRACK_ID],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PLAYER_VIEWING_START_TIMESTAMP, 'viewing_start'),
+		EventField(SELECTOR_TRACK_ID, 'selector_track_id'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_DURATION, 'program_duration'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(PLAYER_VIEW_STATUS, 'view_status', pack=PACK_VALUE, unpack=ViewStatusType),
+	)
+
+
+@slotted
 @dataclass()
 class RecordingEvent(EventHeader):
 	content_provider: str
@@ -623,53 +617,27 @@ class RecordingEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_DURATION] = self.program_duration
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[MEDIA_BOOKING_SOURCE] = self.booking_source.value
-		properties[MEDIA_EVENT_SOURCE] = self.event_source.value
-		properties[MEDIA_REC_START_TIMESTAMP] = self.record_timestamp
-		properties[MEDIA_DURATION] = self.record_duration
-		properties[MEDIA_REC_STATUS] = self.record_status.value
-		properties[MEDIA_EXPIRY_TIMESTAMP] = self.record_expiry
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = RecordingEvent(
-			properties[TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_DURATION],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			BookingType(properties[MEDIA_BOOKING_SOURCE]),
-			EventSourceType(properties[MEDIA_EVENT_SOURCE]),
-			properties[MEDIA_REC_START_TIMESTAMP],
-			properties[MEDIA_DURATION],
-			RecordingStatusType(properties[MEDIA_REC_STATUS]),
-			properties[MEDIA_EXPIRY_TIMESTAMP],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_DURATION, 'program_duration'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(MEDIA_BOOKING_SOURCE, 'booking_source', pack=PACK_VALUE, unpack=BookingType),
+		EventField(MEDIA_EVENT_SOURCE, 'event_source', pack=PACK_VALUE, unpack=EventSourceType),
+		EventField(MEDIA_REC_START_TIMESTAMP, 'record_timestamp'),
+		EventField(MEDIA_DURATION, 'record_duration'),
+		EventField(MEDIA_REC_STATUS, 'record_status', pack=PACK_VALUE, unpack=RecordingStatusType),
+		EventField(MEDIA_EXPIRY_TIMESTAMP, 'record_expiry'),
+	)
+
+
+@slotted
 @dataclass()
 class PlaybackEvent(EventHeader):
 	viewing_start: datetime
@@ -700,59 +668,30 @@ class PlaybackEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PLAYER_VIEWING_START_TIMESTAMP] = self.viewing_start
-		properties[SELECTOR_TRACK_ID] = self.selector_track_id
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_DURATION] = self.program_duration
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value if self.content_type is not None else None
-		properties[PLAYER_VIEW_STATUS] = self.view_status.value if self.view_status is not None else None
-		properties[MEDIA_BOOKING_SOURCE] = self.booking_source.value if self.booking_source is not None else None
-		properties[MEDIA_EVENT_SOURCE] = self.event_source.value if self.event_source is not None else None
-		properties[MEDIA_REC_START_TIMESTAMP] = self.record_timestamp
-		properties[MEDIA_DURATION] = self.record_duration
-		properties[PLAYER_MEDIA_OFFSET] = self.player_offset
-		properties[PLAYER_TRICKMODE_SPEED] = self.player_trickmode_speed
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = PlaybackEvent(
-			properties[TIMESTAMP],
-			properties[PLAYER_VIEWING_START_TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_DURATION],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			ViewStatusType(properties[PLAYER_VIEW_STATUS]),
-			get_booking_type(properties[MEDIA_BOOKING_SOURCE]),
-			get_event_source_type(properties[MEDIA_EVENT_SOURCE]),
-			properties[MEDIA_REC_START_TIMESTAMP],
-			properties[MEDIA_DURATION],
-			properties[PLAYER_MEDIA_OFFSET],
-			properties[PLAYER_TRICKMODE_SPEED],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties),
-			selector_track_id=properties[SELECTOR_TRACK_ID],
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PLAYER_VIEWING_START_TIMESTAMP, 'viewing_start'),
+		EventField(SELECTOR_TRACK_ID, 'selector_track_id'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_DURATION, 'program_duration'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_OPTIONAL_VALUE, unpack=ContentTypeType),
+		EventField(PLAYER_VIEW_STATUS, 'view_status', pack=PACK_OPTIONAL_VALUE, unpack=ViewStatusType),
+		EventField(MEDIA_BOOKING_SOURCE, 'booking_source', pack=PACK_OPTIONAL_VALUE, unpack=get_booking_type),
+		EventField(MEDIA_EVENT_SOURCE, 'event_source', pack=PACK_OPTIONAL_VALUE, unpack=get_event_source_type),
+		EventField(MEDIA_REC_START_TIMESTAMP, 'record_timestamp'),
+		EventField(MEDIA_DURATION, 'record_duration'),
+		EventField(PLAYER_MEDIA_OFFSET, 'player_offset'),
+		EventField(PLAYER_TRICKMODE_SPEED, 'player_trickmode_speed'),
+	)
+
+
+@slotted
 @dataclass()
 class ViewingStopEvent(EventHeader):
 	viewing_start: datetime
@@ -788,75 +727,35 @@ class ViewingStopEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PLAYER_VIEWING_START_TIMESTAMP] = self.viewing_start
-		properties[SELECTOR_TRACK_ID] = self.selector_track_id
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_DURATION] = self.program_duration
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[PLAYER_VIEW_STATUS] = self.view_status.value
-		properties[MEDIA_BOOKING_SOURCE] = self.booking_source.value if self.booking_source is not None else None
-		properties[MEDIA_EVENT_SOURCE] = self.event_source.value if self.event_source is not None else None
-		properties[MEDIA_REC_START_TIMESTAMP] = self.record_timestamp
-		properties[MEDIA_DURATION] = self.record_duration
-		properties[PLAYER_MEDIA_OFFSET] = self.player_offset
-		properties[PLAYER_VIEWED_DURATION] = self.player_viewed_duration
-
-		if self.qos_avg_bitrate_kbps is not None:
-			properties[PLAYER_QOS_AVG_BITRATE_KBPS] = self.qos_avg_bitrate_kbps
-		if self.qos_startup_ms is not None:
-			properties[PLAYER_QOS_STARTUP_MS] = self.qos_startup_ms
-		if self.qos_buffing_duration_ms is not None:
-			properties[PLAYER_QOS_BUFFERING_MS] = self.qos_buffing_duration_ms
-		if self.qos_buffering_count is not None:
-			properties[PLAYER_QOS_BUFFERING_COUNT] = self.qos_buffering_count
-		if self.qos_abr_shifts is not None:
-			properties[PLAYER_QOS_ABR_SHIFTS] = self.qos_abr_shifts
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = ViewingStopEvent(
-			properties[TIMESTAMP],
-			properties[PLAYER_VIEWING_START_TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_DURATION],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			ViewStatusType(properties[PLAYER_VIEW_STATUS]),
-			properties[PLAYER_MEDIA_OFFSET],
-			properties[PLAYER_VIEWED_DURATION],
-			booking_source=get_booking_type(properties[MEDIA_BOOKING_SOURCE]),
-			event_source=get_event_source_type(properties[MEDIA_EVENT_SOURCE]),
-			record_timestamp=properties[MEDIA_REC_START_TIMESTAMP],
-			record_duration=properties[MEDIA_DURATION],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties),
-			selector_track_id=properties[SELECTOR_TRACK_ID],
-			qos_avg_bitrate_kbps=conditional_fill(PLAYER_QOS_AVG_BITRATE_KBPS, properties),
-			qos_startup_ms=conditional_fill(PLAYER_QOS_STARTUP_MS, properties),
-			qos_buffing_duration_ms=conditional_fill(PLAYER_QOS_BUFFERING_MS, properties),
-			qos_buffering_count=conditional_fill(PLAYER_QOS_BUFFERING_COUNT, properties),
-			qos_abr_shifts=conditional_fill(PLAYER_QOS_ABR_SHIFTS, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PLAYER_VIEWING_START_TIMESTAMP, 'viewing_start'),
+		EventField(SELECTOR_TRACK_ID, 'selector_track_id'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_DURATION, 'program_duration'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(PLAYER_VIEW_STATUS, 'view_status', pack=PACK_VALUE, unpack=ViewStatusType),
+		EventField(MEDIA_BOOKING_SOURCE, 'booking_source', pack=PACK_OPTIONAL_VALUE, unpack=get_booking_type),
+		EventField(MEDIA_EVENT_SOURCE, 'event_source', pack=PACK_OPTIONAL_VALUE, unpack=get_event_source_type),
+		EventField(MEDIA_REC_START_TIMESTAMP, 'record_timestamp'),
+		EventField(MEDIA_DURATION, 'record_duration'),
+		EventField(PLAYER_MEDIA_OFFSET, 'player_offset'),
+		EventField(PLAYER_VIEWED_DURATION, 'player_viewed_duration'),
+		EventField(PLAYER_QOS_AVG_BITRATE_KBPS, 'qos_avg_bitrate_kbps', optional=True),
+		EventField(PLAYER_QOS_STARTUP_MS, 'qos_startup_ms', optional=True),
+		EventField(PLAYER_QOS_BUFFERING_MS, 'qos_buffing_duration_ms', optional=True),
+		EventField(PLAYER_QOS_BUFFERING_COUNT, 'qos_buffering_count', optional=True),
+		EventField(PLAYER_QOS_ABR_SHIFTS, 'qos_abr_shifts', optional=True),
+	)
+
+
+@slotted
 @dataclass()
 class VideoOutputEvent(EventHeader):
 	display_on: bool
@@ -875,38 +774,19 @@ class VideoOutputEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[DISPLAY_ON] = self.display_on
-		if self.display_on:
-			properties[DISPLAY_DETECTED_HDR] = self.detected_HDR
-			properties[DISPLAY_NEG_HDMI] = self.negotiated_HDMI
-			properties[DISPLAY_NEG_HDCP] = self.negotiated_HDCP
-			properties[DISPLAY_NEG_RESOLUTION] = self.negotiated_resolution
-			properties[DISPLAY_NEG_FRAMERATE] = self.negotiated_framerate
-			properties[DISPLAY_EDID_SIG] = self.edid_hash
-			if self.edid_block is not None:
-				properties[DISPLAY_EDID_BLOCK] = self.edid_block
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = VideoOutputEvent(
-			properties[TIMESTAMP],
-			properties[DISPLAY_ON],
-			detected_HDR=conditional_fill(DISPLAY_DETECTED_HDR, properties),
-			negotiated_HDMI=conditional_fill(DISPLAY_NEG_HDMI, properties),
-			negotiated_HDCP=conditional_fill(DISPLAY_NEG_HDCP, properties),
-			negotiated_resolution=conditional_fill(DISPLAY_NEG_RESOLUTION, properties),
-			negotiated_framerate=conditional_fill(DISPLAY_NEG_FRAMERATE, properties),
-			edid_hash=conditional_fill(DISPLAY_EDID_SIG, properties),
-			edid_block=conditional_fill(DISPLAY_EDID_BLOCK, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(DISPLAY_ON, 'display_on'),
+		EventField(DISPLAY_DETECTED_HDR, 'detected_HDR', when='display_on'),
+		EventField(DISPLAY_NEG_HDMI, 'negotiated_HDMI', when='display_on'),
+		EventField(DISPLAY_NEG_HDCP, 'negotiated_HDCP', when='display_on'),
+		EventField(DISPLAY_NEG_RESOLUTION, 'negotiated_resolution', when='display_on'),
+		EventField(DISPLAY_NEG_FRAMERATE, 'negotiated_framerate', when='display_on'),
+		EventField(DISPLAY_EDID_SIG, 'edid_hash', when='display_on'),
+		EventField(DISPLAY_EDID_BLOCK, 'edid_block', when='display_on', optional=True),
+	)
 
 
+@slotted
 @dataclass()
 class PageViewEvent(EventHeader):
 	name: str
@@ -921,33 +801,18 @@ class PageViewEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = self.name
-		properties[PREVIOUS_PAGE] = self.previous
-		if self.filter is not None:
-			properties[PAGE_FILTER] = self.filter
-		if self.sort is not None:
-			properties[PAGE_SORT] = self.sort
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = PageViewEvent(
-			properties[TIMESTAMP],
-			properties[PAGE_NAME],
-			previous=properties[PREVIOUS_PAGE],
-			filter=conditional_fill(PAGE_FILTER, properties),
-			sort=conditional_fill(PAGE_SORT, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(PAGE_NAME, 'name'),
+		EventField(PREVIOUS_PAGE, 'previous'),
+		EventField(PAGE_FILTER, 'filter', optional=True),
+		EventField(PAGE_SORT, 'sort', optional=True),
+	)
 
 	def page_activity(self) -> str:
 		return PageActivityType.get_activity(self.name)
 
 
+@slotted
 @dataclass()
 class SelectorContentEvent(EventHeader):
 	type: str
@@ -969,43 +834,22 @@ class SelectorContentEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[SELECTOR_TYPE] = self.type
-		properties[SELECTOR_TITLE] = self.title
-		properties[SELECTOR_ROW] = self.row
-		properties[SELECTOR_COLUMN] = self.column
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		properties[CONTENT_BRAND] = self.program_brand
-		properties[TILE_LOCKED] = self.tile_locked
-		properties[SELECTOR_TRACK_ID] = self.selector_track_id
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = SelectorContentEvent(
-			properties[TIMESTAMP],
-			properties[SELECTOR_TYPE],
-			properties[SELECTOR_TITLE],
-			properties[SELECTOR_ROW],
-			properties[SELECTOR_COLUMN],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_BRAND],
-			properties[TILE_LOCKED],
-			properties[SELECTOR_TRACK_ID],
-			page=properties[PAGE_NAME]
-
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(SELECTOR_TYPE, 'type'),
+		EventField(SELECTOR_TITLE, 'title'),
+		EventField(SELECTOR_ROW, 'row'),
+		EventField(SELECTOR_COLUMN, 'column'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_BRAND, 'program_brand'),
+		EventField(TILE_LOCKED, 'tile_locked'),
+		EventField(SELECTOR_TRACK_ID, 'selector_track_id'),
+	)
+
+
+@slotted
 @dataclass()
 class SelectorCollectionEvent(EventHeader):
 	type: str
@@ -1023,35 +867,18 @@ class SelectorCollectionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[SELECTOR_TYPE] = self.type
-		properties[SELECTOR_TITLE] = self.title
-		properties[SELECTOR_ROW] = self.row
-		properties[SELECTOR_COLUMN] = self.column
-		properties[COLLECTION_TITLE] = self.collection_title
-		properties[COLLECTION_SOURCE] = self.collection_source
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = SelectorCollectionEvent(
-			properties[TIMESTAMP],
-			properties[SELECTOR_TYPE],
-			properties[SELECTOR_TITLE],
-			properties[SELECTOR_ROW],
-			properties[SELECTOR_COLUMN],
-			properties[COLLECTION_TITLE],
-			properties[COLLECTION_SOURCE],
-			page=properties[PAGE_NAME],
-
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(SELECTOR_TYPE, 'type'),
+		EventField(SELECTOR_TITLE, 'title'),
+		EventField(SELECTOR_ROW, 'row'),
+		EventField(SELECTOR_COLUMN, 'column'),
+		EventField(COLLECTION_TITLE, 'collection_title'),
+		EventField(COLLECTION_SOURCE, 'collection_source'),
+	)
 
 
+@slotted
 @dataclass()
 class BookContentActionEvent(EventHeader):
 	user_initiated: bool
@@ -1079,53 +906,27 @@ class BookContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[EVENT_USER_INITIATED] = self.user_initiated
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_DURATION] = self.program_start_timestamp
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[MEDIA_BOOKING_SOURCE] = self.booking_source.value
-		properties[MEDIA_EVENT_SOURCE] = self.event_source.value
-		properties[MEDIA_REC_START_TIMESTAMP] = self.record_timestamp
-		properties[MEDIA_EXTEND_REC_DURATION] = self.record_extend_duration
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = BookContentActionEvent(
-			properties[TIMESTAMP],
-			properties[EVENT_USER_INITIATED],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_DURATION],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			BookingType(properties[MEDIA_BOOKING_SOURCE]),
-			EventSourceType(properties[MEDIA_EVENT_SOURCE]),
-			properties[MEDIA_REC_START_TIMESTAMP],
-			properties[MEDIA_EXTEND_REC_DURATION],
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(EVENT_USER_INITIATED, 'user_initiated'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_DURATION, 'program_duration'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(MEDIA_BOOKING_SOURCE, 'booking_source', pack=PACK_VALUE, unpack=BookingType),
+		EventField(MEDIA_EVENT_SOURCE, 'event_source', pack=PACK_VALUE, unpack=EventSourceType),
+		EventField(MEDIA_REC_START_TIMESTAMP, 'record_timestamp'),
+		EventField(MEDIA_EXTEND_REC_DURATION, 'record_extend_duration'),
+	)
+
+
+@slotted
 @dataclass()
 class WatchContentActionEvent(EventHeader):
 	program_id: str
@@ -1141,31 +942,16 @@ class WatchContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_TYPE] = self.content_type.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = WatchContentActionEvent(
-			properties[TIMESTAMP],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_PROGRAM_TITLE],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+	)
 
 
+@slotted
 @dataclass()
 class DownloadContentActionEvent(EventHeader):
 	user_initiated: bool
@@ -1187,43 +973,22 @@ class DownloadContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[EVENT_USER_INITIATED] = self.user_initiated
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[MEDIA_DOWNLOAD_STATE] = self.download_state.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = DownloadContentActionEvent(
-			properties[TIMESTAMP],
-			properties[EVENT_USER_INITIATED],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			DownloadStateType(properties[MEDIA_DOWNLOAD_STATE]),
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(EVENT_USER_INITIATED, 'user_initiated'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(MEDIA_DOWNLOAD_STATE, 'download_state', pack=PACK_VALUE, unpack=DownloadStateType),
+	)
+
+
+@slotted
 @dataclass()
 class DeleteContentActionEvent(EventHeader):
 	user_initiated: bool
@@ -1254,59 +1019,30 @@ class DeleteContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[EVENT_USER_INITIATED] = self.user_initiated
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_DURATION] = self.program_duration
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[MEDIA_BOOKING_SOURCE] = self.booking_source.value
-		properties[MEDIA_EVENT_SOURCE] = self.event_source.value
-		properties[MEDIA_REC_START_TIMESTAMP] = self.record_timestamp
-		properties[MEDIA_DURATION] = self.record_duration
-		properties[MEDIA_REC_STATUS] = self.record_status.value
-		properties[MEDIA_EXPIRY_TIMESTAMP] = self.record_expiry
-		properties[MEDIA_MAX_VIEWED_OFFSET] = self.max_viewed_offset
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = DeleteContentActionEvent(
-			properties[TIMESTAMP],
-			properties[EVENT_USER_INITIATED],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_DURATION],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			get_booking_type(properties[MEDIA_BOOKING_SOURCE]),
-			get_event_source_type(properties[MEDIA_EVENT_SOURCE]),
-			properties[MEDIA_REC_START_TIMESTAMP],
-			properties[MEDIA_DURATION],
-			RecordingStatusType(properties[MEDIA_REC_STATUS]),
-			properties[MEDIA_EXPIRY_TIMESTAMP],
-			properties[MEDIA_MAX_VIEWED_OFFSET],
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(EVENT_USER_INITIATED, 'user_initiated'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_DURATION, 'program_duration'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(MEDIA_BOOKING_SOURCE, 'booking_source', pack=PACK_VALUE, unpack=get_booking_type),
+		EventField(MEDIA_EVENT_SOURCE, 'event_source', pack=PACK_VALUE, unpack=get_event_source_type),
+		EventField(MEDIA_REC_START_TIMESTAMP, 'record_timestamp'),
+		EventField(MEDIA_DURATION, 'record_duration'),
+		EventField(MEDIA_REC_STATUS, 'record_status', pack=PACK_VALUE, unpack=RecordingStatusType),
+		EventField(MEDIA_EXPIRY_TIMESTAMP, 'record_expiry'),
+		EventField(MEDIA_MAX_VIEWED_OFFSET, 'max_viewed_offset'),
+	)
+
+
+@slotted
 @dataclass()
 class KeepContentActionEvent(EventHeader):
 	content_provider: str
@@ -1330,45 +1066,23 @@ class KeepContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_DURATION] = self.program_duration
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[MEDIA_BOOKING_SOURCE] = self.booking_source.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = KeepContentActionEvent(
-			properties[TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_DURATION],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			get_booking_type(properties[MEDIA_BOOKING_SOURCE]),
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_DURATION, 'program_duration'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(MEDIA_BOOKING_SOURCE, 'booking_source', pack=PACK_VALUE, unpack=get_booking_type),
+	)
+
+
+@slotted
 @dataclass()
 class UpgradeContentActionEvent(EventHeader):
 	content_provider: str
@@ -1389,39 +1103,20 @@ class UpgradeContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = UpgradeContentActionEvent(
-			properties[TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+	)
 
 
+@slotted
 @dataclass()
 class RentContentActionEvent(EventHeader):
 	content_provider: str
@@ -1443,41 +1138,21 @@ class RentContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-		properties[CONTENT_PRICE] = self.program_price
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = RentContentActionEvent(
-			properties[TIMESTAMP],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			properties[CONTENT_PRICE],
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+		EventField(CONTENT_PRICE, 'program_price'),
+	)
+
+
+@slotted
 @dataclass()
 class NextEpContentActionEvent(EventHeader):
 	user_initiated: bool
@@ -1500,43 +1175,22 @@ class NextEpContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[EVENT_USER_INITIATED] = self.user_initiated
-		properties[CONTENT_PROVIDER] = self.content_provider
-		properties[CONTENT_PROGRAM_ID] = self.program_id
-		properties[CONTENT_SCHEDULE_ID] = self.program_event_id
-		properties[CONTENT_START_TIMESTAMP] = self.program_start_timestamp
-		properties[CONTENT_PROGRAM_TITLE] = self.program_title
-		if self.program_episode_title is not None:
-			properties[CONTENT_EPISODE_TITLE] = self.program_episode_title
-		properties[CONTENT_CLASSIFICATION] = self.program_classification
-		properties[CONTENT_RESOLUTION] = self.program_resolution
-		properties[CONTENT_TYPE] = self.content_type.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = NextEpContentActionEvent(
-			properties[TIMESTAMP],
-			properties[EVENT_USER_INITIATED],
-			properties[CONTENT_PROVIDER],
-			properties[CONTENT_PROGRAM_ID],
-			properties[CONTENT_SCHEDULE_ID],
-			properties[CONTENT_START_TIMESTAMP],
-			properties[CONTENT_PROGRAM_TITLE],
-			properties[CONTENT_CLASSIFICATION],
-			properties[CONTENT_RESOLUTION],
-			ContentTypeType(properties[CONTENT_TYPE]),
-			page=properties[PAGE_NAME],
-			program_episode_title=conditional_fill(CONTENT_EPISODE_TITLE, properties)
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(EVENT_USER_INITIATED, 'user_initiated'),
+		EventField(CONTENT_PROVIDER, 'content_provider'),
+		EventField(CONTENT_PROGRAM_ID, 'program_id'),
+		EventField(CONTENT_SCHEDULE_ID, 'program_event_id'),
+		EventField(CONTENT_START_TIMESTAMP, 'program_start_timestamp'),
+		EventField(CONTENT_PROGRAM_TITLE, 'program_title'),
+		EventField(CONTENT_EPISODE_TITLE, 'program_episode_title', optional=True),
+		EventField(CONTENT_CLASSIFICATION, 'program_classification'),
+		EventField(CONTENT_RESOLUTION, 'program_resolution'),
+		EventField(CONTENT_TYPE, 'content_type', pack=PACK_VALUE, unpack=ContentTypeType),
+	)
+
+
+@slotted
 @dataclass()
 class JumpContentActionEvent(EventHeader):
 	jump_type: JumpType
@@ -1550,24 +1204,13 @@ class JumpContentActionEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[PLAYER_JUMP_TO] = self.jump_type.value
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = JumpContentActionEvent(
-			properties[TIMESTAMP],
-			properties[PLAYER_JUMP_TO],
-			page=properties[PAGE_NAME],
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(PLAYER_JUMP_TO, 'jump_type', pack=PACK_VALUE),
+	)
 
 
+@slotted
 @dataclass()
 class SearchQueryEvent(EventHeader):
 	initiator_type: SearchTypeType
@@ -1583,28 +1226,15 @@ class SearchQueryEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[PAGE_NAME] = None
-		properties[SEARCH_INITIATOR_SOURCE] = self.initiator_type.value
-		properties[SEARCH_TERM] = self.query_term
-		properties[SEARCH_SCORE] = self.result_score
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = SearchQueryEvent(
-			properties[TIMESTAMP],
-			properties[SEARCH_INITIATOR_SOURCE],
-			properties[SEARCH_TERM],
-			properties[SEARCH_SCORE],
-			page=properties[PAGE_NAME],
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(PAGE_NAME, 'page', pack=PACK_NULL),
+		EventField(SEARCH_INITIATOR_SOURCE, 'initiator_type', pack=PACK_VALUE),
+		EventField(SEARCH_TERM, 'query_term'),
+		EventField(SEARCH_SCORE, 'result_score'),
+	)
 
 
+@slotted
 @dataclass()
 class DeviceContextEvent(EventHeader):
 	hw_version: str
@@ -1640,70 +1270,36 @@ class DeviceContextEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[HARDWARE_VERSION] = self.hw_version
-		properties[OS_VERSION] = self.os_version
-		properties[DEVICE_MODEL_ID] = self.model_id
-		properties[DEVICE_RESETS] = self.num_resets
-		properties[DEVICE_UPTIME] = self.uptime
-		properties[PVR_HDD_SIZE] = self.pvr_hdd_size
-		properties[PVR_CUST_FREE_PERC] = self.pvr_cust_free
-		properties[PVR_PVOD_FREE_PERC] = self.pvr_pvod_free
-		properties[PVR_NUM_RECORDINGS] = self.pvr_num_recordings
-		properties[DISPLAY_CONNECTION] = self.display_HDMI_HCDP_conn
-		properties[DISPLAY_NAME] = self.display_name
-		properties[DISPLAY_MANUFACTURER] = self.display_manufacturer
-		properties[DISPLAY_BUILD_DATE] = self.display_build_date
-		properties[DISPLAY_OPTIMAL_RES] = self.display_optimal_res
-		properties[DISPLAY_HDR_SUPPORT] = self.display_hdr_support
-		properties[NETWORK_TYPE] = self.network_connectivity
-		properties[RCU_VERSION] = self.rcu_version
-		properties[RCU_KEYS_PRESSED] = self.rcu_keys_pressed
-		properties[RCU_TYPE] = self.rcu_type.value
-		properties[APP_REGION_ID] = self.region_id
-		properties[APP_POSTCODE] = self.postcode
-		properties[APP_DTT_REGION] = self.dtt_region
-		properties[UI_VERSION] = self.ui_design_version
-		properties[EPG_VERSION] = self.epg_version
-		properties[EPG_VERSION_INSTALL_DATE] = self.epg_install_timestamp
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = DeviceContextEvent(
-			properties[TIMESTAMP],
-			properties[HARDWARE_VERSION],
-			properties[OS_VERSION],
-			properties[DEVICE_MODEL_ID],
-			properties[DEVICE_RESETS],
-			properties[DEVICE_UPTIME],
-			properties[PVR_HDD_SIZE],
-			properties[PVR_CUST_FREE_PERC],
-			properties[PVR_PVOD_FREE_PERC],
-			properties[PVR_NUM_RECORDINGS],
-			properties[DISPLAY_CONNECTION],
-			properties[DISPLAY_NAME],
-			properties[DISPLAY_MANUFACTURER],
-			properties[DISPLAY_BUILD_DATE],
-			properties[DISPLAY_OPTIMAL_RES],
-			properties[DISPLAY_HDR_SUPPORT],
-			properties[NETWORK_TYPE],
-			properties[RCU_VERSION],
-			properties[RCU_KEYS_PRESSED],
-			RcuTypeType(properties[RCU_TYPE]),
-			properties[APP_REGION_ID],
-			properties[APP_POSTCODE],
-			properties[APP_DTT_REGION],
-			properties[UI_VERSION],
-			properties[EPG_VERSION],
-			properties[EPG_VERSION_INSTALL_DATE],
-		)
-		obj._set_header_from_event(properties)
-		return obj
-
-
+	schema = (
+		EventField(HARDWARE_VERSION, 'hw_version'),
+		EventField(OS_VERSION, 'os_version'),
+		EventField(DEVICE_MODEL_ID, 'model_id'),
+		EventField(DEVICE_RESETS, 'num_resets'),
+		EventField(DEVICE_UPTIME, 'uptime'),
+		EventField(PVR_HDD_SIZE, 'pvr_hdd_size'),
+		EventField(PVR_CUST_FREE_PERC, 'pvr_cust_free'),
+		EventField(PVR_PVOD_FREE_PERC, 'pvr_pvod_free'),
+		EventField(PVR_NUM_RECORDINGS, 'pvr_num_recordings'),
+		EventField(DISPLAY_CONNECTION, 'display_HDMI_HCDP_conn'),
+		EventField(DISPLAY_NAME, 'display_name'),
+		EventField(DISPLAY_MANUFACTURER, 'display_manufacturer'),
+		EventField(DISPLAY_BUILD_DATE, 'display_build_date'),
+		EventField(DISPLAY_OPTIMAL_RES, 'display_optimal_res'),
+		EventField(DISPLAY_HDR_SUPPORT, 'display_hdr_support'),
+		EventField(NETWORK_TYPE, 'network_connectivity'),
+		EventField(RCU_VERSION, 'rcu_version'),
+		EventField(RCU_KEYS_PRESSED, 'rcu_keys_pressed'),
+		EventField(RCU_TYPE, 'rcu_type', pack=PACK_VALUE, unpack=RcuTypeType),
+		EventField(APP_REGION_ID, 'region_id'),
+		EventField(APP_POSTCODE, 'postcode'),
+		EventField(APP_DTT_REGION, 'dtt_region'),
+		EventField(UI_VERSION, 'ui_design_version'),
+		EventField(EPG_VERSION, 'epg_version'),
+		EventField(EPG_VERSION_INSTALL_DATE, 'epg_install_timestamp'),
+	)
+
+
+@slotted
 @dataclass()
 class ApplicationConfigEvent(EventHeader):
 	pin_classification: str
@@ -1734,55 +1330,209 @@ class ApplicationConfigEvent(EventHeader):
 	def __post_init__(self):
 		self.event_id = self.get_event_id()
 
-	def pack_event(self) -> OrderedDict:
-		properties = super().pack_event()
-		properties[CONF_PIN_CLASSIFICATION] = self.pin_classification
-		properties[CONF_PIN_INFO] = self.pin_info
-		properties[CONF_PIN_NC] = self.pin_no_classification
-		properties[CONF_CHANNEL_BLOCKING_ON] = self.channel_blocking_on
-		properties[CONF_PIN_ON_PURCHASE] = self.pin_on_purchase
-		properties[CONF_PIN_PROTECT_KEEP] = self.pin_protect_keep
-		properties[CONF_PIN_IP_VIDEO] = self.pin_ip_video
-		properties[CONF_PIN_APP_LAUNCH] = self.pin_app_launch
-		properties[CONF_NUM_SCHED_REMINDERS] = self.num_schedule_reminders
-		properties[CONF_NUM_SCHED_RECORDINGS] = self.num_schedule_recordings
-		properties[CONF_NUM_TEAM_LINKS] = self.num_team_links
-		properties[CONF_FAVOURITES_SETUP] = self.favourites_setup
-		properties[CONF_DTT_SETUP] = self.dtt_setup
-		properties[CONF_ENERGY_SAVING_ON] = self.energy_saving_on
-		properties[CONF_SPDIF_AUDIO_MODE] = self.spdif_audio_mode
-		properties[CONF_HDMI_AUDIO_MODE] = self.hdmi_audio_mode
-		properties[CONF_DOWNLOAD_HD] = self.download_hd
-		properties[CONF_STREAM_FROM_STORE] = self.stream_from_store
-		properties[CONF_CEC_POWER] = self.cec_power
-		properties[CONF_CEC_VOLUME] = self.cec_volume
-
-		return properties
-
-	@staticmethod
-	def unpack_event(properties):
-		obj = ApplicationConfigEvent(
-			properties[TIMESTAMP],
-			properties[CONF_PIN_CLASSIFICATION],
-			properties[CONF_PIN_INFO],
-			properties[CONF_PIN_NC],
-			properties[CONF_CHANNEL_BLOCKING_ON],
-			properties[CONF_PIN_ON_PURCHASE],
-			properties[CONF_PIN_PROTECT_KEEP],
-			properties[CONF_PIN_IP_VIDEO],
-			properties[CONF_PIN_APP_LAUNCH],
-			properties[CONF_NUM_SCHED_REMINDERS],
-			properties[CONF_NUM_SCHED_RECORDINGS],
-			properties[CONF_NUM_TEAM_LINKS],
-			properties[CONF_FAVOURITES_SETUP],
-			properties[CONF_DTT_SETUP],
-			properties[CONF_ENERGY_SAVING_ON],
-			properties[CONF_SPDIF_AUDIO_MODE],
-			properties[CONF_HDMI_AUDIO_MODE],
-			properties[CONF_DOWNLOAD_HD],
-			properties[CONF_STREAM_FROM_STORE],
-			properties[CONF_CEC_POWER],
-			properties[CONF_CEC_VOLUME]
-		)
-		obj._set_header_from_event(properties)
-		return obj
+	schema = (
+		EventField(CONF_PIN_CLASSIFICATION, 'pin_classification'),
+		EventField(CONF_PIN_INFO, 'pin_info'),
+		EventField(CONF_PIN_NC, 'pin_no_classification'),
+		EventField(CONF_CHANNEL_BLOCKING_ON, 'channel_blocking_on'),
+		EventField(CONF_PIN_ON_PURCHASE, 'pin_on_purchase'),
+		EventField(CONF_PIN_PROTECT_KEEP, 'pin_protect_keep'),
+		EventField(CONF_PIN_IP_VIDEO, 'pin_ip_video'),
+		EventField(CONF_PIN_APP_LAUNCH, 'pin_app_launch'),
+		EventField(CONF_NUM_SCHED_REMINDERS, 'num_schedule_reminders'),
+		EventField(CONF_NUM_SCHED_RECORDINGS, 'num_schedule_recordings'),
+		EventField(CONF_NUM_TEAM_LINKS, 'num_team_links'),
+		EventField(CONF_FAVOURITES_SETUP, 'favourites_setup'),
+		EventField(CONF_DTT_SETUP, 'dtt_setup'),
+		EventField(CONF_ENERGY_SAVING_ON, 'energy_saving_on'),
+		EventField(CONF_SPDIF_AUDIO_MODE, 'spdif_audio_mode'),
+		EventField(CONF_HDMI_AUDIO_MODE, 'hdmi_audio_mode'),
+		EventField(CONF_DOWNLOAD_HD, 'download_hd'),
+		EventField(CONF_STREAM_FROM_STORE, 'stream_from_store'),
+		EventField(CONF_CEC_POWER, 'cec_power'),
+		EventField(CONF_CEC_VOLUME, 'cec_volume'),
+	)
+
+
+# Fields common to every event, in the order that they are packed
+HEADER_SCHEMA = (
+	EventField(EVENT_ID, 'event_id'),
+	EventField(TIMESTAMP, 'timestamp'),
+	EventField(APP_SESSION_ID, 'app_session'),
+	EventField(USAGE_SESSION_ID, 'usage_session'),
+	EventField(PAGE_SESSION_ID, 'page_session'),
+	EventField(CONTEXT_EVENT_ID, 'device_context_id'),
+)
+
+# Schema registry of each event type keyed by the event identifier
+EVENT_SCHEMAS: Dict[int, Tuple[EventField, ...]] = {}
+
+
+def _compile_pack_event(cls, namespace: dict) -> Callable:
+	lines = [
+		'def pack_event(self):',
+		'	if self.event_id is None:',
+		'		raise AttributeError()',
+		'	properties = OrderedDict()',
+	]
+	for item in HEADER_SCHEMA:
+		lines.append('	properties[{0!r}] = self.{1}'.format(item.symbol, item.attribute))
+
+	when = None
+	for item in cls.schema:
+		if item.when != when:
+			when = item.when
+			if when is not None:
+				lines.append('	if self.{0}:'.format(when))
+		indent = '\t\t' if when is not None else '\t'
+		target = 'properties[{0!r}]'.format(item.symbol)
+		if item.pack == PACK_NULL:
+			lines.append(indent + target + ' = None')
+			continue
+
+		if item.pack == PACK_RAW and not item.optional:
+			lines.append(indent + target + ' = self.{0}'.format(item.attribute))
+			continue
+		if item.pack == PACK_VALUE and not item.optional:
+			lines.append(indent + target + ' = self.{0}.value'.format(item.attribute))
+			continue
+
+		lines.append(indent + 'value = self.{0}'.format(item.attribute))
+		if item.pack == PACK_VALUE:
+			value = 'value.value'
+		elif item.pack == PACK_OPTIONAL_VALUE:
+			value = 'value.value if value is not None else None'
+		else:
+			value = 'value'
+		if item.optional:
+			lines.append(indent + 'if value is not None:')
+			lines.append(indent + '\t' + target + ' = ' + value)
+		else:
+			lines.append(indent + target + ' = ' + value)
+
+	lines.append('	return properties')
+	exec('\n'.join(lines), namespace)
+	return namespace['pack_event']
+
+
+def _compile_unpack_event(cls, namespace: dict) -> Callable:
+	# The object is populated directly rather than through the dataclass __init__ as keyword
+	# argument parsing is the dominant cost for the larger events.
+	lines = [
+		'def unpack_event(properties):',
+		'	obj = _new(cls)',
+	]
+	for item in HEADER_SCHEMA:
+		lines.append('	obj.{0} = properties[{1!r}]'.format(item.attribute, item.symbol))
+
+	for index, item in enumerate(cls.schema):
+		if item.optional or item.when is not None:
+			value = 'properties.get({0!r})'.format(item.symbol)
+		else:
+			value = 'properties[{0!r}]'.format(item.symbol)
+		if item.unpack is not None:
+			converter = '_unpack_{0}'.format(index)
+			namespace[converter] = item.unpack
+			value = '{0}({1})'.format(converter, value)
+		lines.append('	obj.{0} = {1}'.format(item.attribute, value))
+
+	# Anything not carried in the struct keeps its declared default
+	packed = set(item.attribute for item in HEADER_SCHEMA + cls.schema)
+	for item in fields(cls):
+		if item.name in packed:
+			continue
+		if item.default is MISSING:
+			raise TypeError('{0} schema is missing the {1} field'.format(cls.__name__, item.name))
+		lines.append('	obj.{0} = {1!r}'.format(item.name, item.default))
+
+	lines.append('	return obj')
+	exec('\n'.join(lines), namespace)
+	return namespace['unpack_event']
+
+
+# Enumerations behind the unpack conversions that also accept None
+_OPTIONAL_ENUM_UNPACKERS = {
+	get_booking_type: BookingType,
+	get_event_source_type: EventSourceType,
+}
+
+# Member lookup tables shared by the decoders, indexed by the enumeration class
+_ENUM_TABLES: Dict[type, Dict[Any, Enum]] = {}
+
+
+def _enum_table(unpack: Callable) -> Union[Dict[Any, Enum], None]:
+	# A dictionary lookup of the packed value is several times faster than calling the enumeration
+	enumeration = _OPTIONAL_ENUM_UNPACKERS.get(unpack, unpack)
+	if not isinstance(enumeration, type) or not issubclass(enumeration, Enum):
+		return None
+	table = _ENUM_TABLES.get(enumeration)
+	if table is None:
+		table = _ENUM_TABLES[enumeration] = {member.value: member for member in enumeration}
+	if unpack in _OPTIONAL_ENUM_UNPACKERS:
+		table = dict(table)
+		table[None] = None
+	return table
+
+
+def _compile_decode_event(cls, namespace: dict) -> Callable:
+	# Like unpack_event but for properties straight from the Ion reader, the Ion nulls are
+	# replaced while each field is extracted and enumerations are looked up in a table.
+	# Values missing from a table, such as combined BookingType flags, fall back to the conversion.
+	namespace['_IonPyNull'] = simple_types.IonPyNull
+	lines = [
+		'def decode_event(properties):',
+		'	obj = _new(cls)',
+	]
+	for item in HEADER_SCHEMA:
+		lines.append('	value = properties[{0!r}]'.format(item.symbol))
+		lines.append('	obj.{0} = None if isinstance(value, _IonPyNull) else value'.format(item.attribute))
+
+	for index, item in enumerate(cls.schema):
+		if item.optional or item.when is not None:
+			lines.append('	value = properties.get({0!r})'.format(item.symbol))
+		else:
+			lines.append('	value = properties[{0!r}]'.format(item.symbol))
+		lines.append('	if isinstance(value, _IonPyNull):')
+		lines.append('		value = None')
+		if item.unpack is None:
+			lines.append('	obj.{0} = value'.format(item.attribute))
+			continue
+		converter = '_unpack_{0}'.format(index)
+		namespace[converter] = item.unpack
+		table = _enum_table(item.unpack)
+		if table is None:
+			lines.append('	obj.{0} = {1}(value)'.format(item.attribute, converter))
+			continue
+		lookup = '_table_{0}'.format(index)
+		namespace[lookup] = table
+		lines.append('	obj.{0} = {1}[value] if value in {1} else {2}(value)'.format(item.attribute, lookup, converter))
+
+	packed = set(item.attribute for item in HEADER_SCHEMA + cls.schema)
+	for item in fields(cls):
+		if item.name not in packed:
+			lines.append('	obj.{0} = {1!r}'.format(item.name, item.default))
+
+	lines.append('	return obj')
+	exec('\n'.join(lines), namespace)
+	return namespace['decode_event']
+
+
+# Generate specialised pack_event/unpack_event/decode_event functions for each event from its schema.
+# This is done once at import time so packing doesn't walk the super() chain or look up
+# optional fields and converters on every call.
+def compile_event_schemas():
+	for cls in event_classes():
+		namespace = {'OrderedDict': OrderedDict, 'cls': cls, '_new': object.__new__}
+		pack_event = _compile_pack_event(cls, namespace)
+		unpack_event = _compile_unpack_event(cls, namespace)
+		decode_event = _compile_decode_event(cls, namespace)
+		pack_event.__qualname__ = cls.__qualname__ + '.pack_event'
+		unpack_event.__qualname__ = cls.__qualname__ + '.unpack_event'
+		decode_event.__qualname__ = cls.__qualname__ + '.decode_event'
+		cls.pack_event = pack_event
+		cls.unpack_event = staticmethod(unpack_event)
+		cls.decode_event = staticmethod(decode_event)
+		EVENT_SCHEMAS[cls.get_event_id()] = cls.schema
+
+
+compile_event_schemas()
@@ -0,0 +1,232 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Fixed size memory-mapped ring buffer that holds the encoded events waiting to be sent, so that
+# store and forward survives a restart on constrained devices. The file is one header page
+# followed by the data region. Records are appended at the tail and released from the head once
+# their batch has been written. When the byte budget is reached the oldest records are evicted.
+# Appends are coalesced in memory and copied into the map on sync(), which flushes whole pages
+# only, so the flash sees a few page-aligned writes per burst rather than one per event.
+
+from typing import Dict, Iterator, List, Union
+import mmap
+import os
+import struct
+import zlib
+
+# Page size of the header and of the flushed data ranges. mmap.flush needs offsets aligned to
+# the allocation granularity, which is larger than 4 KB on Windows.
+PAGE_SIZE = max(4096, mmap.ALLOCATIONGRANULARITY)
+DEFAULT_SPOOL_SIZE = 256 * 1024
+
+_MAGIC = b'RSPL'
+# magic, data region size, head, tail, device context length
+_HEADER = struct.Struct('<4sIQQI')
+# record length, crc32 of the record
+_RECORD = struct.Struct('<II')
+MAX_CONTEXT_SIZE = PAGE_SIZE - _HEADER.size
+
+
+def _align_down(offset: int) -> int:
+	return offset - offset % PAGE_SIZE
+
+
+def _align_up(offset: int) -> int:
+	return _align_down(offset + PAGE_SIZE - 1)
+
+
+class RingSpool:
+	"""Bounded store of encoded records with oldest-first eviction, only safe for a single thread.
+
+	The head and tail are logical byte offsets that only increase, the position in the data region
+	is the offset modulo its size. Records that were synced before a restart are recovered when the
+	file is opened again with the same size, together with the stored device context.
+	"""
+
+	def __init__(self, filename: str, size: int = DEFAULT_SPOOL_SIZE, coalesce: int = PAGE_SIZE):
+		"""size is the byte budget of the data region, rounded up to whole pages, and coalesce is the
+		number of buffered bytes that triggers a sync without waiting for the consumer to go idle."""
+		self.filename = filename
+		self._size = _align_up(max(size, PAGE_SIZE))
+		self._coalesce = coalesce
+		self._fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+		fresh = os.fstat(self._fd).st_size != PAGE_SIZE + self._size
+		if fresh:
+			os.ftruncate(self._fd, PAGE_SIZE + self._size)
+		self._map = mmap.mmap(self._fd, PAGE_SIZE + self._size)
+
+		self._head = 0
+		self._tail = 0
+		self._count = 0
+		self._buffer = bytearray()
+		self._context: Union[bytes, None] = None
+		# Header values that are on disk
+		self._synced_head = 0
+		self._synced_tail = 0
+		self._header_dirty = False
+
+		self.counters: Dict[str, int] = {
+			'appended': 0,
+			'evicted': 0,
+			'consumed': 0,
+			'recovered': 0,
+			'syncs': 0,
+			'pages_written': 0,
+		}
+
+		if fresh or not self._recover():
+			self._head = self._tail = self._count = 0
+			self._context = None
+			self._write_header()
+
+	def __len__(self):
+		return self._count
+
+	def _recover(self) -> bool:
+		magic, size, head, tail, context_length = _HEADER.unpack_from(self._map, 0)
+		if magic != _MAGIC or size != self._size or tail < head or tail - head > size \
+				or context_length > MAX_CONTEXT_SIZE:
+			return False
+		self._context = bytes(self._map[_HEADER.size:_HEADER.size + context_length]) if context_length else None
+
+		# Walk the records and stop at the first one that was torn by a crash
+		self._head = self._tail = head
+		while self._tail < tail:
+			if tail - self._tail < _RECORD.size:
+				break
+			length, crc = _RECORD.unpack(self._read(self._tail, _RECORD.size))
+			if _RECORD.size + length > tail - self._tail:
+				break
+			if zlib.crc32(self._read(self._tail + _RECORD.size, length)) != crc:
+				break
+			self._tail += _RECORD.size + length
+			self._count += 1
+		self._synced_head = self._head
+		self._synced_tail = self._tail
+		self.counters['recovered'] = self._count
+		return True
+
+	def _read(self, offset: int, length: int) -> bytes:
+		start = offset % self._size
+		end = start + length
+		if end <= self._size:
+			return self._map[PAGE_SIZE + start:PAGE_SIZE + end]
+		return self._map[PAGE_SIZE + start:PAGE_SIZE + self._size] + self._map[PAGE_SIZE:PAGE_SIZE + end - self._size]
+
+	def _write(self, offset: int, data: bytes):
+		start = offset % self._size
+		first = min(len(data), self._size - start)
+		self._map[PAGE_SIZE + start:PAGE_SIZE + start + first] = data[:first]
+		if first < len(data):
+			self._map[PAGE_SIZE:PAGE_SIZE + len(data) - first] = data[first:]
+
+	def _write_header(self):
+		context = self._context or b''
+		_HEADER.pack_into(self._map, 0, _MAGIC, self._size, self._head, max(self._head, self._synced_tail),
+							len(context))
+		self._map[_HEADER.size:_HEADER.size + len(context)] = context
+		self._map.flush(0, PAGE_SIZE)
+		self.counters['pages_written'] += 1
+		self._synced_head = self._head
+		self._header_dirty = False
+
+	# Copy the buffered records into the map, they are not on disk until the next sync
+	def _write_buffer(self):
+		if self._buffer:
+			self._write(self._tail, self._buffer)
+			self._tail += len(self._buffer)
+			self._buffer = bytearray()
+
+	def _release(self, count: int) -> int:
+		if count >= self._count:
+			# The usual case after a flush, nothing needs to be read back
+			count = self._count
+			self._tail += len(self._buffer)
+			self._head = self._tail
+			self._buffer = bytearray()
+		else:
+			self._write_buffer()
+			for _ in range(count):
+				length, _ = _RECORD.unpack(self._read(self._head, _RECORD.size))
+				self._head += _RECORD.size + length
+		self._count -= count
+		self._header_dirty = True
+		return count
+
+	def append(self, record: bytes) -> int:
+		"""Append a record and return the number of oldest records evicted to make room for it."""
+		length = _RECORD.size + len(record)
+		if length > self._size:
+			raise ValueError('Record of {0} bytes is larger than the spool'.format(len(record)))
+
+		evicted = 0
+		while self._tail + len(self._buffer) + length - self._head > self._size:
+			evicted += self._release(1)
+		self.counters['evicted'] += evicted
+
+		self._buffer += _RECORD.pack(len(record), zlib.crc32(record))
+		self._buffer += record
+		self._count += 1
+		self.counters['appended'] += 1
+		if len(self._buffer) >= self._coalesce:
+			self.sync()
+		return evicted
+
+	def consume(self, count: int):
+		"""Release the oldest count records once they have been sent."""
+		self.counters['consumed'] += self._release(count)
+
+	def records(self) -> Iterator[bytes]:
+		"""The pending records, oldest first."""
+		self._write_buffer()
+		offset = self._head
+		for _ in range(self._count):
+			length, _ = _RECORD.unpack(self._read(offset, _RECORD.size))
+			yield self._read(offset + _RECORD.size, length)
+			offset += _RECORD.size + length
+
+	def context(self) -> Union[bytes, None]:
+		return self._context
+
+	# The device context is kept in the header page so it is never evicted
+	def set_context(self, context: bytes):
+		if len(context) > MAX_CONTEXT_SIZE:
+			raise ValueError('Device context of {0} bytes does not fit in the spool header'.format(len(context)))
+		self._context = context
+		self._header_dirty = True
+
+	def _flush_range(self, start: int, end: int) -> List[int]:
+		# Physical page-aligned ranges of the data region covering the logical range
+		ranges = []
+		while start < end:
+			physical = start % self._size
+			length = min(end - start, self._size - physical)
+			page = _align_down(physical)
+			pages = _align_up(physical + length) - page
+			self._map.flush(PAGE_SIZE + page, pages)
+			ranges.append(pages // PAGE_SIZE)
+			start += length
+		return ranges
+
+	def sync(self):
+		"""Write the buffered records and the header to disk in whole pages."""
+		if not self._buffer and not self._header_dirty:
+			return
+		self.counters['syncs'] += 1
+		if self._head > self._synced_head and self._buffer:
+			# Release the evicted space on disk before it is overwritten so that a crash during the
+			# write can't leave the header pointing at a torn record
+			self._write_header()
+
+		start = self._tail
+		self._write_buffer()
+		self.counters['pages_written'] += sum(self._flush_range(start, self._tail))
+		self._synced_tail = self._tail
+		self._write_header()
+
+	def close(self):
+		if self._map is None:
+			return
+		self.sync()
+		self._map.close()
+		os.close(self._fd)
+		self._map = None
@@ -3,6 +3,7 @@
 #  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
 
 from log_manager import LogManager
+from programme_index import ProgrammeIndex
 from reporting_events import *
 from datetime import timedelta, timezone
 import json
@@ -10,9 +11,13 @@ import requests
 from amazon import ion
 import six
 import random
-from typing import List, Union
+from typing import Dict, List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 import os
 import glob
+import sys
+import time
 import traceback
 
 channels = ['F8D', 'SCD', 'NGD', 'BKH', 'SOD', 'STN', 'MO1', 'FDH', 'S3D', 'BE3', 'ARD', 'F4D', 'EPD', 'E1D', 'FS3']
@@ -22,6 +27,15 @@ PROXY_ON = False
 HTTP_PROXY_HOST = 'localhost:3128'
 HTTPS_PROXY_HOST = 'localhost:3128'
 
+# TiVo Content Discovery host, workload_generator serves the same API locally
+DISCOVERY_HOST = "http://foxtel-staging-admin-0.digitalsmiths.net/sd/foxtel/"
+
+# Parsed schedules are reused for CACHE_TTL seconds, the least recently used are dropped past CACHE_SIZE
+CACHE_TTL = 600
+CACHE_SIZE = 128
+# Channels fetched at the same time by prefetch and connections kept alive to the discovery host
+PREFETCH_WORKERS = 8
+
 
 class JSONEncoderForIonTypes(json.JSONEncoder):
 	def default(self, obj):
@@ -160,40 +174,126 @@ class Media:
 		self.duration = duration
 
 
-def request_channel_events(channel: str) -> List[ProgrammeMetadata]:
-	business_rule = "rid=LIVE_TODAY"
-	fxid = "fxid=02f0935e4cd5920aa6c7c996a5ee53a70fd41d8cd98f00b204e9800998ecf8427e"
-	hwid = "hwid=b552ae163e9da40d7d39bfc8ac65399d"
-	host = "http://foxtel-staging-admin-0.digitalsmiths.net/sd/foxtel/"
-	tap = "taps/sources/linear"
-	fields = "__fl=metadata.programEventTitle,metadata.episodeTitle,relevantSchedules.videoQuality,metadata.programId,\
+class DiscoveryAPI:
+	"""The schedule lookups of the scenarios, from the TiVo Content Discovery API at host.
+
+	Requests share one keep-alive session and the parsed schedules are cached per channel, a live
+	event until it goes off air or the TTL passes. The lookups are safe to call from several threads.
+	"""
+
+	def __init__(self, host: str = None, ttl: float = CACHE_TTL, cache_size: int = CACHE_SIZE):
+		self.host = host
+		self.ttl = ttl
+		self.cache_size = cache_size
+		self._cache: OrderedDict = OrderedDict()
+		self._lock = Lock()
+		self.counters: Dict[str, int] = {'requests': 0, 'hits': 0, 'misses': 0}
+		self._session = requests.Session()
+		adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=PREFETCH_WORKERS)
+		self._session.mount('http://', adapter)
+		self._session.mount('https://', adapter)
+		if PROXY_ON:
+			self._session.proxies.update({'http': HTTP_PROXY_HOST, 'https': HTTPS_PROXY_HOST})
+
+	def _get(self, url: str) -> dict:
+		with self._lock:
+			self.counters['requests'] += 1
+		response = self._session.get(url)
+		response.raise_for_status()
+		return response.json()
+
+	def _cached(self, key: Tuple[str, str]):
+		with self._lock:
+			item = self._cache.get(key)
+			if item is not None and item[0] > time.monotonic():
+				self._cache.move_to_end(key)
+				self.counters['hits'] += 1
+				return item[1]
+			self.counters['misses'] += 1
+			return None
+
+	def _store(self, key: Tuple[str, str], value, ttl: float):
+		with self._lock:
+			self._cache[key] = (time.monotonic() + ttl, value)
+			self._cache.move_to_end(key)
+			while len(self._cache) > self.cache_size:
+				self._cache.popitem(last=False)
+
+	def channel_events(self, channel: str) -> List[ProgrammeMetadata]:
+		key = ('linear', channel)
+		events = self._cached(key)
+		if events is None:
+			events = self._request_channel_events(channel)
+			self._store(key, events, self.ttl)
+		return events
+
+	def live_event(self, channel: str) -> ProgrammeMetadata:
+		key = ('linearonnow', channel)
+		event = self._cached(key)
+		if event is None:
+			event = self._request_live_event(channel)
+			remaining = (event.start_time + event.duration - datetime.utcnow()).total_seconds()
+			self._store(key, event, max(0.0, min(self.ttl, remaining)))
+		return event
+
+	def prefetch(self, channel_tags: List[str], workers: int = PREFETCH_WORKERS):
+		"""Fetch the schedules and live events of the channels concurrently into the cache."""
+		lookups = [(lookup, channel) for channel in channel_tags for lookup in (self.channel_events, self.live_event)]
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			futures = [executor.submit(lookup, channel) for lookup, channel in lookups]
+			for future in futures:
+				try:
+					future.result()
+				except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+					# The scenario asks again if the channel is used
+					print('Prefetch failed:', e)
+
+	def close(self):
+		self._session.close()
+
+	def _request_channel_events(self, channel: str) -> List[ProgrammeMetadata]:
+		business_rule = "rid=LIVE_TODAY"
+		fxid = "fxid=02f0935e4cd5920aa6c7c996a5ee53a70fd41d8cd98f00b204e9800998ecf8427e"
+		hwid = "hwid=b552ae163e9da40d7d39bfc8ac65399d"
+		host = self.host or DISCOVERY_HOST
+		tap = "taps/sources/linear"
+		fields = "__fl=metadata.programEventTitle,metadata.episodeTitle,relevantSchedules.videoQuality,metadata.programId,\
 metadata.publishDuration,metadata.title,relevantSchedules.channelTag,relevantSchedules.startTime,\
 relevantSchedules.endTime,relevantSchedules.classification,relevantSchedules.id,relevantSchedules.type"
-	filter_query = "__fq=relevantSchedules.channelTag:{0}".format(channel)
-	url = host + tap + '?' + '&'.join([business_rule, filter_query, fields, fxid, hwid, 'limit=100'])
-	if PROXY_ON:
-		response = requests.get(url, proxies={'http': HTTP_PROXY_HOST, 'https': HTTPS_PROXY_HOST})
-	else:
-		response = requests.get(url)
+		filter_query = "__fq=relevantSchedules.channelTag:{0}".format(channel)
+		url = host + tap + '?' + '&'.join([business_rule, filter_query, fields, fxid, hwid, 'limit=100'])
 
-	events = sorted(ProgrammeMetadata.get_schedule(channel, json.loads(response.text)), key=lambda prog: prog.start_time)
-
-	return events
+		events = sorted(ProgrammeMetadata.get_schedule(channel, self._get(url)), key=lambda prog: prog.start_time)
 
+		return events
 
-def request_live_event(channel: str) -> ProgrammeMetadata:
-	host = "http://foxtel-staging-admin-0.digitalsmiths.net/sd/foxtel/"
-	tap = "taps/sources/linearonnow"
-	fields = "__fl=metadata.programEventTitle,metadata.episodeTitle,relevantSchedules.videoQuality,metadata.programId,\
+	def _request_live_event(self, channel: str) -> ProgrammeMetadata:
+		host = self.host or DISCOVERY_HOST
+		tap = "taps/sources/linearonnow"
+		fields = "__fl=metadata.programEventTitle,metadata.episodeTitle,relevantSchedules.videoQuality,metadata.programId,\
 metadata.publishDuration,metadata.title,relevantSchedules.channelTag,relevantSchedules.startTime,\
 relevantSchedules.endTime,relevantSchedules.classification,relevantSchedules.id,relevantSchedules.EventId"
-	filter_query = "__fq=relevantSchedules.channelTag:"
-	url = host + tap + '?' + filter_query + channel + '&' + fields
-	if PROXY_ON:
-		response = requests.get(url, proxies={'http': HTTP_PROXY_HOST, 'https': HTTPS_PROXY_HOST})
-	else:
-		response = requests.get(url)
-	return ProgrammeMetadata.convert(json.loads(response.text))
+		filter_query = "__fq=relevantSchedules.channelTag:"
+		url = host + tap + '?' + filter_query + channel + '&' + fields
+		return ProgrammeMetadata.convert(self._get(url))
+
+
+# The schedule source used by the scenarios, see set_discovery
+discovery = DiscoveryAPI()
+
+
+# Replace the schedule source, for example with the offline schedules of workload_generator
+def set_discovery(source):
+	global discovery
+	discovery = source
+
+
+def request_channel_events(channel: str) -> List[ProgrammeMetadata]:
+	return discovery.channel_events(channel)
+
+
+def request_live_event(channel: str) -> ProgrammeMetadata:
+	return discovery.live_event(channel)
 
 
 def get_live_event() -> ProgrammeMetadata:
@@ -280,12 +380,22 @@ def make_pvr_stop_event(timestamp: datetime, viewing_start: datetime, event: Pro
 	)
 
 
-def find_event_on_air(timestamp: datetime, events: List[ProgrammeMetadata]):
-	for index, event in enumerate(events):
-		if event.start_time <= timestamp < events[index+1].start_time:
-			return event
+# Indexes of the schedule lists returned by the discovery lookups, which are reused while cached
+_schedule_indexes: OrderedDict = OrderedDict()
+
 
-	return events[0]
+def find_event_on_air(timestamp: datetime, events: List[ProgrammeMetadata]):
+	item = _schedule_indexes.get(id(events))
+	if item is None or item[0] is not events:
+		item = _schedule_indexes[id(events)] = (events, ProgrammeIndex.from_events(events))
+		while len(_schedule_indexes) > CACHE_SIZE:
+			_schedule_indexes.popitem(last=False)
+	# In a gap in the schedule or past its end, the programme that started last as the old scan did,
+	# and before the schedule its first programme
+	index = item[1]
+	channel = events[0].content_provider
+	event = index.on_air(channel, timestamp) or index.latest_started(channel, timestamp)
+	return event if event is not None else events[0]
 
 
 def live_event_change(log: LogManager, timestamp: datetime, ch_onair: ProgrammeMetadata, ch_next: ProgrammeMetadata,
@@ -302,8 +412,8 @@ def live_event_change(log: LogManager, timestamp: datetime, ch_onair: ProgrammeM
 # ============================================================================
 
 
-def power_states_activity(m: LogManager):
-	timestamp = datetime.utcnow()
+def power_states_activity(m: LogManager, timestamp: datetime = None) -> datetime:
+	timestamp = timestamp or datetime.utcnow()
 	m.clear_state(timestamp)
 
 	context = device_context(timestamp)
@@ -352,10 +462,11 @@ def power_states_activity(m: LogManager):
 	timestamp += timedelta(seconds=1)
 	player.timestamp = timestamp
 	m.push_event(player)
+	return timestamp
 
 
-def channel_surfing(m: LogManager):
-	timestamp = datetime.utcnow()
+def channel_surfing(m: LogManager, timestamp: datetime = None) -> datetime:
+	timestamp = timestamp or datetime.utcnow()
 	m.clear_state(timestamp)
 
 	context = device_context(timestamp)
@@ -392,10 +503,11 @@ def channel_surfing(m: LogManager):
 	timestamp += timedelta(seconds=5)
 	player = PageViewEvent(timestamp, 'player')
 	m.push_event(player)
+	return timestamp
 
 
-def trickmode_viewing(m: LogManager):
-	timestamp = datetime.utcnow()
+def trickmode_viewing(m: LogManager, timestamp: datetime = None) -> datetime:
+	timestamp = timestamp or datetime.utcnow()
 	m.clear_state(timestamp)
 
 	context = device_context(timestamp)
@@ -440,6 +552,7 @@ def trickmode_viewing(m: LogManager):
 	pvr_stop = make_pvr_stop_event(timestamp, viewing_start, event, media, event.duration.seconds,
 								(event.duration - (viewing_start - event.start_time)).seconds)
 	m.push_event(pvr_stop)
+	return timestamp
 
 
 # Here we are reading back the 10n file and creating a JSON output in the same directory
@@ -455,48 +568,58 @@ def read_data(filename: str):
 
 
 # MAIN program start
-cwd = os.getcwd()
-dir_name = os.path.join(cwd, 'ion_files')
-try:
-	# Create ion files target Directory
-	os.mkdir(dir_name)
-except FileExistsError:
-	# remove old ion files
-	files = os.path.join(dir_name, '*.10n')
-	for file in glob.glob(files):
-		os.unlink(file)
-	# remove old json files
-	files = os.path.join(dir_name, '*.json')
-	for file in glob.glob(files):
-		os.unlink(file)
-
-manager = LogManager(sequence_counter=random.randint(1, 101) << 16, max_events=100, send_period=600, path=dir_name)
-
-manager.set_identity(
-	hw_version='17.27.0.C',
-	hw_id=bytes.fromhex('2b9c5d351a879a25b86851adc36acea6'),
-	hw_client_id='62081957540',
-	hw_card_id='000229047600',
-	ams_id=bytes.fromhex('026b45850456f79041d9fcf54b8fddf51ad41d8cd98f00b204e9800998ecf8427e'),
-	ams_panel=1,
-	app_version='1.16.1.9'
-)
-
-try:
-	manager.start()
-	power_states_activity(manager)
-	manager.flush()
-	channel_surfing(manager)
-	manager.flush()
-	trickmode_viewing(manager)
-	manager.stop()
-
-	manager.join()
-
-	for file in manager.get_batch_filenames():
-		read_data(file)
-
-except Exception as e:
-	manager.stop()
-	print(traceback.format_exc())
-	print(e.__doc__)
+
+if __name__ == '__main__':
+	# Point the scenarios at another discovery host, such as the workload_generator stand-in
+	if '--discovery' in sys.argv:
+		DISCOVERY_HOST = sys.argv[sys.argv.index('--discovery') + 1]
+
+	# Fetch the schedules of all the channels up front rather than as each scenario needs them
+	discovery.prefetch(channels + ['SHC', 'SHA'])
+
+	cwd = os.getcwd()
+	dir_name = os.path.join(cwd, 'ion_files')
+	try:
+		# Create ion files target Directory
+		os.mkdir(dir_name)
+	except FileExistsError:
+		# remove old ion files
+		files = os.path.join(dir_name, '*.10n')
+		for file in glob.glob(files):
+			os.unlink(file)
+		# remove old json files
+		files = os.path.join(dir_name, '*.json')
+		for file in glob.glob(files):
+			os.unlink(file)
+
+	manager = LogManager(sequence_counter=random.randint(1, 101) << 16, max_events=100, send_period=600, path=dir_name)
+
+	manager.set_identity(
+		hw_version='17.27.0.C',
+		hw_id=bytes.fromhex('2b9c5d351a879a25b86851adc36acea6'),
+		hw_client_id='62081957540',
+		hw_card_id='000229047600',
+		ams_id=bytes.fromhex('026b45850456f79041d9fcf54b8fddf51ad41d8cd98f00b204e9800998ecf8427e'),
+		ams_panel=1,
+		app_version='1.16.1.9'
+	)
+
+	try:
+		manager.start()
+		power_states_activity(manager)
+		manager.flush()
+		channel_surfing(manager)
+		manager.flush()
+		trickmode_viewing(manager)
+		manager.stop()
+
+		manager.join()
+
+		for file in manager.get_batch_filenames():
+			read_data(file)
+		print('Discovery lookups:', discovery.counters)
+
+	except Exception as e:
+		manager.stop()
+		print(traceback.format_exc())
+		print(e.__doc__)
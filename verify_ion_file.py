@@ -4,6 +4,13 @@
 
 from reporting_events import *
 from amazon.ion import symbols as ion_symbols, simpleion, simple_types
+from amazon.ion.core import IonEventType, IonType
+from amazon.ion.reader import blocking_reader, NEXT_EVENT
+from amazon.ion.reader_binary import binary_reader
+from amazon.ion.reader_managed import managed_reader
+from typing import Iterator
+from bundle_compression import open_bundle, MappedBundle
+from batch_profiler import BatchProfiler, STAGE_DECODE, profiler_options
 import sys
 
 
@@ -16,31 +23,128 @@ def decode_ion_data(data):
 	factory = EventFactory()
 	header, events = IdentityHeader.unpack_header(data)
 	for item in events:
-		# Here is the handler for each event
-		if isinstance(item, simple_types.IonPyDict):
-			header.events.append(decode_ion_event(factory, item))
-			continue
+		if not isinstance(item, simple_types.IonPyDict):
+			raise RuntimeError("ION format is incorrect")
+
+	# The whole batch is decoded at once with the generated per event decoders
+	header.events.extend(factory.factory_many(events))
+	return header
 
+
+# Build the shared symbol table from the analytics symbols
+def build_catalog() -> ion_symbols.SymbolTableCatalog:
+	catalog = ion_symbols.SymbolTableCatalog()
+	symbols = ion_symbols.SymbolTable(ion_symbols.SHARED_TABLE_TYPE, table, "foxtel.engagement.format", 1)
+	catalog.register(symbols)
+	return catalog
+
+
+def _read_value(reader, event, zero_copy: bool = False):
+	if event.event_type is IonEventType.CONTAINER_START:
+		if event.ion_type is IonType.STRUCT:
+			container = OrderedDict()
+			event = reader.send(NEXT_EVENT)
+			while event.event_type is not IonEventType.CONTAINER_END:
+				container[event.field_name.text] = _read_value(reader, event, zero_copy)
+				event = reader.send(NEXT_EVENT)
+		else:
+			container = []
+			event = reader.send(NEXT_EVENT)
+			while event.event_type is not IonEventType.CONTAINER_END:
+				container.append(_read_value(reader, event, zero_copy))
+				event = reader.send(NEXT_EVENT)
+		return container
+
+	if event.value is None or event.ion_type is IonType.NULL:
+		return None
+	if event.ion_type is IonType.BLOB:
+		# Don't hold a view onto the reader buffer unless it is the mapped file
+		return event.value if zero_copy else bytes(event.value)
+	return event.value
+
+
+# Stream a 10n file from the Ion reader events rather than loading the whole batch.
+# The IdentityHeader is yielded first, with an empty events list, followed by one decoded
+# event at a time so memory use does not depend on the size of the batch.
+# With zero_copy the file is memory-mapped and parsed in place. The blob fields (hw_id, ams_id,
+# selector_track_id and rcu_keys_pressed) are then memoryview slices of the map, call bytes() on
+# them to keep a copy.
+def iter_events(filename: str, catalog: ion_symbols.SymbolTableCatalog = None,
+				zero_copy: bool = False) -> Iterator[Union[IdentityHeader, EventHeader]]:
+	if catalog is None:
+		catalog = build_catalog()
+
+	if zero_copy:
+		mapped = MappedBundle(filename)
+		yield from _iter_reader_events(mapped, catalog, True, len(mapped))
+		return
+	with open_bundle(filename) as read_file:
+		yield from _iter_reader_events(read_file, catalog, False)
+
+
+def _iter_reader_events(read_file, catalog: ion_symbols.SymbolTableCatalog, zero_copy: bool, buffer_size: int = None):
+	factory = EventFactory()
+	reader = managed_reader(binary_reader(), catalog)
+	if buffer_size:
+		reader = blocking_reader(reader, read_file, buffer_size)
+	else:
+		reader = blocking_reader(reader, read_file)
+	event = reader.send(NEXT_EVENT)
+	if event.event_type is not IonEventType.CONTAINER_START or event.ion_type is not IonType.STRUCT:
 		raise RuntimeError("ION format is incorrect")
 
-	return header
+	# The header fields are packed ahead of the event list
+	properties = OrderedDict()
+	event = reader.send(NEXT_EVENT)
+	while event.event_type is not IonEventType.CONTAINER_END:
+		if event.field_name.text != EVENT_LIST:
+			properties[event.field_name.text] = _read_value(reader, event, zero_copy)
+			event = reader.send(NEXT_EVENT)
+			continue
+
+		if event.event_type is not IonEventType.CONTAINER_START or event.ion_type is not IonType.LIST:
+			raise RuntimeError("ION format is incorrect")
+		properties[EVENT_LIST] = []
+		header, _ = IdentityHeader.unpack_header(properties)
+		yield header
+
+		event = reader.send(NEXT_EVENT)
+		while event.event_type is not IonEventType.CONTAINER_END:
+			if event.event_type is not IonEventType.CONTAINER_START or event.ion_type is not IonType.STRUCT:
+				raise RuntimeError("ION format is incorrect")
+			item = _read_value(reader, event, zero_copy)
+			yield decode_ion_event(factory, item)
+			event = reader.send(NEXT_EVENT)
+
+		event = reader.send(NEXT_EVENT)
 
 
 # Here we are reading the 10n file and then parsing the resulting data model
-def read_data(filename: str):
+# A profiler captures the decode of the file when it selects it, see batch_profiler
+def read_data(filename: str, zero_copy: bool = False, profiler: BatchProfiler = None):
+	if profiler is not None:
+		return profiler.run(filename, STAGE_DECODE, _read_data, filename, zero_copy)
+	return _read_data(filename, zero_copy)
+
+
+def _read_data(filename: str, zero_copy: bool):
 	# Build the shared symbol table from the analytics symbols
 	# Don't know how much time this takes but I presume that this only needs to be done once
-	catalog = ion_symbols.SymbolTableCatalog()
-	symbols = ion_symbols.SymbolTable(ion_symbols.SHARED_TABLE_TYPE, table, "foxtel.engagement.format", 1)
-	catalog.register(symbols)
+	catalog = build_catalog()
 
-	# Pull in the file and transition from ION format to the internal data-model
+	# Pull in the file, decompressing gzip or zstd bundles, and transition from ION format to the internal data-model
 	# from here we can either generate XML, JSON or send events to Segment.
 	# Rather than performing class inspection it maybe better to add handlers to
 	# the reporting event model.
-	with open(filename, "rb") as read_file:
-		data = simpleion.load(read_file, catalog, single_value=True)
-		event_model = decode_ion_data(data)
+	if zero_copy:
+		# Parse in place from the mapped file, see iter_events
+		events = iter_events(filename, catalog, zero_copy=True)
+		event_model = next(events)
+		event_model.events.extend(events)
+	else:
+		with open_bundle(filename) as read_file:
+			data = simpleion.load(read_file, catalog, single_value=True)
+			event_model = decode_ion_data(data)
 
 	events = event_model.events
 	for event in events:
@@ -59,9 +163,23 @@ def read_data(filename: str):
 	return event_model
 
 
-if len(sys.argv) > 1:
-	start = datetime.utcnow()
-	data_model = read_data(sys.argv[1])
-	end = datetime.utcnow()
-	print(data_model)
-	print('Read and ingest time:', end - start)
+if __name__ == '__main__' and len(sys.argv) > 1:
+	args = sys.argv[1:]
+	mapped = '--mmap' in args
+	if mapped:
+		args.remove('--mmap')
+	try:
+		decode_profiler = profiler_options(args)
+	except ValueError as error:
+		print(error)
+		args = []
+
+	if len(args) > 0:
+		start = datetime.utcnow()
+		data_model = read_data(args[0], zero_copy=mapped, profiler=decode_profiler)
+		end = datetime.utcnow()
+		print(data_model)
+		print('Read and ingest time:', end - start)
+	else:
+		print('Usage: python verify_ion_file.py <filename> [--mmap] [--profile cprofile|tracemalloc [...]]')
+		sys.exit(1)
@@ -0,0 +1,371 @@
+#  Copyright (c) 2019 Foxtel Management Pty Limited. All rights reserved
+
+# Seeded offline workload generator. EPG schedules are synthesised per channel and day from the seed,
+# and the test_data scenarios (power_states_activity, channel_surfing and trickmode_viewing) are
+# driven for N simulated devices over M simulated hours. The same seed always produces the same
+# bundles, byte for byte, as the header times and filenames follow the simulated clock. The devices
+# run the log_manager session and batching rules on the calling thread, without the queue thread or
+# time based flushes, so a run is limited only by event packing and encoding.
+#
+# DiscoveryStandIn serves the synthetic schedules over HTTP in the JSON shape of the TiVo discovery
+# API, so that test_data itself can run offline:
+#     python workload_generator.py --serve 8080
+#     python test_data.py --discovery http://127.0.0.1:8080/sd/foxtel/
+#
+# Usage: python workload_generator.py <output directory> [--devices N] [--hours M] [--seed S] [--workers N]
+#                                     [--max-events N]
+#        python workload_generator.py --check [--devices N] [--hours M] [--seed S] [--workers N] [--max-events N]
+#        python workload_generator.py --serve PORT [--seed S]
+#
+# --max-events is the number of events per bundle. --check generates the workload twice, on one worker
+# and on N, and compares the bundles.
+
+from log_manager import LogManagerBase
+from reporting_events import *
+from test_data import ProgrammeMetadata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Iterable
+from urllib.parse import parse_qs, urlparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import test_data
+import time
+
+SIMULATION_START = datetime(2019, 6, 17)
+
+_EPOCH = datetime(1970, 1, 1)
+_DURATIONS = (30, 30, 60, 60, 60, 90, 120)
+_CLASSIFICATIONS = ('G', 'PG', 'M', 'MA15+')
+_RESOLUTIONS = ('SD', 'HD', 'HD', 'UHD')
+_WORDS = ('House', 'River', 'Kitchen', 'Rescue', 'Garden', 'Island', 'Night', 'Planet', 'Market', 'Detective',
+			'Road', 'Outback', 'Harbour', 'Station', 'Summer', 'Legends', 'Wild', 'Coast', 'Empire', 'Family')
+# Relative weights of the scenarios run by every simulated device
+SCENARIOS = (
+	(test_data.power_states_activity, 1),
+	(test_data.channel_surfing, 4),
+	(test_data.trickmode_viewing, 2),
+)
+
+
+def _millis(value: datetime) -> int:
+	return (value - _EPOCH) // timedelta(milliseconds=1)
+
+
+class SyntheticSchedule:
+	"""Deterministic EPG schedules. Each channel and day is generated from its own seeded generator,
+	so a schedule doesn't depend on which channels or days were asked for before."""
+
+	def __init__(self, seed: int = 0):
+		self.seed = seed
+		self._days: Dict[Tuple[str, datetime], List[ProgrammeMetadata]] = {}
+
+	def day(self, channel: str, day: datetime) -> List[ProgrammeMetadata]:
+		key = (channel, day)
+		events = self._days.get(key)
+		if events is not None:
+			return events
+
+		generator = random.Random('{0}:{1}:{2}'.format(self.seed, channel, day.date().isoformat()))
+		events = []
+		start = day
+		end = day + timedelta(days=1)
+		while start < end:
+			duration = min(timedelta(minutes=generator.choice(_DURATIONS)), end - start)
+			title = ' '.join(generator.sample(_WORDS, 2))
+			events.append(ProgrammeMetadata(
+				content_provider=channel,
+				program_id='FX{0:010d}'.format(generator.randrange(10 ** 10)),
+				schedule_id='SC{0:010d}'.format(generator.randrange(10 ** 10)),
+				start_time=start,
+				duration=duration,
+				program_title=title,
+				episode_title='Episode {0}'.format(generator.randint(1, 24)) if generator.random() < 0.6 else None,
+				classification=generator.choice(_CLASSIFICATIONS),
+				resolution=generator.choice(_RESOLUTIONS)))
+			start += duration
+		self._days[key] = events
+		return events
+
+	def events(self, channel: str, start: datetime, end: datetime) -> List[ProgrammeMetadata]:
+		"""The programmes of a channel that overlap start to end, in start time order."""
+		events = []
+		day = datetime(start.year, start.month, start.day)
+		while day < end:
+			events.extend(event for event in self.day(channel, day)
+							if event.start_time < end and event.start_time + event.duration > start)
+			day += timedelta(days=1)
+		return events
+
+	def on_air(self, channel: str, timestamp: datetime) -> ProgrammeMetadata:
+		return self.events(channel, timestamp, timestamp + timedelta(seconds=1))[0]
+
+	@staticmethod
+	def hit(event: ProgrammeMetadata) -> Dict:
+		"""A programme in the JSON shape of a discovery API hit."""
+		metadata = {
+			'programId': event.program_id,
+			'title': event.program_title,
+			'programEventTitle': event.program_title,
+			'publishDuration': int(event.duration.total_seconds()),
+		}
+		if event.episode_title is not None:
+			metadata['episodeTitle'] = event.episode_title
+		return {
+			'metadata': metadata,
+			'relevantSchedules': [{
+				'channelTag': event.content_provider,
+				'startTime': _millis(event.start_time),
+				'endTime': _millis(event.start_time + event.duration),
+				'classification': event.classification,
+				'id': event.schedule_id,
+				'videoQuality': event.resolution,
+				'type': 'linear',
+			}],
+		}
+
+
+class SyntheticDiscovery:
+	"""Offline schedule source for test_data.set_discovery, answering as if it were the simulated time."""
+
+	def __init__(self, schedule: SyntheticSchedule):
+		self.schedule = schedule
+		self.clock = SIMULATION_START
+
+	def channel_events(self, channel: str) -> List[ProgrammeMetadata]:
+		# Like the LIVE_TODAY rule, with a day either side so a scenario never runs off the schedule
+		day = datetime(self.clock.year, self.clock.month, self.clock.day)
+		return self.schedule.events(channel, day - timedelta(days=1), day + timedelta(days=2))
+
+	def live_event(self, channel: str) -> ProgrammeMetadata:
+		return self.schedule.on_air(channel, self.clock)
+
+
+class SyntheticDevice(LogManagerBase):
+	"""A device that applies the log_manager rules to each event as it is pushed.
+
+	Batches are flushed on the event count alone and the header time and filenames follow the time of
+	the latest event, so the output doesn't depend on the wall clock.
+	"""
+
+	def __init__(self, sequence_counter: int, max_events: int = 100, path: str = './',
+					clock: datetime = SIMULATION_START):
+		# Effectively no time based flushes, the simulated time runs far faster than the wall clock
+		LogManagerBase.__init__(self, sequence_counter, 10 ** 8, max_events, path, LogManagerBase.ENCODER_BINARY)
+		self.pushed = 0
+		self.clock = clock
+		self._last_now = None
+
+	def _now(self) -> datetime:
+		# Strictly increasing so that batches flushed at the same simulated time get their own filenames
+		now = self.clock
+		if self._last_now is not None and now <= self._last_now:
+			now = self._last_now + timedelta(microseconds=1)
+		self._last_now = now
+		return now
+
+	def push_event(self, event: EventHeader):
+		self.pushed += 1
+		self.clock = max(self.clock, event.timestamp)
+		self._process_event(event)
+
+	def push_events(self, events: Iterable[EventHeader]):
+		for event in events:
+			self.push_event(event)
+
+	def flush(self):
+		self._flush()
+
+	def stop(self):
+		self._process_event(self._stop_event())
+
+	def get_batch_filenames(self) -> List[str]:
+		return self._batches
+
+
+def _generate_devices(path: str, indices: range, hours: int, seed: int, max_events: int) -> Dict[str, int]:
+	discovery = SyntheticDiscovery(SyntheticSchedule(seed))
+	scenarios = [scenario for scenario, _ in SCENARIOS]
+	weights = [weight for _, weight in SCENARIOS]
+	previous = test_data.discovery
+	test_data.set_discovery(discovery)
+	totals = {'events': 0, 'batches': 0, 'scenarios': 0}
+	try:
+		# The log manager prints every flush
+		with contextlib.redirect_stdout(io.StringIO()):
+			for index in indices:
+				# The scenarios draw channels and programmes from the shared random generator
+				random.seed('{0}:{1}'.format(seed, index))
+				hw_client_id = '9{0:010d}'.format(index)
+				device = SyntheticDevice((index + 1) << 16, max_events, path)
+				device.set_identity('17.27.0.C', random.getrandbits(128).to_bytes(16, 'big'), '1.16.1.9',
+									hw_client_id, '{0:012d}'.format(index), random.getrandbits(256).to_bytes(32, 'big'), 1)
+				timestamp = SIMULATION_START + timedelta(seconds=random.randrange(3600))
+				end = SIMULATION_START + timedelta(hours=hours)
+				while timestamp < end:
+					discovery.clock = timestamp
+					scenario = random.choices(scenarios, weights)[0]
+					timestamp = scenario(device, timestamp) + timedelta(minutes=random.randint(1, 90))
+					totals['scenarios'] += 1
+				device.stop()
+				totals['events'] += device.pushed
+				totals['batches'] += len(device.get_batch_filenames())
+	finally:
+		test_data.set_discovery(previous)
+	return totals
+
+
+def generate(path: str, devices: int = 10, hours: int = 24, seed: int = 0, max_events: int = 100,
+				workers: int = 1) -> Dict:
+	"""Write the batches of every simulated device to path and return the event and batch counts.
+
+	Each device is seeded on its own so the output is the same whatever the number of workers.
+	"""
+	os.makedirs(path, exist_ok=True)
+	started = time.perf_counter()
+	if workers > 1 and devices > 1:
+		step = -(-devices // workers)
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			futures = [executor.submit(_generate_devices, path, range(first, min(first + step, devices)), hours, seed,
+										max_events) for first in range(0, devices, step)]
+			results = [future.result() for future in futures]
+	else:
+		results = [_generate_devices(path, range(devices), hours, seed, max_events)]
+
+	totals = {'devices': devices}
+	for name in ('scenarios', 'events', 'batches'):
+		totals[name] = sum(result[name] for result in results)
+	totals['seconds'] = time.perf_counter() - started
+	totals['events_per_sec'] = totals['events'] / totals['seconds'] if totals['seconds'] else 0.0
+	return totals
+
+
+def _digests(path: str) -> Dict[str, str]:
+	digests = {}
+	for filename in sorted(os.listdir(path)):
+		with open(os.path.join(path, filename), 'rb') as bundle_file:
+			digests[filename] = hashlib.md5(bundle_file.read()).hexdigest()
+	return digests
+
+
+def check_deterministic(devices: int = 10, hours: int = 24, seed: int = 0, max_events: int = 100,
+						workers: int = 1) -> List[str]:
+	"""Generate the workload on one worker and on workers, and return the bundles that differ."""
+	with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+		generate(first, devices, hours, seed, max_events)
+		generate(second, devices, hours, seed, max_events, workers)
+		expected = _digests(first)
+		actual = _digests(second)
+	return sorted(filename for filename in set(expected) | set(actual)
+					if expected.get(filename) != actual.get(filename))
+
+
+class _DiscoveryHandler(BaseHTTPRequestHandler):
+	schedule: SyntheticSchedule = None
+
+	def do_GET(self):
+		url = urlparse(self.path)
+		query = parse_qs(url.query)
+		channel = ''
+		for condition in query.get('__fq', []):
+			if condition.startswith('relevantSchedules.channelTag:'):
+				channel = condition.split(':', 1)[1]
+		if not channel:
+			self.send_error(400, 'Missing relevantSchedules.channelTag filter')
+			return
+
+		now = datetime.utcnow()
+		if url.path.endswith('/taps/sources/linearonnow'):
+			body = {'groups': [{'hits': [self.schedule.hit(self.schedule.on_air(channel, now))]}]}
+		elif url.path.endswith('/taps/sources/linear'):
+			# The programmes around now, so that a scenario running past midnight stays on the schedule
+			limit = int(query.get('limit', ['100'])[0])
+			events = self.schedule.events(channel, now - timedelta(hours=6), now + timedelta(hours=30))[:limit]
+			body = {'hits': [self.schedule.hit(event) for event in events]}
+		else:
+			self.send_error(404)
+			return
+
+		data = json.dumps(body).encode('utf-8')
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, format, *args):
+		pass
+
+
+class DiscoveryStandIn:
+	"""Local HTTP server answering the discovery API requests of test_data from synthetic schedules
+	at the current wall clock time. Use url as test_data.DISCOVERY_HOST."""
+
+	def __init__(self, seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+		handler = type('DiscoveryHandler', (_DiscoveryHandler,), {'schedule': SyntheticSchedule(seed)})
+		self._server = ThreadingHTTPServer((host, port), handler)
+		self._thread = None
+		self.url = 'http://{0}:{1}/sd/foxtel/'.format(*self._server.server_address[:2])
+
+	def start(self) -> 'DiscoveryStandIn':
+		self._thread = Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def serve_forever(self):
+		self._server.serve_forever()
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stop()
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	check = '--check' in args
+	if check:
+		args.remove('--check')
+	options = {'devices': 10, 'hours': 24, 'seed': 0, 'workers': 1, 'max-events': 100, 'serve': None}
+	for option in list(options):
+		if '--' + option in args:
+			index = args.index('--' + option)
+			options[option] = int(args[index + 1])
+			del args[index:index + 2]
+
+	if options['serve'] is not None:
+		stand_in = DiscoveryStandIn(options['seed'], port=options['serve'])
+		print('Serving the discovery API at', stand_in.url)
+		stand_in.serve_forever()
+	elif check:
+		different = check_deterministic(options['devices'], options['hours'], options['seed'],
+										options['max-events'], options['workers'])
+		for bundle_filename in different:
+			print('Differs:', bundle_filename)
+		print('{0} bundles differ between the runs'.format(len(different)))
+		sys.exit(1 if different else 0)
+	elif len(args) != 1:
+		print('Usage: python workload_generator.py <output directory> [--devices N] [--hours M] [--seed S] [--workers N]')
+		print('                                    [--max-events N]')
+		print('       python workload_generator.py --check [--devices N] [--hours M] [--seed S] [--workers N]')
+		print('                                    [--max-events N]')
+		print('       python workload_generator.py --serve PORT [--seed S]')
+		sys.exit(1)
+	else:
+		result = generate(args[0], options['devices'], options['hours'], options['seed'], options['max-events'],
+							options['workers'])
+		print('{devices} devices, {scenarios} scenarios, {events} events in {batches} batches, '
+				'{seconds:.2f}s, {events_per_sec:.0f} events/sec'.format(**result))